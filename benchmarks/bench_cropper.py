@@ -0,0 +1,161 @@
+"""pdf_cropper 的基准测试
+
+对一组合成PDF分别测量：
+  * 各检测引擎下 find_content_bounding_box 的耗时
+  * crop_pdf 整体裁剪和按页导出两种模式的耗时与输出大小
+每项测量都在新的子进程中运行，以便得到独立的峰值内存（RSS）。
+
+    python benchmarks/bench_cropper.py
+    python benchmarks/bench_cropper.py --quick --engines objects stext --json bench.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from make_corpus import make_pdf
+
+
+@dataclass
+class Case:
+    """一个合成PDF的参数，含义与 make_corpus.make_pdf 相同"""
+    name: str
+    pages: int = 1
+    text_blocks: int = 0
+    images: int = 0
+    paths: int = 0
+    background: bool = True
+
+
+CASES = [
+    Case("text", pages=50, text_blocks=40),
+    Case("images", pages=20, images=50),
+    Case("slides", pages=100, text_blocks=10, images=3, paths=200),
+    Case("vectors-10k", pages=5, paths=10_000),
+    Case("vectors-100k", pages=1, paths=100_000),
+]
+
+QUICK_CASES = [
+    Case("text", pages=10, text_blocks=20),
+    Case("images", pages=5, images=20),
+    Case("slides", pages=20, text_blocks=10, images=3, paths=200),
+    Case("vectors-10k", pages=1, paths=10_000),
+]
+
+
+def _peak_rss_mb() -> float | None:
+    """当前进程的峰值内存（MB），不支持的平台返回None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 上单位为KB，macOS 上单位为字节
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _measure_detect(pdf_path: str, engine: str) -> dict:
+    """子进程中执行：测量所有页面的内容检测耗时"""
+    import fitz
+    from pdf_cropper import find_content_bounding_box
+
+    start = time.perf_counter()
+    with fitz.open(pdf_path) as doc:
+        page_cnt = len(doc)
+        for page in doc:
+            find_content_bounding_box(page, 5, engine)
+    elapsed = time.perf_counter() - start
+    return {"pages": page_cnt, "elapsed": elapsed, "peak_rss_mb": _peak_rss_mb(), "output_bytes": None}
+
+
+def _measure_crop(pdf_path: str, engine: str, export_per_page: bool) -> dict:
+    """子进程中执行：测量 crop_pdf 的耗时和输出大小"""
+    from pdf_cropper import CropOptions, crop_pdf
+
+    suffix = f"_bench_{engine}"
+    result = crop_pdf(pdf_path, CropOptions(suffix=suffix, engine=engine, export_per_page=export_per_page))
+    if not result.ok:
+        raise RuntimeError(result.error)
+    output_bytes = sum(os.path.getsize(path) for path in result.output_paths)
+    for path in result.output_paths:
+        os.remove(path)
+    return {"pages": len(result.pages), "elapsed": result.timings["total"], "peak_rss_mb": _peak_rss_mb(), "output_bytes": output_bytes}
+
+
+def _run_isolated(func, *args) -> dict:
+    """在新的子进程中执行一次测量"""
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        return pool.apply(func, args)
+
+
+def run_benchmarks(cases: list[Case], engines: list[str], corpus_dir: str, repeat: int = 1) -> list[dict]:
+    """运行所有测量，每项重复 repeat 次并取最快的一次"""
+    rows = []
+    for case in cases:
+        pdf_path = os.path.join(corpus_dir, f"{case.name}.pdf")
+        if not os.path.exists(pdf_path):
+            make_pdf(pdf_path, case.pages, case.text_blocks, case.images, case.paths, case.background)
+        input_bytes = os.path.getsize(pdf_path)
+
+        measurements = []
+        for engine in engines:
+            measurements.append(("detect", engine, _measure_detect, (pdf_path, engine)))
+        measurements.append(("crop", engines[0], _measure_crop, (pdf_path, engines[0], False)))
+        measurements.append(("crop_per_page", engines[0], _measure_crop, (pdf_path, engines[0], True)))
+
+        for stage, engine, func, args in measurements:
+            best = min((_run_isolated(func, *args) for _ in range(repeat)), key=lambda m: m["elapsed"])
+            best.update(case=case.name, stage=stage, engine=engine, input_bytes=input_bytes)
+            best["pages_per_s"] = best["pages"] / best["elapsed"] if best["elapsed"] > 0 else None
+            rows.append(best)
+            print(_format_row(best), flush=True)
+    return rows
+
+
+def _format_row(row: dict) -> str:
+    rss = f"{row['peak_rss_mb']:.1f}" if row["peak_rss_mb"] is not None else "-"
+    output = f"{row['output_bytes'] / 1024:.1f}" if row["output_bytes"] is not None else "-"
+    return (f"{row['case']:<14} {row['stage']:<14} {row['engine']:<8} {row['pages']:>6} "
+            f"{row['elapsed']:>9.3f} {row['pages_per_s']:>10.1f} {rss:>9} {output:>11}")
+
+
+def main(argv: list[str] | None = None):
+    from pdf_cropper import DETECTION_ENGINES
+
+    parser = argparse.ArgumentParser(description="pdf_cropper 基准测试")
+    parser.add_argument("--quick", action="store_true", help="使用规模较小的用例")
+    parser.add_argument("--cases", nargs="*", help="只运行指定名称的用例")
+    parser.add_argument("--engines", nargs="*", default=["objects"], choices=list(DETECTION_ENGINES), help="要测量的检测引擎，第一个用于裁剪测量")
+    parser.add_argument("--repeat", type=int, default=1, help="每项测量的重复次数，取最快的一次")
+    parser.add_argument("--corpus_dir", default=None, help="合成PDF的存放目录，默认为临时目录；已存在的文件会被复用")
+    parser.add_argument("--json", default=None, help="将结果写入JSON文件")
+    args = parser.parse_args(argv)
+
+    cases = QUICK_CASES if args.quick else CASES
+    if args.cases:
+        cases = [case for case in cases if case.name in args.cases]
+
+    print(f"{'case':<14} {'stage':<14} {'engine':<8} {'pages':>6} {'seconds':>9} {'pages/s':>10} {'rss(MB)':>9} {'output(KB)':>11}")
+    if args.corpus_dir:
+        os.makedirs(args.corpus_dir, exist_ok=True)
+        rows = run_benchmarks(cases, args.engines, args.corpus_dir, args.repeat)
+    else:
+        with tempfile.TemporaryDirectory() as corpus_dir:
+            rows = run_benchmarks(cases, args.engines, corpus_dir, args.repeat)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""入口程序的冷启动基准测试
+
+在新的 Python 进程中分别测量各入口的启动耗时（取多次运行的中位数），用于跟踪导入开销：
+  * pdf_cropper.py 的 --help、参数错误和仅导入模块，这些情况都不需要导入 PyMuPDF
+  * 第一次使用 fitz 的额外耗时
+  * crop_client.py --help
+  * main_app 模块的导入（即显示窗口之前的部分，需要安装 customtkinter 和 tkinterdnd2）
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --repeat 20 --importtime --json startup.json
+"""
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (名称, 命令行参数, 需要的可选模块)
+CASES = [
+    ("python", ["-c", "pass"], None),
+    ("cli_help", [os.path.join(ROOT_DIR, "pdf_cropper.py"), "--help"], None),
+    ("cli_bad_args", [os.path.join(ROOT_DIR, "pdf_cropper.py"), "--engine", "bogus"], None),
+    ("import_pdf_cropper", ["-c", "import pdf_cropper"], None),
+    ("import_pdf_cropper_fitz", ["-c", "import pdf_cropper; pdf_cropper.fitz.load()"], None),
+    ("client_help", [os.path.join(ROOT_DIR, "crop_client.py"), "--help"], None),
+    ("import_main_app", ["-c", "import main_app"], "customtkinter"),
+]
+
+
+def _run_once(args: list[str], importtime: bool = False) -> tuple[float, str]:
+    """运行一次，返回 (耗时, 标准错误)；退出码不检查，参数错误的用例本来就以非0退出"""
+    command = [sys.executable, *(["-X", "importtime"] if importtime else []), *args]
+    start = time.perf_counter()
+    completed = subprocess.run(command, cwd=ROOT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    return time.perf_counter() - start, completed.stderr
+
+
+def _top_imports(stderr: str, count: int) -> list[tuple[str, float]]:
+    """从 -X importtime 的输出中找出累计耗时最多的顶层导入（毫秒）"""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "): # 只统计顶层导入，子模块已经计入上层
+            imports.append((name.strip(), int(cumulative) / 1000))
+    return sorted(imports, key=lambda item: item[1], reverse=True)[:count]
+
+
+def run_benchmarks(repeat: int, importtime: bool) -> list[dict]:
+    rows = []
+    for name, args, requires in CASES:
+        if requires and importlib.util.find_spec(requires) is None:
+            print(f"{name:<26} 跳过（未安装 {requires}）")
+            continue
+        _run_once(args) # 预热文件系统缓存
+        samples = [_run_once(args)[0] for _ in range(repeat)]
+        row = {"case": name, "median_ms": statistics.median(samples) * 1000, "min_ms": min(samples) * 1000}
+        print(f"{name:<26} {row['median_ms']:>10.1f} {row['min_ms']:>10.1f}", flush=True)
+        if importtime:
+            row["top_imports"] = _top_imports(_run_once(args, importtime=True)[1], 5)
+            for module, ms in row["top_imports"]:
+                print(f"    {module:<30} {ms:>8.1f} ms")
+        rows.append(row)
+    return rows
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="入口程序的冷启动基准测试")
+    parser.add_argument("--repeat", type=int, default=10, help="每个用例运行的次数，取中位数")
+    parser.add_argument("--importtime", action="store_true", help="额外用 -X importtime 列出每个用例中耗时最多的导入")
+    parser.add_argument("--json", default=None, help="将结果写入JSON文件")
+    args = parser.parse_args(argv)
+
+    print(f"{'case':<26} {'median(ms)':>10} {'min(ms)':>10}")
+    rows = run_benchmarks(args.repeat, args.importtime)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
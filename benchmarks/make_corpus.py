@@ -0,0 +1,90 @@
+"""生成用于基准测试的参数化合成PDF
+
+页面内容直接写入内容流，10万级别的矢量路径也能在数秒内生成。
+"""
+import argparse
+import os
+import random
+
+import fitz
+
+PAGE_WIDTH, PAGE_HEIGHT = 960, 540 # 与PowerPoint 16:9 导出的页面尺寸一致
+
+
+def _append_content(doc: fitz.Document, page: fitz.Page, content: bytes):
+    """将一段内容流追加到页面的 /Contents 末尾"""
+    xref = doc.get_new_xref()
+    doc.update_object(xref, "<<>>")
+    doc.update_stream(xref, content)
+    contents = page.get_contents() + [xref]
+    doc.xref_set_key(page.xref, "Contents", "[" + " ".join(f"{x} 0 R" for x in contents) + "]")
+
+
+def _random_rect(rng: random.Random, max_size: float) -> fitz.Rect:
+    """在页面中部 (留出四周空白) 随机生成一个矩形"""
+    x0 = rng.uniform(PAGE_WIDTH * 0.15, PAGE_WIDTH * 0.85 - max_size)
+    y0 = rng.uniform(PAGE_HEIGHT * 0.15, PAGE_HEIGHT * 0.85 - max_size)
+    return fitz.Rect(x0, y0, x0 + rng.uniform(2, max_size), y0 + rng.uniform(2, max_size))
+
+
+def make_pdf(path: str, pages: int = 1, text_blocks: int = 0, images: int = 0, paths: int = 0,
+             background: bool = False, seed: int = 0) -> str:
+    """生成一个合成PDF文件
+
+    Args:
+        path (str): 输出路径
+        pages (int): 页数
+        text_blocks (int): 每页的文本块数量
+        images (int): 每页嵌入的图片数量（每张图片都是独立的图片对象）
+        paths (int): 每页的矢量路径数量
+        background (bool): 是否像PowerPoint一样先绘制一个覆盖整页的白色矩形
+        seed (int): 随机数种子，相同参数生成相同的文件
+
+    Returns:
+        str: 输出路径
+    """
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        if background:
+            _append_content(doc, page, f"q 1 1 1 rg 0 -0.0001 {PAGE_WIDTH} {PAGE_HEIGHT} re f Q\n".encode())
+        if paths:
+            # PDF内容流的坐标原点在左下角
+            ops = ["q 0.5 w"]
+            for _ in range(paths):
+                rect = _random_rect(rng, 40)
+                r, g, b = rng.random(), rng.random(), rng.random()
+                ops.append(f"{r:.3f} {g:.3f} {b:.3f} RG {rect.x0:.2f} {PAGE_HEIGHT - rect.y1:.2f} {rect.width:.2f} {rect.height:.2f} re S")
+            ops.append("Q\n")
+            _append_content(doc, page, "\n".join(ops).encode())
+        for _ in range(images):
+            pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 32, 32), False)
+            pix.set_rect(pix.irect, (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+            page.insert_image(_random_rect(rng, 80), pixmap=pix)
+        for _ in range(text_blocks):
+            rect = _random_rect(rng, 60)
+            page.insert_text(rect.bl, f"Block {rng.randrange(10000)}", fontsize=rng.choice((8, 10, 12)))
+    doc.save(path, garbage=1, deflate=True)
+    doc.close()
+    return path
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="生成用于基准测试的合成PDF")
+    parser.add_argument("output", help="输出PDF文件路径")
+    parser.add_argument("--pages", type=int, default=1, help="页数")
+    parser.add_argument("--text_blocks", type=int, default=0, help="每页的文本块数量")
+    parser.add_argument("--images", type=int, default=0, help="每页嵌入的图片数量")
+    parser.add_argument("--paths", type=int, default=0, help="每页的矢量路径数量")
+    parser.add_argument("--background", action="store_true", help="绘制PowerPoint风格的整页背景矩形")
+    parser.add_argument("--seed", type=int, default=0, help="随机数种子")
+    args = parser.parse_args(argv)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    make_pdf(args.output, args.pages, args.text_blocks, args.images, args.paths, args.background, args.seed)
+    print(f"已生成: {args.output} ({os.path.getsize(args.output)} 字节)")
+
+
+if __name__ == "__main__":
+    main()
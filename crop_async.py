@@ -0,0 +1,164 @@
+"""asyncio 接口
+
+裁剪在执行器（默认为预热的进程池）中完成，事件循环只负责等待，适合在异步 Web 服务中调用：
+
+    result = await crop_async("fig.pdf", CropOptions(margin=5))
+    output, result = await crop_async(uploaded_bytes)
+
+    async with AsyncCropper(max_concurrency=4) as cropper:
+        async for page in cropper.iter_pages("slides.pdf"):
+            ...
+
+同时进行的任务数超过上限时，新的调用在 await 处等待空位，不会在执行器中无限排队。
+取消等待中的任务时，裁剪在当前页处理完后停止，空位在子进程真正结束后才释放。
+"""
+import asyncio
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import AsyncIterator, BinaryIO
+
+from pdf_cropper import CropOptions, CropResult, PageResult, _init_worker, crop_pdf, crop_pdf_bytes, logger
+
+
+def _run_job(source, options: CropOptions | None, progress_queue=None, cancel=None):
+    """在执行器中运行的裁剪任务：路径调用 crop_pdf，PDF数据调用 crop_pdf_bytes"""
+    progress = progress_queue.put if progress_queue is not None else None
+    if isinstance(source, (str, os.PathLike)):
+        return crop_pdf(os.fspath(source), options, progress, cancel)
+    return crop_pdf_bytes(source, options, progress=progress, cancel=cancel)
+
+
+class AsyncCropper:
+    """在执行器中运行裁剪任务，限制同时进行的任务数
+
+    Args:
+        max_concurrency (int): 同时进行的任务数上限，0 表示使用CPU核心数；也是默认进程池的进程数
+        executor (Executor | None): 执行裁剪的执行器，为None时创建进程池并在 aclose() 时关闭；
+            传入的执行器由调用方负责关闭
+    """
+
+    def __init__(self, max_concurrency: int = 0, executor: Executor | None = None):
+        self.max_concurrency = max_concurrency if max_concurrency > 0 else (os.cpu_count() or 1)
+        self._owns_executor = executor is None
+        if executor is None:
+            executor = ProcessPoolExecutor(max_workers=self.max_concurrency, initializer=_init_worker,
+                                           initargs=(logger.getEffectiveLevel(),))
+        self.executor = executor
+        # 线程池可以直接共享 Event 和 Queue；进程池需要通过 Manager 进程传递，首次使用时才启动
+        self._threaded = isinstance(executor, ThreadPoolExecutor)
+        self._manager = None
+        self._lock = threading.Lock()
+        self._slots = None
+        self._slots_loop = None
+
+    async def __aenter__(self) -> "AsyncCropper":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # Semaphore 只能在一个事件循环中使用，换了事件循环（如多次 asyncio.run）时重新创建
+        loop = asyncio.get_running_loop()
+        if self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+            self._slots_loop = loop
+        return self._slots
+
+    def _sync_objects(self, with_queue: bool) -> tuple:
+        """返回 (取消标记, 进度队列)，不需要队列时为None"""
+        if self._threaded:
+            return threading.Event(), queue.Queue() if with_queue else None
+        with self._lock:
+            if self._manager is None:
+                self._manager = multiprocessing.Manager()
+        return self._manager.Event(), self._manager.Queue() if with_queue else None
+
+    async def _read_source(self, source):
+        # 文件对象不能传到子进程，先在线程中读出数据
+        if hasattr(source, "read"):
+            return await asyncio.get_running_loop().run_in_executor(None, source.read)
+        return source
+
+    async def crop(self, source: str | os.PathLike | bytes | BinaryIO, options: CropOptions | None = None):
+        """裁剪一个PDF
+
+        Args:
+            source (str | os.PathLike | bytes | BinaryIO): 输入PDF文件路径，或PDF数据、可读取的二进制文件对象
+            options (CropOptions | None): 裁剪参数，为None时使用默认值
+
+        Returns:
+            CropResult | tuple[bytes | list[bytes] | None, CropResult]: 输入为路径时与 crop_pdf 相同，否则与 crop_pdf_bytes 相同
+        """
+        async with self._semaphore():
+            source = await self._read_source(source)
+            loop = asyncio.get_running_loop()
+            cancel, _ = await loop.run_in_executor(None, self._sync_objects, False)
+            future = loop.run_in_executor(self.executor, _run_job, source, options, None, cancel)
+            return await _await_job(future, cancel)
+
+    async def iter_pages(self, source: str | os.PathLike | bytes | BinaryIO, options: CropOptions | None = None) -> AsyncIterator[PageResult]:
+        """裁剪一个PDF，每处理完一页产出该页的结果
+
+        提前结束迭代（break 或取消）时裁剪在当前页后停止。需要裁剪后的PDF数据时使用 crop()。
+
+        Raises:
+            RuntimeError: 裁剪失败，消息为 CropResult.error
+        """
+        async with self._semaphore():
+            source = await self._read_source(source)
+            loop = asyncio.get_running_loop()
+            cancel, pages = await loop.run_in_executor(None, self._sync_objects, True)
+            future = loop.run_in_executor(self.executor, _run_job, source, options, pages, cancel)
+            # 任务结束（包括出错）后放入结束标记，读取队列的线程不会一直阻塞
+            future.add_done_callback(lambda _: pages.put(None))
+            try:
+                while (page := await loop.run_in_executor(None, pages.get)) is not None:
+                    yield page
+                output = await future
+            finally:
+                if not future.done():
+                    cancel.set()
+                    await asyncio.wait([future])
+        result = output if isinstance(output, CropResult) else output[1]
+        if not result.ok:
+            raise RuntimeError(result.error)
+
+    async def aclose(self):
+        """关闭自己创建的进程池和 Manager 进程，等待执行中的任务结束"""
+        loop = asyncio.get_running_loop()
+        if self._owns_executor:
+            await loop.run_in_executor(None, self.executor.shutdown)
+        if self._manager is not None:
+            await loop.run_in_executor(None, self._manager.shutdown)
+            self._manager = None
+
+
+async def _await_job(future: asyncio.Future, cancel):
+    """等待执行器中的任务；等待方被取消时通知任务在下一页前停止，并等到任务真正结束再传出取消"""
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        cancel.set()
+        await asyncio.wait([future])
+        raise
+
+
+_default_cropper = None
+
+
+async def crop_async(source: str | os.PathLike | bytes | BinaryIO, options: CropOptions | None = None,
+                     cropper: AsyncCropper | None = None):
+    """异步裁剪一个PDF，参数和返回值见 AsyncCropper.crop
+
+    未指定 cropper 时使用进程内共享的默认实例，首次调用时创建进程池，进程退出时关闭。
+    """
+    global _default_cropper
+    if cropper is None:
+        if _default_cropper is None:
+            _default_cropper = AsyncCropper()
+        cropper = _default_cropper
+    return await cropper.crop(source, options)
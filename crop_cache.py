@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import sqlite3
+import time
+
+from crop_lazy import lazy_import
+
+fitz = lazy_import("fitz")
+
+# 缓存格式版本，检测逻辑变化导致结果不同时递增，使旧缓存自动失效
+CACHE_VERSION = 4
+
+# 对象定义中的间接引用，如 "12 0 R"；/Parent 指向页面树，不属于页面内容
+_REF_PATTERN = re.compile(rb"(/Parent\s+)?(\d+)\s+\d+\s+R\b")
+
+
+def default_cache_dir() -> str:
+    """返回默认的缓存目录，可通过环境变量 PDF_CROP_CACHE_DIR 覆盖"""
+    env_dir = os.environ.get("PDF_CROP_CACHE_DIR")
+    if env_dir:
+        return env_dir
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "pdf-white-crop")
+
+
+def page_content_key(page: fitz.Page, engine: str) -> str:
+    """根据页面的内容流和资源计算内容哈希，作为缓存键
+
+    哈希覆盖页面尺寸、旋转、内容流以及 /Resources 递归引用的全部对象（字体、图片、表单等），
+    流对象直接使用未解压的原始数据，不需要解释内容流。每个对象的哈希和引用按文档记录，
+    多个页面共享的字体、图片等只读取和计算一次。
+
+    Args:
+        page (fitz.Page): 输入页面对象
+        engine (str): 内容检测引擎，不同引擎的结果分别缓存
+
+    Returns:
+        str: 十六进制的哈希值
+    """
+    doc = page.parent
+    # 记录在文档对象上，随文档一起释放；重新打开的文档（如流式处理）重新计算
+    memo = getattr(doc, "_crop_xref_digests", None)
+    if memo is None:
+        memo = {}
+        doc._crop_xref_digests = memo
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"v{CACHE_VERSION}|{engine}|{tuple(page.rect)}|{tuple(page.mediabox)}|{page.rotation}|".encode())
+
+    for xref in page.get_contents():
+        digest.update(_xref_digest(doc, xref, memo, stream_only=True)[0])
+
+    # /Resources 可能是页面字典中的直接对象、间接引用，或继承自父节点
+    node = page.xref
+    kind, value = doc.xref_get_key(node, "Resources")
+    while kind == "null":
+        parent_kind, parent = doc.xref_get_key(node, "Parent")
+        if parent_kind != "xref":
+            break
+        node = int(parent.split()[0])
+        kind, value = doc.xref_get_key(node, "Resources")
+    resources = value.encode()
+    digest.update(resources)
+
+    visited = set()
+    pending = _refs(resources)
+    while pending:
+        xref = pending.pop()
+        if xref in visited:
+            continue
+        visited.add(xref)
+        xref_digest, refs = _xref_digest(doc, xref, memo)
+        digest.update(xref_digest)
+        pending.extend(refs)
+    return digest.hexdigest()
+
+
+def _refs(source: bytes) -> list[int]:
+    """对象定义中引用的对象编号，不含指向页面树的 /Parent"""
+    return [int(match.group(2)) for match in _REF_PATTERN.finditer(source) if match.group(1) is None]
+
+
+def _xref_digest(doc: fitz.Document, xref: int, memo: dict, stream_only: bool = False) -> tuple[bytes, list[int]]:
+    """返回对象定义和原始流数据的哈希，以及它引用的对象，结果记录在 memo 中"""
+    key = (xref, stream_only)
+    entry = memo.get(key)
+    if entry is None:
+        digest = hashlib.blake2b(digest_size=20)
+        refs = []
+        if not stream_only:
+            source = doc.xref_object(xref, compressed=True).encode()
+            digest.update(source)
+            refs = _refs(source)
+        if stream_only or doc.xref_is_stream(xref):
+            digest.update(doc.xref_stream_raw(xref) or b"")
+        entry = memo[key] = (digest.digest(), refs)
+    return entry
+
+
+class CropBoxCache:
+    """基于 SQLite 的持久化裁剪框缓存
+
+    以页面内容哈希为键，保存不含内边距的内容外接矩形，因此修改内边距后依然可以命中缓存。
+    数据库超过大小上限时按最近使用时间淘汰最旧的条目。
+    对象可以被 pickle 传递到子进程，数据库连接在首次使用时于各进程中分别打开。
+    """
+
+    def __init__(self, cache_dir: str | None = None, max_size_mb: float = 64):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.path = os.path.join(self.cache_dir, "crop_boxes.sqlite3")
+        self._conn = None
+        # 新条目和命中时的使用时间先记录在内存中，flush() 时在一个短事务中写入，
+        # 处理文件期间不持有数据库的写锁，多个进程共用缓存时不会相互阻塞
+        self._pending = {}
+        self._touched = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_conn"] = None
+        state["_pending"] = {}
+        state["_touched"] = {}
+        return state
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL") # 允许多个进程同时读写
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS boxes ("
+                "key TEXT PRIMARY KEY, x0 REAL, y0 REAL, x1 REAL, y1 REAL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS boxes_last_used ON boxes(last_used)")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key: str) -> tuple[bool, fitz.Rect | None]:
+        """查询缓存
+
+        Returns:
+            tuple[bool, fitz.Rect | None]: (是否命中, 内容外接矩形，页面没有内容时为None)
+        """
+        row = self._pending.get(key)
+        if row is None:
+            row = self._connect().execute("SELECT x0, y0, x1, y1 FROM boxes WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return False, None
+            self._touched[key] = time.time()
+        return True, None if row[0] is None else fitz.Rect(row)
+
+    def put(self, key: str, content_rect: fitz.Rect | None):
+        """写入页面的内容外接矩形，None 表示页面没有内容"""
+        self._pending[key] = tuple(content_rect) if content_rect is not None else (None, None, None, None)
+        if len(self._pending) >= 1000: # 页数很多的文件中途也写入一次，限制内存占用
+            self.flush()
+
+    def flush(self):
+        """在一个短事务中写入缓冲的修改，并在超过大小上限时淘汰最旧的条目"""
+        if not self._pending and not self._touched:
+            return
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO boxes (key, x0, y0, x1, y1, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                [(key, *values, now) for key, values in self._pending.items()],
+            )
+            conn.executemany("UPDATE boxes SET last_used = ? WHERE key = ?",
+                             [(last_used, key) for key, last_used in self._touched.items()])
+        written = bool(self._pending)
+        self._pending.clear()
+        self._touched.clear()
+        if written:
+            self._evict()
+
+    def _evict(self):
+        conn = self._conn
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        free_count = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        used_bytes = (page_count - free_count) * page_size
+        if used_bytes <= self.max_size_bytes:
+            return
+        # 淘汰到上限的 3/4，避免每次写入都触发淘汰
+        row_count = conn.execute("SELECT COUNT(*) FROM boxes").fetchone()[0]
+        evict_count = row_count - int(row_count * self.max_size_bytes * 0.75 / used_bytes)
+        conn.execute(
+            "DELETE FROM boxes WHERE key IN (SELECT key FROM boxes ORDER BY last_used LIMIT ?)",
+            (max(evict_count, 1),),
+        )
+        conn.commit()
+
+    def clear(self):
+        """清空缓存"""
+        self._pending.clear()
+        self._touched.clear()
+        conn = self._connect()
+        conn.execute("DELETE FROM boxes")
+        conn.commit()
+
+    def close(self):
+        self.flush() # 只写入过、从未查询时连接尚未打开，也要写入缓冲的条目
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,129 @@
+"""crop_server 的轻量客户端
+
+只依赖标准库，不导入 fitz，启动开销与一个空的 Python 进程相当，适合在 Makefile/latexmk 中按图调用：
+
+    python crop_client.py fig.pdf --margin 5
+
+服务未运行时默认退回在当前进程中直接裁剪，构建规则无需关心服务是否启动；
+已连接上服务后超时或连接中断则直接报错，以免与服务同时写入输出文件。
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+
+# 可以随任务传递给服务的裁剪参数，与 pdf_cropper.CropOptions 的字段同名
+JOB_OPTION_FIELDS = ("suffix", "margin", "export_per_page", "engine", "save_mode", "dry_run", "stream_window")
+
+
+class ServiceUnavailable(OSError):
+    """没有服务在监听：socket 文件不存在或连接被拒绝，任务一个都没有发送"""
+
+
+def default_socket_path() -> str:
+    """返回默认的 Unix socket 路径，可通过环境变量 PDF_CROP_SOCKET 覆盖"""
+    env_path = os.environ.get("PDF_CROP_SOCKET")
+    if env_path:
+        return env_path
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "pdf-white-crop.sock")
+    user = os.getuid() if hasattr(os, "getuid") else os.environ.get("USERNAME", "user")
+    return os.path.join(tempfile.gettempdir(), f"pdf-white-crop-{user}.sock")
+
+
+def submit_jobs(jobs: list[dict], socket_path: str | None = None, timeout: float | None = None) -> list[dict]:
+    """通过一个连接提交多个任务，按提交顺序返回每个任务的响应
+
+    Args:
+        jobs (list[dict]): 任务，如 {"input": "/abs/fig.pdf", "options": {"margin": 5}}
+        socket_path (str | None): 服务的 socket 路径，为None时使用 default_socket_path()
+        timeout (float | None): 连接和等待响应的超时时间（秒）
+
+    Returns:
+        list[dict]: 每个任务的响应，见 crop_server.CropServer.submit
+
+    Raises:
+        ServiceUnavailable: 服务未运行，任务没有发送
+        OSError: 连接后超时或连接中断，服务可能仍在处理已发送的任务
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        raise ServiceUnavailable("当前平台不支持 Unix socket")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(socket_path or default_socket_path())
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            raise ServiceUnavailable(str(e)) from e
+        sock.sendall("".join(json.dumps(job, ensure_ascii=False) + "\n" for job in jobs).encode("utf-8"))
+        sock.shutdown(socket.SHUT_WR)
+        with sock.makefile("r", encoding="utf-8") as reader:
+            responses = [json.loads(line) for line in reader if line.strip()]
+    if len(responses) != len(jobs):
+        raise ConnectionError(f"服务只返回了 {len(responses)}/{len(jobs)} 个结果")
+    return responses
+
+
+def _crop_locally(jobs: list[dict]) -> list[dict]:
+    """服务不可用时在当前进程中裁剪，返回与服务相同格式的响应"""
+    from pdf_cropper import CropOptions, crop_pdf
+
+    responses = []
+    for job in jobs:
+        result = crop_pdf(job["input"], CropOptions(**job["options"]))
+        responses.append({"id": job["id"], "ok": result.ok, "error": result.error, "result": result.to_dict()})
+    return responses
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="向 crop_server 提交裁剪任务")
+    parser.add_argument("inputs", nargs="+", help="输入PDF文件")
+    parser.add_argument("--socket", default=None, help="服务的 Unix socket 路径，默认由 PDF_CROP_SOCKET 或运行时目录决定")
+    parser.add_argument("--timeout", type=float, default=None, help="等待服务响应的超时时间（秒）")
+    parser.add_argument("--no-fallback", dest="fallback", action="store_false", help="服务不可用时直接报错，而不是在本进程中裁剪")
+    parser.add_argument("--json", action="store_true", help="以JSON格式输出每个任务的响应")
+    parser.add_argument("--quiet", "-q", action="store_true", help="只输出错误")
+    # 未指定的参数不随任务发送，由服务使用默认值
+    parser.add_argument("--suffix", default=argparse.SUPPRESS, help="裁剪后文件的后缀")
+    parser.add_argument("--margin", type=int, default=argparse.SUPPRESS, help="裁剪时的内边距，单位为点")
+    parser.add_argument("--export_per_page", action="store_true", default=argparse.SUPPRESS, help="是否为每一页单独导出裁剪后的PDF")
+    parser.add_argument("--engine", default=argparse.SUPPRESS, help="内容检测引擎")
+    parser.add_argument("--save_mode", default=argparse.SUPPRESS, help="保存方式")
+    parser.add_argument("--stream_window", type=int, default=argparse.SUPPRESS, help="流式处理的窗口页数")
+    parser.add_argument("--dry-run", dest="dry_run", action="store_true", default=argparse.SUPPRESS, help="只计算裁剪框，不写入任何PDF文件")
+    args = parser.parse_args(argv)
+
+    options = {name: getattr(args, name) for name in JOB_OPTION_FIELDS if hasattr(args, name)}
+    # 服务的工作目录与客户端不同，统一发送绝对路径
+    jobs = [{"id": i, "input": os.path.abspath(path), "options": options} for i, path in enumerate(args.inputs)]
+    try:
+        responses = submit_jobs(jobs, args.socket, args.timeout)
+    except ServiceUnavailable as e:
+        if not args.fallback:
+            print(f"无法连接到裁剪服务: {e}", file=sys.stderr)
+            return 1
+        responses = _crop_locally(jobs)
+    except OSError as e:
+        # 任务已经发送，服务可能仍在写入输出文件，不能再在本地裁剪同一批文件
+        print(f"等待裁剪服务的响应失败: {e}", file=sys.stderr)
+        return 1
+
+    failures = 0
+    for response in responses:
+        if args.json:
+            print(json.dumps(response, ensure_ascii=False))
+        if not response["ok"]:
+            failures += 1
+            if not args.json:
+                input_path = args.inputs[response["id"]]
+                print(f"处理文件 {input_path} 时发生错误: {response['error']}", file=sys.stderr)
+        elif not args.json and not args.quiet:
+            for output_path in response["result"]["output_paths"]:
+                print(f"裁剪后的PDF已保存到: {output_path}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,356 @@
+"""本地 HTTP 裁剪服务
+
+启动时预先创建并预热进程池，每个请求把上传的PDF交给空闲的子进程裁剪，全程不落盘：
+
+    python crop_http.py --port 8765 --jobs 4 --queue 8 --timeout 60
+
+    curl --data-binary @in.pdf "http://127.0.0.1:8765/crop?margin=5" -o out.pdf
+    curl --data-binary @in.pdf "http://127.0.0.1:8765/boxes"
+
+接口：
+    POST /crop     请求体为PDF，返回裁剪后的PDF；export_per_page=1 时返回每页一个PDF的 zip
+    POST /boxes    请求体为PDF，只计算裁剪框，返回 CropResult.to_dict() 的JSON
+    GET  /health   进程池和队列的状态
+    GET  /metrics  Prometheus 格式的请求计数和耗时
+
+裁剪参数通过查询字符串传递（margin、engine、save_mode、export_per_page），另外可以用 timeout 指定更短的时限。
+正在处理和排队的请求达到 jobs + queue 个时直接返回 503，不在内存中无限堆积上传的数据；
+超过时限的请求返回 504，子进程在当前页处理完后停止；卡在一页中间的子进程在时限之后被杀死，进程池随即重建。
+"""
+import argparse
+import dataclasses
+import io
+import json
+import logging
+import math
+import os
+import signal
+import sys
+import threading
+import time
+import zipfile
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from crop_cache import CropBoxCache
+from crop_server import CropServer
+from pdf_cropper import CropOptions, crop_pdf_bytes, logger
+
+# 可以通过查询字符串指定的裁剪参数及其类型
+QUERY_OPTION_TYPES = {"margin": int, "engine": str, "save_mode": str, "export_per_page": bool}
+
+# 子进程可能卡在一页中间而无法及时停止，等待结果时在时限之外多给的时间（秒）
+_TIMEOUT_GRACE = 1.0
+
+
+class _Deadline:
+    """作为 crop_pdf_bytes 的 cancel 参数：到达截止时间后 is_set() 为真，可以被 pickle 传递到子进程"""
+
+    def __init__(self, deadline: float):
+        self.deadline = deadline
+
+    def is_set(self) -> bool:
+        return time.time() >= self.deadline
+
+
+def _crop_upload(data: bytes, options: CropOptions, deadline: float):
+    """在子进程中裁剪上传的PDF
+
+    截止时间只在页与页之间检查，MuPDF 卡在一页中间时无法停止。支持 setitimer 的平台上另设一个定时器，
+    超过截止时间和宽限期后由 SIGALRM 的默认动作直接终止子进程（不需要执行 Python 代码），
+    CropServer 随后重建进程池。
+    """
+    alarm = hasattr(signal, "setitimer") and deadline != float("inf")
+    if alarm:
+        signal.signal(signal.SIGALRM, signal.SIG_DFL)
+        signal.setitimer(signal.ITIMER_REAL, max(deadline - time.time(), 0) + 2 * _TIMEOUT_GRACE)
+    try:
+        return crop_pdf_bytes(data, options, name="upload", cancel=_Deadline(deadline))
+    finally:
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def _parse_bool(value: str) -> bool:
+    if value.lower() in ("1", "true", "yes", "on"):
+        return True
+    if value.lower() in ("0", "false", "no", "off"):
+        return False
+    raise ValueError(f"无效的布尔值: {value}")
+
+
+class RequestRejected(Exception):
+    """请求无法处理，status 为返回的 HTTP 状态码"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class CropHTTPService:
+    """在 CropServer 的进程池上处理 HTTP 请求，限制排队数量和每个请求的时限
+
+    Args:
+        server (CropServer): 持有进程池和默认裁剪参数
+        queue_size (int): 除正在处理的请求外最多排队的请求数
+        timeout (float): 每个请求的最长处理时间（秒），0 表示不限制
+        max_body (int): 上传PDF的最大字节数
+    """
+
+    def __init__(self, server: CropServer, queue_size: int = 0, timeout: float = 60.0, max_body: int = 256 * 1024 * 1024):
+        self.server = server
+        self.capacity = server.jobs + max(queue_size, 0)
+        self.timeout = timeout
+        self.max_body = max_body
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.started = time.time()
+        self.requests = {} # (接口, 状态码) -> 次数
+        self.seconds = {} # 接口 -> 累计耗时
+        self.pages = 0
+
+    def options_from_query(self, query: dict[str, list[str]]) -> tuple[CropOptions, float]:
+        """把查询字符串转换为裁剪参数和本次请求的时限"""
+        requested = {}
+        timeout = self.timeout
+        for name, values in query.items():
+            value = values[-1]
+            if name == "timeout":
+                requested_timeout = float(value)
+                # 0 在服务端表示不限制，不允许客户端借此关闭时限
+                if not requested_timeout > 0 or math.isinf(requested_timeout):
+                    raise ValueError(f"timeout 必须是正数: {value}")
+                timeout = requested_timeout if not self.timeout else min(requested_timeout, self.timeout)
+            elif name in QUERY_OPTION_TYPES:
+                requested[name] = _parse_bool(value) if QUERY_OPTION_TYPES[name] is bool else QUERY_OPTION_TYPES[name](value)
+            else:
+                raise ValueError(f"不支持的参数: {name}")
+        return dataclasses.replace(self.server.options, **requested), timeout
+
+    def crop(self, data: bytes, options: CropOptions, timeout: float):
+        """在进程池中裁剪，返回 crop_pdf_bytes 的结果
+
+        Raises:
+            RequestRejected: 队列已满（503）、超过时限（504）或子进程异常退出（500）
+        """
+        if not self._slots.acquire(blocking=False):
+            raise RequestRejected(503, "服务繁忙，请稍后重试")
+        with self._lock:
+            self.in_flight += 1
+        deadline = time.time() + timeout if timeout else float("inf")
+        try:
+            future = self.server.run(_crop_upload, data, options, deadline)
+        except Exception:
+            self._release(None)
+            raise
+        # 空位在子进程真正结束后才释放，超时返回的请求仍然计入队列
+        future.add_done_callback(self._release)
+        try:
+            output, result = future.result(timeout + _TIMEOUT_GRACE if timeout else None)
+        except FutureTimeoutError:
+            raise RequestRejected(504, f"处理超过 {timeout} 秒")
+        except BrokenProcessPool:
+            # 只有子进程在处理本请求时退出才会到这里（CropServer 不会重新提交这样的任务），多半是上传的文件本身导致的；
+            # 超过时限后被定时器终止的也属于这种情况。同时受到牵连的其他请求已经在重建的进程池中重新执行
+            if time.time() >= deadline:
+                raise RequestRejected(504, f"处理超过 {timeout} 秒")
+            raise RequestRejected(500, "处理该文件时工作进程异常退出")
+        if not result.ok and time.time() >= deadline:
+            raise RequestRejected(504, f"处理超过 {timeout} 秒")
+        with self._lock:
+            self.pages += len(result.pages)
+        return output, result
+
+    def _release(self, future):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def record(self, endpoint: str, status: int, seconds: float):
+        with self._lock:
+            self.requests[endpoint, status] = self.requests.get((endpoint, status), 0) + 1
+            self.seconds[endpoint] = self.seconds.get(endpoint, 0.0) + seconds
+
+    def health(self) -> dict:
+        """返回服务状态；有空闲的子进程时提交一个空任务，确认进程池可用（已损坏时随之重建）"""
+        pool = "busy"
+        if self.in_flight < self.server.jobs:
+            try:
+                self.server.run(os.getpid).result(5)
+                pool = "ok"
+            except Exception as e:
+                logger.warning("进程池不可用: %s", e)
+                pool = "broken"
+        with self._lock:
+            return {"ok": pool != "broken", "pool": pool, "workers": self.server.jobs, "in_flight": self.in_flight,
+                    "capacity": self.capacity, "pool_restarts": self.server.restarts, "uptime": time.time() - self.started}
+
+    def metrics(self) -> str:
+        """返回 Prometheus 文本格式的指标"""
+        with self._lock:
+            lines = [
+                "# HELP pdf_cropper_http_requests_total HTTP requests by endpoint and status code.",
+                "# TYPE pdf_cropper_http_requests_total counter",
+            ]
+            for (endpoint, status), count in sorted(self.requests.items()):
+                lines.append(f'pdf_cropper_http_requests_total{{endpoint="{endpoint}",code="{status}"}} {count}')
+            lines += [
+                "# HELP pdf_cropper_http_request_seconds_total Time spent handling requests by endpoint.",
+                "# TYPE pdf_cropper_http_request_seconds_total counter",
+            ]
+            for endpoint, seconds in sorted(self.seconds.items()):
+                lines.append(f'pdf_cropper_http_request_seconds_total{{endpoint="{endpoint}"}} {seconds:.6f}')
+            lines += [
+                "# TYPE pdf_cropper_http_pages_total counter",
+                f"pdf_cropper_http_pages_total {self.pages}",
+                "# TYPE pdf_cropper_http_in_flight gauge",
+                f"pdf_cropper_http_in_flight {self.in_flight}",
+                "# TYPE pdf_cropper_http_capacity gauge",
+                f"pdf_cropper_http_capacity {self.capacity}",
+                "# TYPE pdf_cropper_http_workers gauge",
+                f"pdf_cropper_http_workers {self.server.jobs}",
+                "# HELP pdf_cropper_http_pool_restarts_total Process pool rebuilds after a worker exited abnormally.",
+                "# TYPE pdf_cropper_http_pool_restarts_total counter",
+                f"pdf_cropper_http_pool_restarts_total {self.server.restarts}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+def _zip_pages(pages: list[bytes]) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        for page_num, data in enumerate(pages, 1):
+            archive.writestr(f"page{page_num}.pdf", data)
+    return buffer.getvalue()
+
+
+class _CropRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: dict | None = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self._status = status
+
+    def _send_json(self, status: int, data: dict, headers: dict | None = None):
+        self._send(status, json.dumps(data, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8", headers)
+
+    def _handle(self, endpoint: str, handler):
+        service = self.server.service
+        start = time.perf_counter()
+        self._status = 500
+        try:
+            handler(service)
+        except RequestRejected as e:
+            headers = {"Retry-After": "1"} if e.status == 503 else None
+            self._send_json(e.status, {"ok": False, "error": str(e)}, headers)
+        except ValueError as e:
+            self._send_json(400, {"ok": False, "error": str(e)})
+        except Exception as e:
+            logger.exception("处理请求 %s 时发生错误", self.path)
+            self.close_connection = True
+            self._send_json(500, {"ok": False, "error": str(e)})
+        finally:
+            service.record(endpoint, self._status, time.perf_counter() - start)
+
+    def _read_body(self, service: CropHTTPService) -> bytes:
+        length = self.headers.get("Content-Length")
+        if length is None:
+            self.close_connection = True
+            raise RequestRejected(411, "缺少 Content-Length")
+        length = int(length)
+        if length > service.max_body:
+            # 不读取过大的请求体，直接关闭连接
+            self.close_connection = True
+            raise RequestRejected(413, f"上传的PDF超过 {service.max_body} 字节")
+        return self.rfile.read(length)
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == "/health":
+            self._handle("health", lambda service: self._send_json(200 if (health := service.health())["ok"] else 503, health))
+        elif path == "/metrics":
+            self._handle("metrics", lambda service: self._send(200, service.metrics().encode("utf-8"), "text/plain; version=0.0.4"))
+        elif path in ("/crop", "/boxes"):
+            self._send_json(405, {"ok": False, "error": "请使用 POST 上传PDF"}, {"Allow": "POST"})
+        else:
+            self._send_json(404, {"ok": False, "error": f"未知的路径: {path}"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path == "/crop":
+            self._handle("crop", lambda service: self._crop(service, parse_qs(url.query), dry_run=False))
+        elif url.path == "/boxes":
+            self._handle("boxes", lambda service: self._crop(service, parse_qs(url.query), dry_run=True))
+        else:
+            self.close_connection = True
+            self._send_json(404, {"ok": False, "error": f"未知的路径: {url.path}"})
+
+    def _crop(self, service: CropHTTPService, query: dict, dry_run: bool):
+        # 参数错误时也要先读完请求体，连接才能继续使用
+        data = self._read_body(service)
+        options, timeout = service.options_from_query(query)
+        output, result = service.crop(data, dataclasses.replace(options, dry_run=dry_run), timeout)
+        if not result.ok:
+            self._send_json(422, {"ok": False, "error": result.error})
+        elif dry_run:
+            self._send_json(200, result.to_dict())
+        elif options.export_per_page:
+            self._send(200, _zip_pages(output), "application/zip", {"X-Crop-Pages": str(len(result.pages))})
+        else:
+            self._send(200, output, "application/pdf", {"X-Crop-Pages": str(len(result.pages))})
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="本地HTTP裁剪服务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听的地址")
+    parser.add_argument("--port", type=int, default=8765, help="监听的端口")
+    parser.add_argument("--jobs", "-j", type=int, default=0, help="进程池的进程数，0 表示使用全部CPU核心")
+    parser.add_argument("--queue", type=int, default=None, help="除正在处理的请求外最多排队的请求数，默认与进程数相同，超出时返回503")
+    parser.add_argument("--timeout", type=float, default=60.0, help="每个请求的最长处理时间（秒），超出时返回504，0 表示不限制")
+    parser.add_argument("--max_body", type=int, default=256, help="上传PDF的最大大小（MB）")
+    parser.add_argument("--cache_dir", default=None, help="裁剪框缓存目录，默认为用户缓存目录下的 pdf-white-crop")
+    parser.add_argument("--no-cache", dest="use_cache", action="store_false", help="不使用裁剪框缓存")
+    parser.add_argument("--verbose", "-v", action="store_true", help="输出每个请求和每一页的处理日志")
+    parser.add_argument("--quiet", "-q", action="store_true", help="只输出警告和错误")
+    args = parser.parse_args(argv)
+
+    log_level = logging.DEBUG if args.verbose else logging.WARNING if args.quiet else logging.INFO
+    logging.basicConfig(level=log_level, format="%(message)s", stream=sys.stderr)
+    logger.setLevel(log_level)
+
+    cache = CropBoxCache(args.cache_dir) if args.use_cache else None
+    server = CropServer(args.jobs, CropOptions(cache=cache))
+    server.warm_up()
+    queue_size = server.jobs if args.queue is None else args.queue
+    service = CropHTTPService(server, queue_size, args.timeout, args.max_body * 1024 * 1024)
+    try:
+        with ThreadingHTTPServer((args.host, args.port), _CropRequestHandler) as http_server:
+            http_server.daemon_threads = True
+            http_server.service = service
+            logger.info("HTTP裁剪服务已启动: http://%s:%d（%d 个进程，最多 %d 个请求）", args.host, args.port, server.jobs, service.capacity)
+            try:
+                http_server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+    except OSError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        server.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+import socket
+
+# 清单格式版本，格式变化时递增，旧清单中的记录全部视为过期
+MANIFEST_VERSION = 1
+
+
+def write_json_atomic(path: str, data: dict):
+    """先写同目录下的临时文件再替换，中途中断不会损坏已有文件，读取方也不会看到写了一半的内容
+
+    临时文件名包含主机名和进程号，多台机器在共享存储上同时写入不同文件时互不干扰。
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = f"{path}.{socket.gethostname()}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def file_digest(path: str) -> str:
+    """计算文件内容的哈希值"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CropManifest:
+    """记录每个输入文件上次裁剪时的内容、参数和输出文件，用于增量批处理
+
+    判断是否需要重新处理时先比较文件大小和修改时间，二者一致时不读取文件内容；
+    修改时间变化而大小不变时（如重新检出），再比较内容哈希。
+    清单保存为 JSON 文件，写入时先写临时文件再替换，中途中断不会损坏已有清单。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.files = {}
+        self._dirty = False
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                self.files = data.get("files", {})
+
+    def is_current(self, input_path: str, params: dict) -> tuple[bool, list[str]]:
+        """判断输入文件自上次裁剪后是否未变化，且参数相同、输出文件都还存在
+
+        Args:
+            input_path (str): 输入PDF文件路径
+            params (dict): 影响输出的裁剪参数
+
+        Returns:
+            tuple[bool, list[str]]: (是否可以跳过, 上次的输出文件)
+        """
+        entry = self.files.get(os.path.abspath(input_path))
+        if entry is None or entry["params"] != params:
+            return False, []
+        try:
+            stat = os.stat(input_path)
+        except OSError:
+            return False, []
+        if stat.st_size != entry["size"]:
+            return False, []
+        if stat.st_mtime_ns != entry["mtime_ns"]:
+            if file_digest(input_path) != entry["digest"]:
+                return False, []
+            entry["mtime_ns"] = stat.st_mtime_ns # 内容未变，只更新修改时间，下次不必再计算哈希
+            self._dirty = True
+        # 按页导出时逐个检查每一页的输出文件
+        if not all(os.path.exists(path) for path in entry["outputs"]):
+            return False, []
+        return True, list(entry["outputs"])
+
+    def record(self, input_path: str, params: dict, output_paths: list[str]):
+        """记录一次成功的裁剪；在处理完成后调用，原地保存时记录的是裁剪后的文件"""
+        stat = os.stat(input_path)
+        self.files[os.path.abspath(input_path)] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "digest": file_digest(input_path),
+            "params": params,
+            "outputs": [os.path.abspath(path) for path in output_paths],
+        }
+        self._dirty = True
+
+    def discard(self, input_path: str):
+        """删除一个文件的记录，如处理失败时"""
+        if self.files.pop(os.path.abspath(input_path), None) is not None:
+            self._dirty = True
+
+    def save(self):
+        """有修改时写回清单文件"""
+        if not self._dirty:
+            return
+        write_json_atomic(self.path, {"version": MANIFEST_VERSION, "files": self.files})
+        self._dirty = False
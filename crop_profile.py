@@ -0,0 +1,156 @@
+import json
+import os
+import threading
+import time
+
+# 当前进程中正在记录的事件列表，为None时不记录；禁用时 stage() 只返回一个共享的空对象
+_events: list[dict] | None = None
+
+
+class _NullSpan:
+    """禁用性能分析时使用的空计时区间"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """记录一个阶段的开始时间、耗时和附加参数（如对象数量）"""
+
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name: str, args: dict):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        if _events is not None:
+            _events.append({
+                "name": self.name,
+                "ph": "X",
+                "ts": self.start / 1000,
+                "dur": (end - self.start) / 1000,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": self.args,
+            })
+        return False
+
+    def set(self, **args):
+        """附加参数，如 span.set(objects=len(drawings))"""
+        self.args.update(args)
+
+
+def stage(name: str, **args):
+    """记录一个阶段的耗时，用法: with stage("get_drawings") as span: ...
+
+    未启用性能分析时几乎没有开销。
+    """
+    if _events is None:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+
+def is_enabled() -> bool:
+    return _events is not None
+
+
+def start() -> bool:
+    """在当前进程中开始记录
+
+    Returns:
+        bool: 是否由本次调用开启；已经在记录时返回False，调用方不应再调用 stop()
+    """
+    global _events
+    if _events is not None:
+        return False
+    _events = []
+    return True
+
+
+def stop() -> list[dict]:
+    """停止记录并返回记录到的事件"""
+    global _events
+    events, _events = _events or [], None
+    return events
+
+
+def extend(events: list[dict]):
+    """合并子进程返回的事件"""
+    if _events is not None:
+        _events.extend(events)
+
+
+def write_chrome_trace(path: str, events: list[dict]):
+    """写入 Chrome trace-event 格式的JSON文件，可在 chrome://tracing 或 Perfetto 中查看
+
+    文件中额外的 stageSummary 字段为按阶段汇总的结果，查看器会忽略该字段。
+    """
+    trace = {"traceEvents": events, "displayTimeUnit": "ms", "stageSummary": summarize(events)}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(trace, f, ensure_ascii=False)
+
+
+def summarize(events: list[dict]) -> dict[str, dict[str, float]]:
+    """按阶段汇总调用次数、总耗时（秒）和对象数量"""
+    stages = {}
+    for event in events:
+        entry = stages.setdefault(event["name"], {"calls": 0, "seconds": 0.0, "objects": 0})
+        entry["calls"] += 1
+        entry["seconds"] += event["dur"] / 1e6
+        entry["objects"] += event["args"].get("objects", 0)
+    return stages
+
+
+def write_prometheus(path: str, events: list[dict], totals: dict[str, float] | None = None):
+    """写入 Prometheus textfile collector 格式的指标文件
+
+    先写入临时文件再重命名，避免 node_exporter 读到写了一半的文件。
+
+    Args:
+        path (str): 输出路径，通常以 .prom 结尾
+        events (list[dict]): 记录到的事件
+        totals (dict[str, float] | None): 额外的批处理指标，如 {"files": 10}，输出为 pdf_cropper_<name>
+    """
+    lines = [
+        "# HELP pdf_cropper_stage_seconds_total Time spent in each processing stage.",
+        "# TYPE pdf_cropper_stage_seconds_total counter",
+    ]
+    stages = summarize(events)
+    for name, entry in sorted(stages.items()):
+        lines.append(f'pdf_cropper_stage_seconds_total{{stage="{name}"}} {entry["seconds"]:.6f}')
+    lines += [
+        "# HELP pdf_cropper_stage_calls_total Number of times each processing stage ran.",
+        "# TYPE pdf_cropper_stage_calls_total counter",
+    ]
+    for name, entry in sorted(stages.items()):
+        lines.append(f'pdf_cropper_stage_calls_total{{stage="{name}"}} {entry["calls"]}')
+    lines += [
+        "# HELP pdf_cropper_stage_objects_total Number of page objects seen by each stage.",
+        "# TYPE pdf_cropper_stage_objects_total counter",
+    ]
+    for name, entry in sorted(stages.items()):
+        if entry["objects"]:
+            lines.append(f'pdf_cropper_stage_objects_total{{stage="{name}"}} {entry["objects"]}')
+    for name, value in (totals or {}).items():
+        lines.append(f"# TYPE pdf_cropper_{name} gauge")
+        lines.append(f"pdf_cropper_{name} {value}")
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(temp_path, path)
@@ -0,0 +1,517 @@
+"""基于共享文件系统的分布式批处理队列
+
+不需要额外的服务，多台机器挂载同一个目录（NFS、SMB 等）即可共同处理一批文件：
+
+    python crop_queue.py submit /mnt/shared/q1 /mnt/shared/figs --margin 5   # 提交任务
+    python crop_queue.py work /mnt/shared/q1 -j 8                             # 在每台机器上启动
+    python crop_queue.py report /mnt/shared/q1 --json                         # 合并结果
+
+队列目录的结构：
+    queue.json                      裁剪参数和提交时间
+    jobs/<id>.json                  每个任务的输入文件（绝对路径，各机器需要挂载在相同的路径下）
+    leases/<id>.lease               租约：以 O_EXCL 创建，只有一个工作进程能拿到；修改时间即最近一次心跳
+    leases/<id>.lease.*.expired     被接管的过期租约，数量即该任务此前失败的尝试次数
+    results/<id>.json               每个任务的结果记录，写入临时文件后原子替换
+
+工作进程在处理期间定期更新租约的修改时间。进程或机器宕机后心跳停止，租约过期，其他工作进程
+把过期的租约原子地重命名（只有一个能成功）后重新领取任务。原持有者发现租约已被接管时取消处理，
+也不会写入结果记录。输出文件先以工作进程专用的临时文件名保存，确认仍持有租约后才替换为正式的文件名，
+接管前后的两个工作进程不会同时写同一个输出文件。过期次数达到上限的任务直接记为失败，
+反复导致工作进程崩溃的文件不会一直占用集群。
+"""
+import argparse
+import dataclasses
+import json
+import logging
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import threading
+import time
+
+from crop_cache import CropBoxCache
+from crop_manifest import write_json_atomic
+from pdf_cropper import (DETECTION_ENGINES, SAVE_MODES, BatchResult, CropOptions, CropResult, DetectionBudget, PageResult,
+                         collect_input_pdfs, crop_pdf)
+
+logger = logging.getLogger("pdf_cropper.queue")
+
+# 提交时保存到 queue.json 的裁剪参数；缓存和性能分析由各工作进程自行决定
+QUEUE_OPTION_FIELDS = ("suffix", "margin", "export_per_page", "engine", "save_mode", "dry_run", "budget", "stream_window")
+
+
+def _read_json(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _restore_lease(expired_path: str, lease_path: str):
+    """把误重命名的有效租约放回原处，文件仍是原来的那一个，原持有者的心跳不受影响
+
+    原处已经有新的租约时说明任务又被其他工作进程领取，放弃恢复。
+    """
+    try:
+        os.link(expired_path, lease_path)
+    except FileExistsError:
+        pass
+    except OSError: # 不支持硬链接的文件系统
+        if not os.path.exists(lease_path):
+            os.rename(expired_path, lease_path)
+            return
+    os.unlink(expired_path)
+
+
+def _remove_outputs(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class Lease:
+    """一个任务的租约
+
+    持有租约文件的描述符：心跳通过描述符更新修改时间，判断是否仍持有租约时比较租约路径和描述符是否为同一个文件，
+    租约被接管（重命名）后原持有者的心跳不会延长新租约。
+    """
+
+    def __init__(self, job_id: str, path: str, fd: int, input_path: str, attempt: int):
+        self.job_id = job_id
+        self.path = path
+        self.fd = fd
+        self.input_path = input_path
+        self.attempt = attempt
+
+    def owned(self) -> bool:
+        """租约文件是否仍是自己创建的那一个"""
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        own = os.fstat(self.fd)
+        return (current.st_dev, current.st_ino) == (own.st_dev, own.st_ino)
+
+    def heartbeat(self) -> bool:
+        """更新租约的修改时间，租约已被接管时返回False"""
+        if not self.owned():
+            return False
+        os.utime(self.fd if os.utime in os.supports_fd else self.path)
+        return True
+
+    def release(self):
+        """删除租约文件（仍持有时）并关闭描述符"""
+        try:
+            if self.owned():
+                os.unlink(self.path)
+        finally:
+            os.close(self.fd)
+
+
+class JobQueue:
+    """共享目录中的任务队列
+
+    Args:
+        path (str): 队列目录
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.jobs_dir = os.path.join(path, "jobs")
+        self.leases_dir = os.path.join(path, "leases")
+        self.results_dir = os.path.join(path, "results")
+
+    def submit(self, input_paths: list[str], options: CropOptions | None = None) -> int:
+        """提交任务；队列已存在时追加，裁剪参数需与之前提交的相同
+
+        Args:
+            input_paths (list[str]): 输入PDF文件路径
+            options (CropOptions | None): 裁剪参数，为None时使用默认值
+
+        Returns:
+            int: 新增的任务数，已在队列中的文件不会重复提交
+
+        Raises:
+            ValueError: 裁剪参数与队列中已有的不同
+        """
+        params = {name: getattr(options or CropOptions(), name) for name in QUEUE_OPTION_FIELDS}
+        params["budget"] = dataclasses.asdict(params["budget"]) if params["budget"] is not None else None
+        for directory in (self.jobs_dir, self.leases_dir, self.results_dir):
+            os.makedirs(directory, exist_ok=True)
+        queue_file = os.path.join(self.path, "queue.json")
+        if os.path.exists(queue_file):
+            if _read_json(queue_file)["options"] != params:
+                raise ValueError(f"裁剪参数与队列 {self.path} 中已有的任务不同")
+        else:
+            write_json_atomic(queue_file, {"options": params, "created": time.time()})
+
+        job_ids = self.job_ids()
+        submitted = {_read_json(self._job_file(job_id))["input"] for job_id in job_ids}
+        next_id = int(job_ids[-1]) + 1 if job_ids else 0
+        added = 0
+        for input_path in map(os.path.abspath, input_paths):
+            if input_path in submitted:
+                continue
+            submitted.add(input_path)
+            write_json_atomic(self._job_file(f"{next_id:06d}"), {"input": input_path})
+            next_id += 1
+            added += 1
+        return added
+
+    def options(self) -> CropOptions:
+        """读取提交时保存的裁剪参数"""
+        params = dict(_read_json(os.path.join(self.path, "queue.json"))["options"])
+        if params["budget"] is not None:
+            params["budget"] = DetectionBudget(**params["budget"])
+        return CropOptions(**params)
+
+    def _job_file(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _result_file(self, job_id: str) -> str:
+        return os.path.join(self.results_dir, f"{job_id}.json")
+
+    def _lease_file(self, job_id: str) -> str:
+        return os.path.join(self.leases_dir, f"{job_id}.lease")
+
+    def job_ids(self) -> list[str]:
+        return sorted(name[:-5] for name in os.listdir(self.jobs_dir) if name.endswith(".json"))
+
+    def _done_ids(self) -> set[str]:
+        return {name[:-5] for name in os.listdir(self.results_dir) if name.endswith(".json")}
+
+    def _fs_now(self, worker: str) -> float:
+        """共享文件系统的当前时间
+
+        租约的修改时间由文件服务器的时钟决定，与本机时间比较会受时钟偏差影响；
+        更新一个自己的文件再读取它的修改时间，得到同一时钟下的当前时间。
+        """
+        clock_file = os.path.join(self.leases_dir, f".clock.{worker}")
+        with open(clock_file, "a"):
+            pass
+        os.utime(clock_file)
+        return os.stat(clock_file).st_mtime
+
+    def claim(self, worker: str, lease_timeout: float, max_attempts: int) -> Lease | None:
+        """领取一个未完成且没有有效租约的任务
+
+        Args:
+            worker (str): 工作进程的标识，写入租约和过期租约的文件名
+            lease_timeout (float): 租约超过这么多秒没有心跳即视为过期
+            max_attempts (int): 每个任务最多领取的次数，租约过期次数达到上限的任务直接记为失败
+
+        Returns:
+            Lease | None: 领取到的租约，当前没有可领取的任务时为None
+        """
+        done = self._done_ids()
+        lease_names = os.listdir(self.leases_dir)
+        pending = [job_id for job_id in self.job_ids() if job_id not in done]
+        # 各工作进程以不同的顺序尝试，减少同时争抢同一个任务
+        random.shuffle(pending)
+        now = self._fs_now(worker)
+        for job_id in pending:
+            lease_path = self._lease_file(job_id)
+            try:
+                fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                try:
+                    before = os.stat(lease_path)
+                    if now - before.st_mtime < lease_timeout:
+                        continue
+                    # 过期的租约重命名后再重新创建；同时接管的工作进程中只有一个能重命名成功
+                    expired_path = f"{lease_path}.{worker}.{time.time_ns()}.expired"
+                    os.rename(lease_path, expired_path)
+                    after = os.stat(expired_path)
+                except FileNotFoundError:
+                    continue
+                # 检查和重命名之间，原持有者可能刚更新了心跳，或者其他工作进程已经接管并创建了新的租约，
+                # 此时重命名的是有效的租约，放回原处
+                if (after.st_ino, after.st_mtime_ns) != (before.st_ino, before.st_mtime_ns):
+                    _restore_lease(expired_path, lease_path)
+                    continue
+                logger.warning("任务 %s 的租约已过期，接管处理", job_id)
+                lease_names = os.listdir(self.leases_dir)
+                try:
+                    fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+                except FileExistsError:
+                    continue
+
+            attempt = 1 + sum(name.startswith(f"{job_id}.lease.") and name.endswith(".expired") for name in lease_names)
+            input_path = _read_json(self._job_file(job_id))["input"]
+            lease = Lease(job_id, lease_path, fd, input_path, attempt)
+            # 列出目录后、创建租约前，任务可能刚被其他工作进程完成
+            if os.path.exists(self._result_file(job_id)):
+                lease.release()
+                continue
+            os.write(fd, json.dumps({"worker": worker, "host": socket.gethostname(), "pid": os.getpid(),
+                                     "attempt": attempt, "claimed": time.time()}).encode())
+            if attempt > max_attempts:
+                error = f"租约已过期 {attempt - 1} 次，超过最大尝试次数"
+                logger.error("处理 %s 失败: %s", input_path, error)
+                self.record(lease, CropResult(input_path, error=error), worker, time.time())
+                continue
+            return lease
+        return None
+
+    def record(self, lease: Lease, result: CropResult, worker: str, started: float,
+               outputs: dict[str, str] | None = None) -> bool:
+        """写入任务的结果记录并释放租约
+
+        Args:
+            outputs (dict[str, str] | None): 临时输出文件 -> 正式的文件名；仍持有租约时原子替换并更新 result 中的路径，
+                否则删除临时文件
+
+        Returns:
+            bool: 是否写入；租约已被其他工作进程接管时丢弃结果
+        """
+        outputs = outputs or {}
+        try:
+            if not lease.owned():
+                logger.warning("任务 %s 的租约已被接管，丢弃本次结果", lease.job_id)
+                _remove_outputs(outputs)
+                return False
+            for page_result in result.pages:
+                if page_result.output_path in outputs:
+                    page_result.output_path = outputs[page_result.output_path]
+            for index, path in enumerate(result.output_paths):
+                if path in outputs:
+                    os.replace(path, outputs[path])
+                    result.output_paths[index] = outputs[path]
+            write_json_atomic(self._result_file(lease.job_id), {
+                "job": lease.job_id,
+                "worker": worker,
+                "host": socket.gethostname(),
+                "attempt": lease.attempt,
+                "started": started,
+                "finished": time.time(),
+                "result": result.to_dict(),
+            })
+            return True
+        finally:
+            lease.release()
+
+    def status(self) -> dict:
+        """统计任务数、已完成数、租约有效的任务数和过期租约的数量"""
+        job_ids = self.job_ids()
+        done = self._done_ids()
+        lease_names = os.listdir(self.leases_dir)
+        leased = {name[:-6] for name in lease_names if name.endswith(".lease")}
+        return {
+            "jobs": len(job_ids),
+            "done": len(done),
+            "running": len(leased - done),
+            "pending": len(set(job_ids) - done - leased),
+            "expired_leases": sum(name.endswith(".expired") for name in lease_names),
+        }
+
+    def report(self) -> dict:
+        """合并所有结果记录，格式与 pdf_cropper --json 的输出相同，另外包含队列的状态和每个文件的处理者"""
+        results = []
+        workers = {}
+        started, finished = [], []
+        for job_id in sorted(self._done_ids()):
+            record = _read_json(self._result_file(job_id))
+            data = record["result"]
+            data["pages"] = [PageResult(**page) for page in data["pages"]]
+            results.append(CropResult(**data))
+            workers[data["input_path"]] = {"worker": record["worker"], "host": record["host"], "attempt": record["attempt"]}
+            started.append(record["started"])
+            finished.append(record["finished"])
+        batch = BatchResult(results, max(finished) - min(started) if results else 0.0)
+        report = batch.to_dict()
+        report["queue"] = self.status()
+        for file in report["files"]:
+            file.update(workers[file["input_path"]])
+        return report
+
+
+def _heartbeat(lease: Lease, interval: float, cancel: threading.Event, stop: threading.Event):
+    """处理期间定期更新租约；租约被接管时通知裁剪在下一页前停止"""
+    while not stop.wait(interval):
+        try:
+            alive = lease.heartbeat()
+        except OSError as e: # 共享存储暂时不可用，下次再试；持续失败时租约会过期并被接管
+            logger.warning("更新任务 %s 的租约失败: %s", lease.job_id, e)
+            continue
+        if not alive:
+            logger.warning("任务 %s 的租约已被接管，停止处理", lease.job_id)
+            cancel.set()
+            return
+
+
+def run_worker(queue_path: str, lease_timeout: float = 60, poll_interval: float = 2, max_attempts: int = 3,
+               wait: bool = True, cache: CropBoxCache | None = None, page_jobs: int = 1) -> int:
+    """不断领取并处理队列中的任务
+
+    Args:
+        queue_path (str): 队列目录
+        lease_timeout (float): 租约过期时间（秒），心跳间隔为其四分之一
+        poll_interval (float): 没有可领取的任务时，再次检查的间隔（秒）
+        max_attempts (int): 每个任务最多领取的次数
+        wait (bool): 没有可领取的任务但仍有其他工作进程在处理时继续等待，以便接管过期的租约；
+            为False时立即退出
+        cache (CropBoxCache | None): 本机的裁剪框缓存
+        page_jobs (int): 单个文件内按页并行检测的进程数
+
+    Returns:
+        int: 本工作进程处理的任务数
+    """
+    queue = JobQueue(queue_path)
+    options = dataclasses.replace(queue.options(), cache=cache, page_jobs=page_jobs)
+    worker = f"{socket.gethostname()}-{os.getpid()}"
+    # 输出先写到本工作进程专用的文件名；inplace 模式本身就先写临时文件再替换
+    partial_suffix = f"{options.suffix}.{worker}.partial"
+    job_options = options if options.save_mode == "inplace" else dataclasses.replace(options, suffix=partial_suffix)
+    processed = 0
+    try:
+        while True:
+            lease = queue.claim(worker, lease_timeout, max_attempts)
+            if lease is None:
+                status = queue.status()
+                if status["done"] >= status["jobs"] or not wait:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            logger.debug("%s 领取任务 %s（第 %d 次）: %s", worker, lease.job_id, lease.attempt, lease.input_path)
+            cancel, stop = threading.Event(), threading.Event()
+            heartbeat = threading.Thread(target=_heartbeat, args=(lease, lease_timeout / 4, cancel, stop), daemon=True)
+            heartbeat.start()
+            started = time.time()
+            try:
+                result = crop_pdf(lease.input_path, job_options, cancel=cancel)
+            finally:
+                stop.set()
+                heartbeat.join()
+            ext = os.path.splitext(lease.input_path)[1]
+            outputs = {path: path[:-len(partial_suffix + ext)] + options.suffix + ext
+                       for path in result.output_paths if path.endswith(partial_suffix + ext)}
+            if cancel.is_set():
+                # 心跳发现租约被接管后取消了处理，结果不完整，不写入记录
+                _remove_outputs(outputs)
+                lease.release()
+                continue
+            if queue.record(lease, result, worker, started, outputs):
+                processed += 1
+    finally:
+        try:
+            os.unlink(os.path.join(queue.leases_dir, f".clock.{worker}"))
+        except FileNotFoundError:
+            pass
+    return processed
+
+
+def _worker_process(queue_path: str, level: int, kwargs: dict):
+    """-j 大于1时每个工作进程的入口"""
+    logging.basicConfig(level=level, format="%(message)s")
+    logging.getLogger("pdf_cropper").setLevel(level)
+    run_worker(queue_path, **kwargs)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="基于共享目录的分布式批量裁剪")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    submit = commands.add_parser("submit", help="提交任务到队列目录，队列已存在时追加")
+    submit.add_argument("queue", help="队列目录，需要位于所有工作机器都能访问的共享存储上")
+    submit.add_argument("inputs", nargs="+", help="输入PDF文件、目录或通配符")
+    submit.add_argument("--suffix", default="_cropped", help="裁剪后文件的后缀")
+    submit.add_argument("--margin", type=int, default=5, help="裁剪时的内边距，单位为点")
+    submit.add_argument("--export_per_page", action="store_true", help="是否为每一页单独导出裁剪后的PDF")
+    submit.add_argument("--engine", choices=list(DETECTION_ENGINES), default="objects", help="内容检测引擎")
+    submit.add_argument("--save_mode", choices=list(SAVE_MODES), default="default", help="保存方式")
+    submit.add_argument("--max_page_objects", type=int, default=0, help="单页矢量图形数量上限，0 表示不限制")
+    submit.add_argument("--max_page_seconds", type=float, default=0, help="单页检测的耗时上限（秒），0 表示不限制")
+    submit.add_argument("--fallback_engine", choices=list(DETECTION_ENGINES), default="stext", help="超出单页预算时改用的引擎")
+    submit.add_argument("--stream_window", type=int, default=0, help="流式处理大文件的窗口页数，0 表示关闭")
+    submit.add_argument("--dry-run", dest="dry_run", action="store_true", help="只计算裁剪框，不写入任何PDF文件")
+
+    work = commands.add_parser("work", help="领取并处理队列中的任务，全部完成后退出")
+    work.add_argument("queue", help="队列目录")
+    work.add_argument("--jobs", "-j", type=int, default=1, help="本机的工作进程数，0 表示使用全部CPU核心")
+    work.add_argument("--lease_timeout", type=float, default=60,
+                      help="租约超过这么多秒没有心跳即视为过期，由其他工作进程接管；需远大于共享存储的属性缓存时间")
+    work.add_argument("--poll", type=float, default=2, help="没有可领取的任务时，再次检查的间隔（秒）")
+    work.add_argument("--max_attempts", type=int, default=3, help="每个任务最多领取的次数，租约过期次数达到上限的任务记为失败")
+    work.add_argument("--no-wait", dest="wait", action="store_false", help="没有可领取的任务时立即退出，不等待接管其他进程的过期租约")
+    work.add_argument("--page_jobs", type=int, default=1, help="单个文件内按页并行检测裁剪框的进程数")
+    work.add_argument("--cache_dir", default=None, help="本机的裁剪框缓存目录，默认为用户缓存目录下的 pdf-white-crop")
+    work.add_argument("--no-cache", dest="use_cache", action="store_false", help="不使用裁剪框缓存")
+
+    report = commands.add_parser("report", help="合并结果记录，输出批处理报告")
+    report.add_argument("queue", help="队列目录")
+    report.add_argument("--json", action="store_true", help="以JSON格式输出每个文件、每一页的结果")
+    report.add_argument("--output", default=None, metavar="PATH", help="将JSON报告写入文件")
+
+    for command in (submit, work, report):
+        command.add_argument("--verbose", "-v", action="store_true", help="输出每个任务的处理日志")
+        command.add_argument("--quiet", "-q", action="store_true", help="只输出警告和错误")
+    args = parser.parse_args(argv)
+
+    log_level = logging.DEBUG if args.verbose else logging.WARNING if args.quiet else logging.INFO
+    logging.basicConfig(level=log_level, format="%(message)s")
+    logging.getLogger("pdf_cropper").setLevel(log_level)
+    queue = JobQueue(args.queue)
+
+    if args.command == "submit":
+        budget = None
+        if args.max_page_objects > 0 or args.max_page_seconds > 0:
+            budget = DetectionBudget(args.max_page_objects, args.max_page_seconds, args.fallback_engine)
+        options = CropOptions(suffix=args.suffix, margin=args.margin, export_per_page=args.export_per_page, engine=args.engine,
+                              save_mode=args.save_mode, dry_run=args.dry_run, budget=budget, stream_window=args.stream_window)
+        input_pdf_paths = collect_input_pdfs(args.inputs, args.suffix)
+        try:
+            added = queue.submit(input_pdf_paths, options)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 1
+        print(f"提交 {added} 个任务，队列中共 {queue.status()['jobs']} 个任务")
+        return 0
+
+    if not os.path.exists(os.path.join(args.queue, "queue.json")):
+        print(f"队列不存在: {args.queue}", file=sys.stderr)
+        return 1
+
+    if args.command == "work":
+        kwargs = {"lease_timeout": args.lease_timeout, "poll_interval": args.poll, "max_attempts": args.max_attempts,
+                  "wait": args.wait, "page_jobs": args.page_jobs}
+        jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+        if jobs == 1:
+            cache = CropBoxCache(args.cache_dir) if args.use_cache else None
+            try:
+                run_worker(args.queue, cache=cache, **kwargs)
+            finally:
+                if cache is not None:
+                    cache.close()
+        else:
+            # 各进程在自己的连接中打开同一个缓存数据库
+            if args.use_cache:
+                kwargs["cache"] = CropBoxCache(args.cache_dir)
+            processes = [multiprocessing.Process(target=_worker_process, args=(args.queue, log_level, kwargs)) for _ in range(jobs)]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+        status = queue.status()
+        print(f"队列中共 {status['jobs']} 个任务，已完成 {status['done']} 个")
+        return 0
+
+    data = queue.report()
+    if args.output:
+        write_json_atomic(args.output, data)
+    summary, status = data["summary"], data["queue"]
+    if args.json:
+        print(json.dumps(data, ensure_ascii=False))
+    else:
+        print(
+            f"队列中共 {status['jobs']} 个任务，已完成 {status['done']} 个，处理中 {status['running']} 个，等待 {status['pending']} 个；"
+            f"共处理 {summary['pages']} 页，保存 {summary['saved']} 个文件，失败 {summary['failures']} 个，"
+            f"耗时 {summary['elapsed']:.2f} 秒"
+        )
+    return 1 if summary["failures"] or status["done"] < status["jobs"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
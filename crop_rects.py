@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import itertools
+
+from crop_lazy import lazy_import
+
+fitz = lazy_import("fitz")
+np = lazy_import("numpy", optional=True) # 没有安装 numpy 时为None，退回纯 Python 实现
+
+# 与页面边界的容差：PowerPoint 的背景矩形常比页面略大或略小
+_PAGE_TOLERANCE = 1.0
+
+
+class RectSet:
+    """一页中各对象外接矩形的集合，批量过滤并求外接矩形
+
+    各检测阶段把矩形成批加入，最后一次性完成过滤和 min/max 归约，
+    避免为每个对象创建 fitz.Rect 并逐个比较。安装了 numpy 时使用数组运算，否则退回纯 Python。
+    """
+
+    def __init__(self):
+        self._chunks = [] # numpy 时为 (坐标数组, 白色填充标记数组)，否则为 (x0, y0, x1, y1, 白色填充) 元组
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def extend(self, rects, white_fill=None):
+        """加入一批矩形
+
+        Args:
+            rects (Iterable): 矩形序列，每个元素为 fitz.Rect 或 (x0, y0, x1, y1)
+            white_fill (Iterable[bool] | None): 与 rects 一一对应，标记只填充白色、没有描边的图形
+        """
+        if not isinstance(rects, list):
+            rects = list(rects)
+        if not rects:
+            return
+        count = len(rects)
+        if np is not None:
+            coords = np.fromiter(itertools.chain.from_iterable(rects), dtype=np.float64, count=count * 4).reshape(count, 4)
+            flags = np.zeros(count, dtype=bool) if white_fill is None else np.fromiter(white_fill, dtype=bool, count=count)
+            self._chunks.append((coords, flags))
+        else:
+            flags = itertools.repeat(False) if white_fill is None else white_fill
+            self._chunks.extend((*map(float, rect), bool(flag)) for rect, flag in zip(rects, flags))
+        self._count += count
+
+    def bounds(self, page_rect: fitz.Rect | None = None) -> fitz.Rect | None:
+        """过滤无效矩形后返回所有矩形的外接矩形
+
+        面积为0的矩形总是被忽略；指定 page_rect 时，还会忽略覆盖整页的白色填充（页面背景）。
+
+        Args:
+            page_rect (fitz.Rect | None): 页面矩形，为None时不过滤页面背景
+
+        Returns:
+            fitz.Rect | None: 外接矩形，没有有效矩形时为None
+        """
+        if not self._count:
+            return None
+        if np is not None:
+            return self._bounds_numpy(page_rect)
+        return self._bounds_python(page_rect)
+
+    def _bounds_numpy(self, page_rect: fitz.Rect | None) -> fitz.Rect | None:
+        if len(self._chunks) == 1:
+            coords, flags = self._chunks[0]
+        else:
+            coords = np.concatenate([chunk[0] for chunk in self._chunks])
+            flags = np.concatenate([chunk[1] for chunk in self._chunks])
+        x0, y0, x1, y1 = coords.T
+        keep = (x1 > x0) & (y1 > y0)
+        if page_rect is not None and flags.any():
+            covers_page = (
+                (x0 <= page_rect.x0 + _PAGE_TOLERANCE) & (y0 <= page_rect.y0 + _PAGE_TOLERANCE)
+                & (x1 >= page_rect.x1 - _PAGE_TOLERANCE) & (y1 >= page_rect.y1 - _PAGE_TOLERANCE)
+            )
+            keep &= ~(flags & covers_page)
+        if not keep.any():
+            return None
+        kept = coords[keep]
+        low = kept[:, :2].min(axis=0)
+        high = kept[:, 2:].max(axis=0)
+        return fitz.Rect(float(low[0]), float(low[1]), float(high[0]), float(high[1]))
+
+    def _bounds_python(self, page_rect: fitz.Rect | None) -> fitz.Rect | None:
+        def is_background(x0, y0, x1, y1):
+            return (x0 <= page_rect.x0 + _PAGE_TOLERANCE and y0 <= page_rect.y0 + _PAGE_TOLERANCE
+                    and x1 >= page_rect.x1 - _PAGE_TOLERANCE and y1 >= page_rect.y1 - _PAGE_TOLERANCE)
+
+        kept = [
+            (x0, y0, x1, y1) for x0, y0, x1, y1, white in self._chunks
+            if x1 > x0 and y1 > y0 and not (white and page_rect is not None and is_background(x0, y0, x1, y1))
+        ]
+        if not kept:
+            return None
+        x0s, y0s, x1s, y1s = zip(*kept)
+        return fitz.Rect(min(x0s), min(y0s), max(x1s), max(y1s))
@@ -0,0 +1,307 @@
+"""常驻的裁剪服务
+
+启动后保持一个已导入 fitz 的进程池，通过 JSON Lines 接收裁剪任务，省去每次调用时
+Python 启动和导入 PyMuPDF 的开销：
+
+    python crop_server.py                 # 监听 Unix socket，配合 crop_client.py 使用
+    python crop_server.py --stdio         # 从标准输入读取任务，结果写到标准输出
+
+每行一个任务，如 {"id": 1, "input": "/abs/fig.pdf", "options": {"margin": 5}}；
+每个任务返回一行 {"id": 1, "ok": true, "error": null, "result": {...}}，result 与 CropResult.to_dict() 相同。
+另外支持 {"op": "ping"} 和 {"op": "shutdown"}（仅 socket 模式）。
+"""
+import argparse
+import dataclasses
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import shutil
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from crop_cache import CropBoxCache
+from crop_client import JOB_OPTION_FIELDS, default_socket_path
+from pdf_cropper import CropOptions, _init_worker, crop_pdf, logger
+
+
+def _completed(response: dict) -> Future:
+    future = Future()
+    future.set_result(response)
+    return future
+
+
+def _run_marked(marker: str, fn, *args):
+    """在子进程中执行 fn(*args)，开始前把本进程的 pid 写入 marker，进程池损坏时据此找出导致损坏的任务"""
+    with open(marker, "w") as f:
+        f.write(str(os.getpid()))
+    return fn(*args)
+
+
+def _crashed_worker(marker: str) -> bool:
+    """读取并删除 marker，返回任务是否已经开始执行且所在的子进程已经退出
+
+    ProcessPoolExecutor 在终止其余子进程之前就把损坏的异常设置到所有未完成的任务上，
+    此时只有导致损坏的那个子进程已经退出，同时在其他子进程中执行的任务只是受到牵连。
+    """
+    try:
+        with open(marker) as f:
+            pid = f.read()
+        os.remove(marker)
+    except FileNotFoundError: # 任务还没有开始执行
+        return False
+    return pid.isdigit() and int(pid) not in {process.pid for process in multiprocessing.active_children()}
+
+
+def _remove_marker(marker: str):
+    try:
+        os.remove(marker)
+    except FileNotFoundError:
+        pass
+
+
+class CropServer:
+    """持有预热的进程池，把 JSON 任务转换为 crop_pdf 调用
+
+    Args:
+        jobs (int): 进程数，0 表示使用全部CPU核心
+        options (CropOptions | None): 任务未指定的参数使用的默认值（如缓存）
+    """
+
+    def __init__(self, jobs: int = 0, options: CropOptions | None = None):
+        self.jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+        self.options = options or CropOptions()
+        self.executor = self._new_executor()
+        self.restarts = 0 # 进程池因子进程异常退出而重建的次数
+        self._lock = threading.Lock()
+        self._markers = tempfile.mkdtemp(prefix="pdf-crop-server-") # 记录每个任务在哪个子进程中执行
+        self._job_ids = itertools.count()
+        self.on_shutdown = None # 收到 shutdown 请求时调用，为None时不支持该请求
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_worker, initargs=(logger.getEffectiveLevel(),))
+
+    def _rebuild(self, broken: ProcessPoolExecutor):
+        """替换已损坏的进程池；多个任务同时发现同一个进程池损坏时只重建一次"""
+        with self._lock:
+            if self.executor is broken:
+                logger.warning("进程池中的子进程异常退出，重建进程池")
+                self.executor = self._new_executor()
+                self.restarts += 1
+
+    def warm_up(self):
+        """提前启动全部子进程，使第一个任务也不需要等待进程启动"""
+        for future in [self.run(os.getpid) for _ in range(self.jobs)]:
+            future.result()
+
+    def run(self, fn, *args, retries: int = 1) -> Future:
+        """在进程池中执行 fn(*args)
+
+        任何一个子进程异常退出（段错误、被 OOM killer 杀死等）都会使 ProcessPoolExecutor 永久损坏，
+        其中所有未完成的任务一起失败。此时重建进程池，并把受牵连的任务重新提交，最多 retries 次；
+        所在子进程退出的任务多半就是原因（如会使 MuPDF 崩溃的文件），不再重新提交，免得再次拖垮其他任务。
+
+        Returns:
+            Future: fn 的返回值；导致子进程退出或重试后仍因进程池损坏而失败时为 BrokenProcessPool 异常
+        """
+        response = Future()
+        marker = os.path.join(self._markers, str(next(self._job_ids)))
+
+        def attempt(remaining: int):
+            executor = self.executor
+            try:
+                future = executor.submit(_run_marked, marker, fn, *args)
+            except BrokenProcessPool: # 空闲的子进程退出后，进程池在下一次提交时才报告损坏
+                self._rebuild(executor)
+                executor = self.executor
+                future = executor.submit(_run_marked, marker, fn, *args)
+
+            def done(future: Future):
+                error = future.exception()
+                if isinstance(error, BrokenProcessPool):
+                    crashed = _crashed_worker(marker)
+                    self._rebuild(executor)
+                    if remaining > 0 and not crashed:
+                        attempt(remaining - 1)
+                        return
+                else:
+                    _remove_marker(marker)
+                if error is not None:
+                    response.set_exception(error)
+                else:
+                    response.set_result(future.result())
+
+            future.add_done_callback(done)
+
+        try:
+            attempt(retries)
+        except Exception as e: # 如已经关闭
+            response.set_exception(e)
+        return response
+
+    def submit(self, line: str) -> Future:
+        """提交一行 JSON 任务
+
+        Returns:
+            Future: 结果为响应字典 {"id", "ok", "error", "result"}；格式错误的任务立即返回错误
+        """
+        try:
+            job = json.loads(line)
+            if not isinstance(job, dict):
+                raise ValueError("任务必须是JSON对象")
+        except ValueError as e:
+            return _completed({"id": None, "ok": False, "error": f"无效的任务: {e}"})
+
+        job_id = job.get("id")
+        if job.get("op") == "ping":
+            return _completed({"id": job_id, "ok": True, "error": None, "pid": os.getpid(), "jobs": self.jobs})
+        if job.get("op") == "shutdown":
+            if self.on_shutdown is None:
+                return _completed({"id": job_id, "ok": False, "error": "当前模式不支持 shutdown"})
+            self.on_shutdown()
+            return _completed({"id": job_id, "ok": True, "error": None})
+        try:
+            input_path = job["input"]
+            requested = job.get("options") or {}
+            unknown = set(requested) - set(JOB_OPTION_FIELDS)
+            if unknown:
+                raise ValueError(f"不支持的参数: {', '.join(sorted(unknown))}")
+            options = dataclasses.replace(self.options, **requested)
+        except (KeyError, TypeError, ValueError) as e:
+            return _completed({"id": job_id, "ok": False, "error": f"无效的任务: {e}"})
+
+        response = Future()
+
+        def done(future: Future):
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                response.set_result({"id": job_id, "ok": False, "error": "工作进程异常退出"})
+            except Exception as e: # crop_pdf 本身不会抛出异常
+                response.set_result({"id": job_id, "ok": False, "error": str(e)})
+            else:
+                response.set_result({"id": job_id, "ok": result.ok, "error": result.error, "result": result.to_dict()})
+
+        self.run(crop_pdf, input_path, options).add_done_callback(done)
+        return response
+
+    def close(self):
+        self.executor.shutdown()
+        shutil.rmtree(self._markers, ignore_errors=True)
+        if self.options.cache is not None:
+            self.options.cache.close()
+
+
+def serve_stdio(server: CropServer, stdin=None, stdout=None):
+    """从标准输入逐行读取任务，任务完成后立即写出响应（顺序可能与输入不同），读到EOF后等待全部完成"""
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    lock = threading.Lock()
+    pending = []
+
+    def write(future: Future):
+        with lock:
+            stdout.write(json.dumps(future.result(), ensure_ascii=False) + "\n")
+            stdout.flush()
+
+    for line in stdin:
+        if line.strip():
+            future = server.submit(line)
+            future.add_done_callback(write)
+            pending.append(future)
+    for future in pending:
+        future.result()
+
+
+class _JobHandler(socketserver.StreamRequestHandler):
+    """处理一个客户端连接：逐行读取任务并发执行，由写线程按提交顺序返回响应"""
+
+    def handle(self):
+        futures = queue.Queue()
+
+        def write_responses():
+            while (future := futures.get()) is not None:
+                self.wfile.write((json.dumps(future.result(), ensure_ascii=False) + "\n").encode("utf-8"))
+                self.wfile.flush()
+
+        writer = threading.Thread(target=write_responses)
+        writer.start()
+        try:
+            for line in self.rfile:
+                if line.strip():
+                    futures.put(self.server.crop_server.submit(line.decode("utf-8")))
+        finally:
+            futures.put(None)
+            writer.join()
+
+
+def serve_socket(server: CropServer, socket_path: str):
+    """监听 Unix socket，直到收到 shutdown 请求或被中断"""
+    if not hasattr(socketserver, "ThreadingUnixStreamServer"):
+        raise OSError("当前平台不支持 Unix socket，请使用 --stdio")
+    if os.path.exists(socket_path):
+        # 上次异常退出遗留的 socket 文件可以删除，仍有服务在监听时报错
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(socket_path)
+            except OSError:
+                os.remove(socket_path)
+            else:
+                raise OSError(f"已有裁剪服务在监听: {socket_path}")
+
+    with socketserver.ThreadingUnixStreamServer(socket_path, _JobHandler) as unix_server:
+        unix_server.daemon_threads = True
+        unix_server.crop_server = server
+        # shutdown() 会等待 serve_forever 返回，不能在处理请求的线程中直接调用
+        server.on_shutdown = lambda: threading.Thread(target=unix_server.shutdown).start()
+        os.chmod(socket_path, 0o600)
+        logger.info("裁剪服务已启动: %s（%d 个进程）", socket_path, server.jobs)
+        try:
+            unix_server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(socket_path)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="常驻的PDF裁剪服务")
+    parser.add_argument("--socket", default=None, help="监听的 Unix socket 路径，默认由 PDF_CROP_SOCKET 或运行时目录决定")
+    parser.add_argument("--stdio", action="store_true", help="从标准输入读取任务，结果写到标准输出，读到EOF后退出")
+    parser.add_argument("--jobs", "-j", type=int, default=0, help="进程池的进程数，0 表示使用全部CPU核心")
+    parser.add_argument("--cache_dir", default=None, help="裁剪框缓存目录，默认为用户缓存目录下的 pdf-white-crop")
+    parser.add_argument("--no-cache", dest="use_cache", action="store_false", help="不使用裁剪框缓存")
+    parser.add_argument("--verbose", "-v", action="store_true", help="输出每一页的处理日志")
+    parser.add_argument("--quiet", "-q", action="store_true", help="只输出警告和错误")
+    args = parser.parse_args(argv)
+
+    # 日志写到标准错误，标准输出只用于 --stdio 的响应
+    log_level = logging.DEBUG if args.verbose else logging.WARNING if args.quiet else logging.INFO
+    logging.basicConfig(level=log_level, format="%(message)s", stream=sys.stderr)
+    logger.setLevel(log_level)
+
+    cache = CropBoxCache(args.cache_dir) if args.use_cache else None
+    server = CropServer(args.jobs, CropOptions(cache=cache))
+    server.warm_up()
+    try:
+        if args.stdio:
+            serve_stdio(server)
+        else:
+            serve_socket(server, args.socket or default_socket_path())
+    except OSError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        server.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,290 @@
+"""受监督的隔离工作进程
+
+每个任务在独立的工作进程中执行，由主进程监督：
+  * 超过时限的任务直接杀死所在进程，MuPDF 卡死在某个对象上也不会拖住整个批处理
+  * 在工作进程中用 RLIMIT_AS 限制地址空间，内存失控的文件只会让自己的进程失败
+  * 超时或崩溃的任务换一个新进程重试，仍然失败时放入隔离清单，之后的批处理直接跳过
+  * 每个进程执行一定数量的任务后退出并由新进程替换，避免内存泄漏和碎片逐渐累积
+"""
+import json
+import logging
+import multiprocessing
+import os
+import time
+from dataclasses import dataclass
+from multiprocessing.connection import wait
+
+from crop_manifest import write_json_atomic
+
+logger = logging.getLogger("pdf_cropper.supervisor")
+
+
+@dataclass
+class WorkerLimits:
+    """隔离执行的限制
+
+    Attributes:
+        timeout (float): 单个任务的最长执行时间（秒），0 表示不限制
+        max_memory_mb (int): 工作进程的地址空间上限(MB)，0 表示不限制；只在支持 RLIMIT_AS 的平台上生效，
+            包含 Python 和 PyMuPDF 本身占用的虚拟内存，不宜小于 1024
+        max_jobs_per_worker (int): 每个工作进程执行多少个任务后被替换，0 表示不替换
+        retries (int): 超时或崩溃的任务最多重试的次数
+    """
+    timeout: float = 0.0
+    max_memory_mb: int = 0
+    max_jobs_per_worker: int = 100
+    retries: int = 1
+
+
+@dataclass
+class JobOutcome:
+    """一个任务的执行结果
+
+    Attributes:
+        ok (bool): 任务函数是否正常返回
+        value (object): 任务函数的返回值
+        error (str | None): 失败原因：任务函数抛出的异常、超时或工作进程异常退出
+        attempts (int): 执行的次数（含重试）
+        isolated_failure (bool): 是否因超时或进程崩溃而失败，这类输入应当被隔离
+    """
+    ok: bool
+    value: object = None
+    error: str | None = None
+    attempts: int = 1
+    isolated_failure: bool = False
+
+
+def _limit_memory(max_memory_mb: int):
+    try:
+        import resource
+    except ImportError: # Windows 没有 resource 模块
+        return
+    limit = max_memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _worker_main(conn, func, max_memory_mb: int, initializer, initargs: tuple):
+    """工作进程的主循环：逐个接收 (序号, 参数) 并返回 (序号, 是否成功, 返回值或错误信息)，收到None时退出"""
+    if max_memory_mb:
+        _limit_memory(max_memory_mb)
+    if initializer is not None:
+        initializer(*initargs)
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        index, args = job
+        try:
+            value = func(*args)
+        except BaseException as e: # 包括 MemoryError，进程本身仍然可用
+            conn.send((index, False, f"{type(e).__name__}: {e}"))
+        else:
+            conn.send((index, True, value))
+
+
+class _Worker:
+    """一个工作进程及其当前任务"""
+
+    def __init__(self, context, func, limits: WorkerLimits, initializer, initargs: tuple):
+        self.conn, child_conn = context.Pipe()
+        # 不使用守护进程：任务本身（如 page_jobs 大于1）可能需要再启动子进程；退出时由 SupervisedPool 负责结束
+        self.process = context.Process(target=_worker_main, args=(child_conn, func, limits.max_memory_mb, initializer, initargs))
+        self.process.start()
+        child_conn.close()
+        self.job = None # 当前任务的序号
+        self.started = 0.0
+        self.jobs_done = 0
+
+    def assign(self, index: int, args: tuple):
+        self.conn.send((index, args))
+        self.job = index
+        self.started = time.monotonic()
+
+    def stop(self):
+        """让空闲的进程正常退出"""
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class SupervisedPool:
+    """在受监督的隔离进程中执行任务
+
+    Args:
+        func (Callable): 任务函数，需要可以被 pickle（模块级函数）
+        workers (int): 工作进程数
+        limits (WorkerLimits | None): 超时、内存、重试和进程替换的限制，为None时使用默认值
+        initializer (Callable | None): 每个工作进程启动时调用
+        initargs (tuple): initializer 的参数
+    """
+
+    def __init__(self, func, workers: int, limits: WorkerLimits | None = None, initializer=None, initargs: tuple = ()):
+        self.func = func
+        self.workers = max(workers, 1)
+        self.limits = limits or WorkerLimits()
+        self.initializer = initializer
+        self.initargs = initargs
+        self._context = multiprocessing.get_context()
+        if self.limits.max_memory_mb and os.name == "nt":
+            logger.warning("当前平台不支持限制工作进程的内存，忽略 max_memory_mb")
+
+    def run(self, jobs: list[tuple], labels: list[str] | None = None) -> list[JobOutcome]:
+        """执行所有任务，按任务顺序返回结果
+
+        Args:
+            jobs (list[tuple]): 每个任务的参数
+            labels (list[str] | None): 日志中显示的任务名称，如输入文件路径，为None时显示序号
+
+        Returns:
+            list[JobOutcome]: 每个任务的结果
+        """
+        outcomes = [None] * len(jobs)
+        attempts = [0] * len(jobs)
+        pending = list(range(len(jobs)))
+        pending.reverse() # 从末尾弹出，按原顺序执行
+        slots = [None] * min(self.workers, max(len(jobs), 1))
+
+        def finish_failed(index: int, reason: str):
+            """超时或崩溃：还有重试次数时重新排队，否则记录失败"""
+            if attempts[index] <= self.limits.retries:
+                label = labels[index] if labels is not None else f"任务 {index}"
+                logger.warning("%s: %s，第 %d 次重试", label, reason, attempts[index])
+                pending.append(index)
+            else:
+                outcomes[index] = JobOutcome(False, error=reason, attempts=attempts[index], isolated_failure=True)
+
+        try:
+            while pending or any(worker is not None and worker.job is not None for worker in slots):
+                # 为空闲的槽位分配任务，进程已退出或被替换的槽位重新启动进程
+                for slot, worker in enumerate(slots):
+                    if not pending:
+                        break
+                    if worker is not None and worker.job is not None:
+                        continue
+                    if worker is None:
+                        worker = slots[slot] = _Worker(self._context, self.func, self.limits, self.initializer, self.initargs)
+                    index = pending.pop()
+                    attempts[index] += 1
+                    worker.assign(index, jobs[index])
+
+                busy = [worker for worker in slots if worker is not None and worker.job is not None]
+                timeout = None
+                if self.limits.timeout:
+                    now = time.monotonic()
+                    timeout = max(0.0, min(worker.started + self.limits.timeout - now for worker in busy))
+                ready = set(wait([worker.conn for worker in busy] + [worker.process.sentinel for worker in busy], timeout))
+
+                for slot, worker in enumerate(slots):
+                    if worker is None or worker.job is None:
+                        continue
+                    index = worker.job
+                    if worker.conn in ready or worker.process.sentinel in ready:
+                        try:
+                            received = worker.conn.recv() if worker.conn.poll() else None
+                        except (EOFError, OSError):
+                            received = None
+                        if received is None:
+                            # 没有返回结果就退出：段错误、被系统的 OOM killer 杀死等
+                            worker.process.join()
+                            exitcode = worker.process.exitcode
+                            worker.conn.close()
+                            slots[slot] = None
+                            finish_failed(index, f"工作进程异常退出（退出码 {exitcode}）")
+                            continue
+                        _, ok, value = received
+                        outcomes[index] = JobOutcome(True, value=value, attempts=attempts[index]) if ok else \
+                            JobOutcome(False, error=value, attempts=attempts[index])
+                        worker.job = None
+                        worker.jobs_done += 1
+                        if self.limits.max_jobs_per_worker and worker.jobs_done >= self.limits.max_jobs_per_worker:
+                            # 定期替换进程，释放累积的内存
+                            worker.stop()
+                            slots[slot] = None
+                    elif self.limits.timeout and time.monotonic() - worker.started >= self.limits.timeout:
+                        worker.kill()
+                        slots[slot] = None
+                        finish_failed(index, f"处理超过 {self.limits.timeout:g} 秒")
+        finally:
+            for worker in slots:
+                if worker is None:
+                    continue
+                if worker.job is None:
+                    worker.stop()
+                else:
+                    worker.kill()
+        return outcomes
+
+
+def _no_looser(new: float, old: float) -> bool:
+    """限制 new 是否不比 old 宽松，0 表示不限制"""
+    return old == 0 or 0 < new <= old
+
+
+class Quarantine:
+    """隔离清单：记录反复导致工作进程超时或崩溃的输入文件
+
+    同时记录当时的时限和内存上限。文件的大小和修改时间都未变化、且新的限制不比当时宽松时，
+    之后的批处理直接跳过它，不再占用工作进程；文件被修改或放宽限制后重新尝试。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.files = {}
+        self._dirty = False
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.files = json.load(f).get("files", {})
+
+    def reason(self, input_path: str, limits: WorkerLimits) -> str | None:
+        """文件在清单中、未被修改且 limits 不比记录时宽松时返回隔离原因，否则返回None"""
+        entry = self.files.get(os.path.abspath(input_path))
+        if entry is None:
+            return None
+        try:
+            stat = os.stat(input_path)
+        except OSError:
+            return None
+        if stat.st_size != entry["size"] or stat.st_mtime_ns != entry["mtime_ns"]:
+            return None
+        if not (_no_looser(limits.timeout, entry.get("timeout", 0))
+                and _no_looser(limits.max_memory_mb, entry.get("max_memory_mb", 0))):
+            return None
+        return entry["reason"]
+
+    def add(self, input_path: str, reason: str, attempts: int, limits: WorkerLimits):
+        stat = os.stat(input_path)
+        self.files[os.path.abspath(input_path)] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "reason": reason,
+            "attempts": attempts,
+            "timeout": limits.timeout,
+            "max_memory_mb": limits.max_memory_mb,
+            "time": time.time(),
+        }
+        self._dirty = True
+
+    def discard(self, input_path: str):
+        if self.files.pop(os.path.abspath(input_path), None) is not None:
+            self._dirty = True
+
+    def save(self):
+        """有修改时写回清单文件"""
+        if not self._dirty:
+            return
+        write_json_atomic(self.path, {"files": self.files})
+        self._dirty = False
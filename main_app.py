@@ -1,15 +1,46 @@
 import customtkinter as ctk
+import tkinter as tk
 from tkinter import filedialog, messagebox
+import logging
+import multiprocessing
 import os
+import queue
 import threading # 用于异步处理，避免GUI卡死
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 
-from pdf_cropper import crop_pdf_margins
+# pdf_cropper 中的 fitz 和 crop_rects 中的 numpy 都在第一次使用时才导入，窗口显示后在后台线程中预热
+from crop_rects import np
+from pdf_cropper import CropOptions, _init_worker, apply_margin_to_rect, crop_pdf, find_content_rect, fitz
 
 import math # 用于文件大小计算
 
 # 导入拖拽库
 from tkinterdnd2 import DND_FILES, TkinterDnD
 
+# 文件列表最少显示的行数，窗口较矮时也至少创建这么多行
+MIN_VISIBLE_ROWS = 5
+# 处理过程中刷新进度的最短间隔（秒），避免逐页更新界面拖慢主线程
+PROGRESS_INTERVAL = 0.1
+# 预览缩略图缓存的数量上限，超出后淘汰最久未使用的缩略图
+PREVIEW_CACHE_SIZE = 256
+# 预览中页面之间的间距（像素）
+PREVIEW_PAGE_GAP = 10
+# 预览缩放比例的步长，窗口宽度的微小变化不会导致重新渲染
+PREVIEW_ZOOM_STEP = 0.05
+
+
+def _crop_file_in_worker(index, input_path, options, events, cancel):
+    """在子进程中裁剪一个文件，通过 events 队列报告页数和每一页的进度
+
+    事件为 ("start", 文件序号, 总页数) 和 ("page", 文件序号, 页码)；cancel 设置后在下一页之前停止。
+    总页数由 crop_pdf 在打开文档后报告，不必为了计数再打开一次文件。
+    """
+    return crop_pdf(input_path, options, progress=lambda page: events.put(("page", index, page.page_num)), cancel=cancel,
+                    on_open=lambda page_cnt: events.put(("start", index, page_cnt)))
+
 
 # 将ctk.CTk() 替换为 TkinterDnD.Tk() 来支持拖拽
 class PDFCropperApp(ctk.CTk, TkinterDnD.DnDWrapper):
@@ -19,7 +50,7 @@ class PDFCropperApp(ctk.CTk, TkinterDnD.DnDWrapper):
 
         # 1. 窗口基本设置
         self.title("PDF White Space Cropper")
-        self.geometry("800x600")
+        self.geometry("1200x650")
         self.resizable(True, True)
 
         # 配置网格布局，让组件随着窗口大小变化
@@ -38,6 +69,7 @@ class PDFCropperApp(ctk.CTk, TkinterDnD.DnDWrapper):
 
         # 内部组件自适应
         self.main_frame.grid_columnconfigure(0, weight=1)
+        self.main_frame.grid_columnconfigure(1, weight=1) # 预览区域
         self.main_frame.grid_rowconfigure(0, weight=0)
         self.main_frame.grid_rowconfigure(1, weight=1)
         self.main_frame.grid_rowconfigure(2, weight=0)
@@ -45,7 +77,7 @@ class PDFCropperApp(ctk.CTk, TkinterDnD.DnDWrapper):
 
         # 3. 创建顶部区域（文件选择）
         self.file_select_frame = ctk.CTkFrame(self.main_frame)
-        self.file_select_frame.grid(row=0, column=0, sticky="ew", padx=10, pady=10)
+        self.file_select_frame.grid(row=0, column=0, columnspan=2, sticky="ew", padx=10, pady=10)
         self.file_select_frame.grid_columnconfigure(0, weight=1)
         self.file_select_frame.grid_columnconfigure(1, weight=1)
 
@@ -77,8 +109,9 @@ class PDFCropperApp(ctk.CTk, TkinterDnD.DnDWrapper):
         # )
         # self.file_list_textbox.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
         
-        # 变成可滚动的表格容器
-        self.file_list_container = ctk.CTkScrollableFrame(self.main_frame)
+        # 虚拟化的表格：只为可见的行创建控件，滚动时重新填充这些行的内容，
+        # 因此上万个文件时添加、移除和滚动的开销也只与可见行数有关
+        self.file_list_container = ctk.CTkFrame(self.main_frame)
         self.file_list_container.grid(row=1, column=0, sticky="nsew", padx=10, pady=5)
         # 表格配置列
         self.file_list_container.grid_columnconfigure(0, weight=0) # 序号
@@ -86,24 +119,81 @@ class PDFCropperApp(ctk.CTk, TkinterDnD.DnDWrapper):
         self.file_list_container.grid_columnconfigure(2, weight=0) # 文件大小
         self.file_list_container.grid_columnconfigure(3, weight=0) # 操作按钮1
         self.file_list_container.grid_columnconfigure(4, weight=0) # 操作按钮2
+        self.file_list_container.grid_columnconfigure(5, weight=0) # 滚动条
+
+        self.file_list_scrollbar = ctk.CTkScrollbar(self.file_list_container, command=self._on_scrollbar)
+        self.file_list_scrollbar.grid(row=0, column=5, rowspan=1000, sticky="ns")
+
+        # 表格头部
+        headers = ["序号", "文件名", "文件大小", "操作"]
+        for col, header_text in enumerate(headers):
+            ctk.CTkLabel(
+                self.file_list_container,
+                text=header_text,
+                font=ctk.CTkFont(weight="bold")
+            ).grid(row=0, column=col, columnspan=2 if col == 3 else 1, padx=5, pady=5, sticky="w" if col == 1 else "nsew")
+
+        self.file_rows = [] # 可见行的控件，每行为 (序号, 文件名, 文件大小, 目录按钮, 移除按钮)
+        self.first_visible_row = 0 # 第一个可见行对应的文件序号
+        self._create_file_row()
 
         # 拖拽功能绑定
         self.file_list_container.drop_target_register(DND_FILES)
         self.file_list_container.dnd_bind('<<Drop>>', self.handle_drop)
+        self.file_list_container.bind("<Configure>", self._on_file_list_resize)
+        self._bind_mouse_wheel(self.file_list_container)
 
-        # 初始化时候显示拖拽提示
+        # 初始化时候显示拖拽提示，有文件时隐藏
         self.drag_hint_label = ctk.CTkLabel(
             self.file_list_container,
-            text="拖拽PDF文件到此处",
+            text="拖拽PDF文件或文件夹到此处",
             font=ctk.CTkFont(size=20, weight="bold"),
             text_color="gray"
         )
-        # 放置在中间
-        self.drag_hint_label.grid(row=0, column=0, columnspan=5, padx=20, pady=50, sticky="nsew")
+
+        # 文件大小在后台线程中读取并缓存，避免在主线程中逐个访问磁盘（网络盘上尤其慢）
+        self.selected_pdf_set = set()
+        self.file_sizes = {} # 文件路径 -> 文件大小，读取失败时为None
+        self._metadata_queue = queue.Queue()
+        threading.Thread(target=self._load_metadata_in_thread, daemon=True).start()
+
+        # 预览区域：点击文件名后显示各页的低分辨率缩略图，并用红框标出将要应用的裁剪框
+        self.preview_frame = ctk.CTkFrame(self.main_frame)
+        self.preview_frame.grid(row=1, column=1, sticky="nsew", padx=10, pady=5)
+        self.preview_frame.grid_columnconfigure(0, weight=1)
+        self.preview_frame.grid_rowconfigure(1, weight=1)
+
+        self.preview_label = ctk.CTkLabel(self.preview_frame, text="预览: 点击文件名查看裁剪框", anchor="w")
+        self.preview_label.grid(row=0, column=0, columnspan=2, padx=5, pady=5, sticky="ew")
+
+        self.preview_canvas = ctk.CTkCanvas(self.preview_frame, highlightthickness=0, bg="gray60")
+        self.preview_canvas.grid(row=1, column=0, sticky="nsew", padx=(5, 0), pady=(0, 5))
+        self.preview_scrollbar = ctk.CTkScrollbar(self.preview_frame, command=self.preview_canvas.yview)
+        self.preview_scrollbar.grid(row=1, column=1, sticky="ns", pady=(0, 5))
+        self.preview_canvas.configure(yscrollcommand=self._on_preview_scroll)
+        self.preview_canvas.bind("<Configure>", lambda event: self._layout_preview())
+        self.preview_canvas.bind("<MouseWheel>", lambda event: self._scroll_preview(-1 if event.delta > 0 else 1)) # Windows/macOS
+        self.preview_canvas.bind("<Button-4>", lambda event: self._scroll_preview(-1)) # Linux
+        self.preview_canvas.bind("<Button-5>", lambda event: self._scroll_preview(1))
+
+        # 缩略图在后台线程中渲染，内容矩形（不含内边距）随缩略图一起检测并缓存，
+        # 修改内边距时直接用缓存的内容矩形重新计算红框，不需要重新分析页面
+        self.preview_path = None
+        self.preview_generation = 0 # 切换预览文件时递增，后台线程跳过过期的请求
+        self.preview_page_rects = [] # 预览文件每页的页面矩形（旋转后，与缩略图一致）
+        self.preview_rotations = [] # 预览文件每页从未旋转坐标到显示坐标的变换矩阵
+        self.preview_zoom = 0.0
+        self.preview_offsets = [] # 每页缩略图在画布中的纵坐标
+        self.preview_items = {} # 页码 -> (图片项, 缩略图)，保持对显示中缩略图的引用
+        self.preview_pending = set() # 已提交给后台线程、仍需要的 (文件, 页码, 缩放比例)
+        self.preview_boxes = {} # (文件, 页码) -> 内容矩形，没有内容时为None
+        self.thumbnail_cache = OrderedDict() # (文件, 页码, 缩放比例) -> 缩略图
+        self._render_queue = queue.Queue()
+        threading.Thread(target=self._render_previews_in_thread, daemon=True).start()
 
         # 5. 创建底部操作区域（后缀输入、内边距输入、开始按钮）
         self.controls_frame = ctk.CTkFrame(self.main_frame)
-        self.controls_frame.grid(row=2, column=0, sticky="ew", padx=10, pady=10)
+        self.controls_frame.grid(row=2, column=0, columnspan=2, sticky="ew", padx=10, pady=10)
         self.controls_frame.grid_columnconfigure(0, weight=0) # Label - 后缀
         self.controls_frame.grid_columnconfigure(1, weight=1) # Entry - 后缀
         self.controls_frame.grid_columnconfigure(2, weight=0) # Label - 内边距
@@ -124,6 +214,7 @@ class PDFCropperApp(ctk.CTk, TkinterDnD.DnDWrapper):
         self.margin_entry = ctk.CTkEntry(self.controls_frame, placeholder_text="5")
         self.margin_entry.grid(row=0, column=3, padx=5, pady=5, sticky="ew")
         self.margin_entry.insert(0, "5") # 默认值
+        self.margin_entry.bind("<KeyRelease>", lambda event: self._redraw_preview_overlays())
 
         # 新增的复选框
         self.export_per_page_checkbox = ctk.CTkCheckBox(
@@ -142,14 +233,47 @@ class PDFCropperApp(ctk.CTk, TkinterDnD.DnDWrapper):
         )
         self.start_button.grid(row=0, column=5, padx=5, pady=5, sticky="e")
 
+        self.workers_label = ctk.CTkLabel(self.controls_frame, text="进程数:")
+        self.workers_label.grid(row=1, column=0, padx=5, pady=5, sticky="w")
+
+        self.workers_entry = ctk.CTkEntry(self.controls_frame, placeholder_text=str(os.cpu_count() or 1))
+        self.workers_entry.grid(row=1, column=1, padx=5, pady=5, sticky="ew")
+        self.workers_entry.insert(0, str(os.cpu_count() or 1)) # 默认使用全部CPU核心
+
+        self.cancel_button = ctk.CTkButton(
+            self.controls_frame,
+            text="取消",
+            state="disabled",
+            text_color_disabled="gray",
+            command=self.cancel_processing
+        )
+        self.cancel_button.grid(row=1, column=5, padx=5, pady=5, sticky="e")
+
         # 6. 创建进度条区域
         self.progress_frame = ctk.CTkFrame(self.main_frame)
-        self.progress_frame.grid(row=3, column=0, sticky="ew", padx=10, pady=10)
+        self.progress_frame.grid(row=3, column=0, columnspan=2, sticky="ew", padx=10, pady=10)
         self.progress_frame.grid_columnconfigure(0, weight=1)
 
         self.progress_label = ctk.CTkLabel(self.progress_frame, text="状态: 等待选择文件...")
         self.progress_label.grid(row=0, column=0, padx=5, pady=5, sticky="w")
 
+        self.progress_bar = ctk.CTkProgressBar(self.progress_frame)
+        self.progress_bar.grid(row=1, column=0, padx=5, pady=(0, 5), sticky="ew")
+        self.progress_bar.set(0)
+
+        # 进程池和用于跨进程传递进度、取消标记的 Manager 在第一次处理时创建，之后复用，
+        # 避免每次处理都重新启动子进程和导入 PyMuPDF；进程数变化或有子进程异常退出后重新创建进程池
+        self.executor = None
+        self.executor_workers = 0
+        self.executor_broken = False
+        self.manager = None
+        self.cancel_event = None
+        self.cancel_requested = False
+        self.closing = False
+
+        # 关闭窗口时取消正在进行的处理并结束子进程
+        self.protocol("WM_DELETE_WINDOW", self.on_closing)
+
         # 7. 绑定文件列表的双击事件，允许移除文件
         # 改成按钮操作
         # self.file_list_textbox.bind("<Double-Button-1>", self.remove_selected_file)
@@ -157,7 +281,16 @@ class PDFCropperApp(ctk.CTk, TkinterDnD.DnDWrapper):
         # 初始更新文件列表显示
         self.update_file_list_display()
 
+        # 窗口显示之后再在后台导入 PyMuPDF，启动时不必等待
+        self.after(100, lambda: threading.Thread(target=self._warm_up_in_thread, daemon=True).start())
+
     
+    def _warm_up_in_thread(self):
+        """后台线程：预先导入 PyMuPDF 和 numpy，使第一次预览和裁剪不必等待导入"""
+        fitz.load()
+        if np is not None:
+            np.load()
+
     def format_bytes(self, size_bytes):
         """格式化文件大小为易读的B，KB，MB等"""
         if size_bytes == 0:
@@ -170,41 +303,91 @@ class PDFCropperApp(ctk.CTk, TkinterDnD.DnDWrapper):
     
 
     def handle_drop(self, event):
-        """处理拖拽文件事件。"""
-        # event.data 包含了拖拽进来的文件路径，通常是一个空格分隔的字符串
-        # 对于Windows，路径可能包含大括号 {}
-        paths_str = event.data.strip()
-        if paths_str.startswith('{') and paths_str.endswith('}'):
-            # 移除大括号，并按空格分割（如果路径中没有空格）
-            # 更稳健的方法是使用 shlex.split 但这里假设简单的路径
-            paths = paths_str[1:-1].split('} {')
-        else:
-            paths = paths_str.split(' ') # macOS/Linux 可能直接是空格分隔
-
-        pdf_paths = [p for p in paths if p.lower().endswith(".pdf")]
+        """处理拖拽文件事件，文件夹在后台线程中递归查找PDF文件。"""
+        # event.data 是 Tcl 列表，含空格的路径被大括号 {} 包围，用 splitlist 解析
+        paths = self.tk.splitlist(event.data)
+        folders = [p for p in paths if os.path.isdir(p)]
+        pdf_paths = [p for p in paths if p.lower().endswith(".pdf") and p not in folders]
         if pdf_paths:
             self._add_files_to_list(pdf_paths)
             self.progress_label.configure(text=f"状态: 已拖入 {len(pdf_paths)} 个文件。")
-        else:
+        if folders:
+            self.progress_label.configure(text=f"状态: 正在扫描 {len(folders)} 个文件夹...")
+            threading.Thread(target=self._scan_folders_in_thread, args=(folders,), daemon=True).start()
+        elif not pdf_paths:
             messagebox.showwarning("文件类型错误", "请拖入有效的PDF文件。")
+
+
+    def _scan_folders_in_thread(self, folders):
+        """在后台线程中递归查找文件夹中的PDF文件，分批添加到列表"""
+        batch = []
+        found_cnt = 0
+        last_update = time.monotonic()
+        for folder in folders:
+            for root, _, file_names in os.walk(folder):
+                batch.extend(os.path.join(root, name) for name in file_names if name.lower().endswith(".pdf"))
+                # 每隔一段时间把已找到的文件交给主线程，大目录扫描过程中列表也会逐步更新
+                if batch and time.monotonic() - last_update > 0.2:
+                    found_cnt += len(batch)
+                    self.after(0, self._add_files_to_list, batch)
+                    batch = []
+                    last_update = time.monotonic()
+        found_cnt += len(batch)
+        if batch:
+            self.after(0, self._add_files_to_list, batch)
+        self.after(0, self._folder_scan_finished, found_cnt)
+
+
+    def _folder_scan_finished(self, found_cnt):
+        if found_cnt:
+            self.progress_label.configure(text=f"状态: 已从文件夹中添加 {found_cnt} 个PDF文件。当前 {len(self.selected_pdf_files)} 个文件。")
+        else:
+            messagebox.showwarning("文件类型错误", "拖入的文件夹中没有PDF文件。")
     
 
     def _add_files_to_list(self, new_file_paths):
         """将新的文件路径添加到列表中，并避免重复。"""
-        current_paths_set = set(self.selected_pdf_files)
-        added_count = 0
+        added_paths = []
         for path in new_file_paths:
-            if path not in current_paths_set:
+            if path not in self.selected_pdf_set:
                 self.selected_pdf_files.append(path)
-                current_paths_set.add(path)
-                added_count += 1
+                self.selected_pdf_set.add(path)
+                added_paths.append(path)
         
-        # 确保排序，以便显示顺序一致
-        self.selected_pdf_files.sort()
-        
-        if added_count > 0:
+        if added_paths:
+            # 确保排序，以便显示顺序一致
+            self.selected_pdf_files.sort()
+            self._metadata_queue.put([path for path in added_paths if path not in self.file_sizes])
             self.update_file_list_display()
-            self.progress_label.configure(text=f"状态: 已添加 {added_count} 个文件。当前 {len(self.selected_pdf_files)} 个文件。")
+            if self.preview_path is None:
+                self.show_preview(self.selected_pdf_files[0])
+            self.progress_label.configure(text=f"状态: 已添加 {len(added_paths)} 个文件。当前 {len(self.selected_pdf_files)} 个文件。")
+
+
+    def _load_metadata_in_thread(self):
+        """后台线程：读取文件大小，分批交给主线程更新缓存和可见行"""
+        while True:
+            paths = self._metadata_queue.get()
+            sizes = {}
+            last_update = time.monotonic()
+            for path in paths:
+                try:
+                    sizes[path] = os.path.getsize(path)
+                except OSError as e:
+                    sizes[path] = None
+                    print(f"获取文件信息失败: {e}")
+                if time.monotonic() - last_update > 0.1:
+                    self.after(0, self._on_metadata_loaded, sizes)
+                    sizes = {}
+                    last_update = time.monotonic()
+            if sizes:
+                self.after(0, self._on_metadata_loaded, sizes)
+
+
+    def _on_metadata_loaded(self, sizes):
+        """更新文件大小缓存，在主线程中执行"""
+        self.file_sizes.update(sizes)
+        self.update_file_list_display()
 
     
     def select_pdf_files(self):
@@ -222,96 +405,123 @@ class PDFCropperApp(ctk.CTk, TkinterDnD.DnDWrapper):
         """清空文件列表"""
         if messagebox.askyesno("清空确认", "确定要清空文件列表吗？"):
             self.selected_pdf_files = []
+            self.selected_pdf_set = set()
             self.update_file_list_display()
+            self.show_preview(None)
             self.progress_label.configure(text="状态：文件列表已清空。")
             self.select_files_button.configure(state="normal")
             self.start_button.configure(state="normal")
 
-    def update_file_list_display(self):
-        """更新文件列表显示区域的内容(表格形式)"""
-        # 清空之前的表格内容
-        for widget in self.file_list_container.winfo_children():
-            widget.destroy()
+    def _create_file_row(self):
+        """在表格末尾创建一行控件，按钮在点击时根据所在行和滚动位置确定对应的文件"""
+        slot = len(self.file_rows)
+        row_num = slot + 1
+        # 序号
+        index_label = ctk.CTkLabel(self.file_list_container, text="")
+        index_label.grid(row=row_num, column=0, padx=5, pady=2, sticky="w")
+        # 文件名
+        name_label = ctk.CTkLabel(self.file_list_container, text="", anchor="w", cursor="hand2")
+        name_label.grid(row=row_num, column=1, padx=5, pady=2, sticky="ew")
+        name_label.bind("<Button-1>", lambda event: self.show_preview(self.selected_pdf_files[self.first_visible_row + slot]))
+        # 文件大小
+        size_label = ctk.CTkLabel(self.file_list_container, text="")
+        size_label.grid(row=row_num, column=2, padx=5, pady=2, sticky="e")
+
+        # 操作按钮 - 打开文件所在目录
+        open_button = ctk.CTkButton(
+            self.file_list_container,
+            # text="📁", # 文件夹图标
+            text="目录",
+            width=30, height=20,
+            text_color_disabled="gray",
+            command=lambda: self.open_file_location(self.selected_pdf_files[self.first_visible_row + slot])
+        )
+        open_button.grid(row=row_num, column=3, padx=(5,2), pady=2, sticky="nsew")
 
-        if not self.selected_pdf_files:
-            # 显示拖拽提示
-            self.drag_hint_label = ctk.CTkLabel(
-                self.file_list_container,
-                text="将PDF文件拖入此处",
-                font=ctk.CTkFont(size=20, weight="bold"),
-                text_color="gray"
-            )
-            self.drag_hint_label.grid(row=0, column=0, columnspan=5, sticky="nsew", padx=20, pady=50)
-            return
+        # 操作按钮 - 移除列表
+        remove_button = ctk.CTkButton(
+            self.file_list_container,
+            # text="🗑️", # 垃圾桶图标
+            text="移除",
+            width=30, height=20,
+            text_color_disabled="gray",
+            command=lambda: self.remove_file_from_list(self.first_visible_row + slot)
+        )
+        remove_button.grid(row=row_num, column=4, padx=(2,5), pady=2, sticky="nsew")
+
+        widgets = (index_label, name_label, size_label, open_button, remove_button)
+        for widget in widgets:
+            self._bind_mouse_wheel(widget)
+        self.file_rows.append(widgets)
+
+    def _visible_row_count(self):
+        """根据列表区域的高度计算能显示的行数"""
+        row_height = self.file_rows[0][1].winfo_reqheight() + 4 # 加上上下 pady
+        list_height = self.file_list_container.winfo_height() - row_height # 减去表头
+        return max(MIN_VISIBLE_ROWS, list_height // max(row_height, 1))
+
+    def _on_file_list_resize(self, event):
+        """窗口大小变化时按需补充行控件"""
+        while len(self.file_rows) < self._visible_row_count():
+            self._create_file_row()
+        self.update_file_list_display()
 
-        # 隐藏拖拽提示 (如果它存在)
-        if hasattr(self, 'drag_hint_label') and self.drag_hint_label.winfo_exists():
-            self.drag_hint_label.destroy()
+    def _bind_mouse_wheel(self, widget):
+        widget.bind("<MouseWheel>", lambda event: self._scroll_file_list(-1 if event.delta > 0 else 1)) # Windows/macOS
+        widget.bind("<Button-4>", lambda event: self._scroll_file_list(-1)) # Linux
+        widget.bind("<Button-5>", lambda event: self._scroll_file_list(1))
 
-        # 表格头部
-        headers = ["序号", "文件名", "文件大小", "操作"]
-        for col, header_text in enumerate(headers):
-            ctk.CTkLabel(
-                self.file_list_container,
-                text=header_text,
-                font=ctk.CTkFont(weight="bold")
-            ).grid(row=0, column=col, padx=5, pady=5, sticky="w" if col == 1 else "nsew")
+    def _scroll_file_list(self, rows):
+        self.first_visible_row += rows * 3
+        self.update_file_list_display()
 
-        # 表格内容
-        for i, path in enumerate(self.selected_pdf_files):
-            row_num = i + 1
-            try:
-                file_name = os.path.basename(path)
-                file_size_bytes = os.path.getsize(path)
-                file_size_formatted = self.format_bytes(file_size_bytes)
-            except Exception as e:
+    def _on_scrollbar(self, *args):
+        """滚动条回调，参数与 tkinter 的 yview 相同：("moveto", 比例) 或 ("scroll", 数量, "units"/"pages")"""
+        if args[0] == "moveto":
+            self.first_visible_row = round(float(args[1]) * len(self.selected_pdf_files))
+        elif args[0] == "scroll":
+            step = len(self.file_rows) if args[2] == "pages" else 1
+            self.first_visible_row += int(args[1]) * step
+        self.update_file_list_display()
+
+    def update_file_list_display(self):
+        """更新文件列表显示区域的内容(表格形式)，只重新填充可见的行"""
+        total = len(self.selected_pdf_files)
+        if not total:
+            # 显示拖拽提示
+            self.drag_hint_label.place(relx=0.5, rely=0.5, anchor="center")
+        else:
+            self.drag_hint_label.place_forget()
+
+        visible_cnt = min(len(self.file_rows), self._visible_row_count())
+        self.first_visible_row = max(0, min(self.first_visible_row, total - visible_cnt))
+
+        for slot, widgets in enumerate(self.file_rows):
+            index = self.first_visible_row + slot
+            if slot >= visible_cnt or index >= total:
+                for widget in widgets:
+                    widget.grid_remove()
+                continue
+            path = self.selected_pdf_files[index]
+            file_size_bytes = self.file_sizes.get(path, -1)
+            if file_size_bytes is None:
                 file_name = f"文件不存在或错误 ({os.path.basename(path)})"
                 file_size_formatted = "错误"
-                print(f"获取文件信息失败: {e}")
-
-            # 序号
-            ctk.CTkLabel(
-                self.file_list_container, 
-                text=str(row_num)
-            ).grid(
-                row=row_num, column=0, padx=5, pady=2, sticky="w"
-            )
-            # 文件名
-            ctk.CTkLabel(
-                self.file_list_container, 
-                text=file_name
-            ).grid(
-                row=row_num, column=1, padx=5, pady=2, sticky="w"
-            )
-            # 文件大小
-            ctk.CTkLabel(
-                self.file_list_container, 
-                text=file_size_formatted
-            ).grid(
-                row=row_num, column=2, padx=5, pady=2, sticky="e"
-            )
+            else:
+                file_name = os.path.basename(path)
+                file_size_formatted = "..." if file_size_bytes < 0 else self.format_bytes(file_size_bytes)
 
-            # 操作按钮 - 打开文件所在目录
-            open_button = ctk.CTkButton(
-                self.file_list_container,
-                # text="📁", # 文件夹图标
-                text="目录",
-                width=30, height=20,
-                text_color_disabled="gray",
-                command=lambda p=path: self.open_file_location(p)
-            )
-            open_button.grid(row=row_num, column=3, padx=(5,2), pady=2, sticky="nsew")
+            index_label, name_label, size_label = widgets[:3]
+            index_label.configure(text=str(index + 1))
+            name_label.configure(text=file_name)
+            size_label.configure(text=file_size_formatted)
+            for widget in widgets:
+                widget.grid()
 
-            # 操作按钮 - 移除列表
-            remove_button = ctk.CTkButton(
-                self.file_list_container,
-                # text="🗑️", # 垃圾桶图标
-                text="移除",
-                width=30, height=20,
-                text_color_disabled="gray",
-                command=lambda idx=i: self.remove_file_from_list(idx)
-            )
-            remove_button.grid(row=row_num, column=4, padx=(2,5), pady=2, sticky="nsew")
+        if total:
+            self.file_list_scrollbar.set(self.first_visible_row / total, min(1.0, (self.first_visible_row + visible_cnt) / total))
+        else:
+            self.file_list_scrollbar.set(0.0, 1.0)
 
     def open_file_location(self, file_path):
         """打开文件所在目录。"""
@@ -333,8 +543,11 @@ class PDFCropperApp(ctk.CTk, TkinterDnD.DnDWrapper):
     def remove_file_from_list(self, index):
         """从列表中移除指定索引的文件。"""
         if messagebox.askyesno("确认移除", f"确定要从列表中移除文件：\n{os.path.basename(self.selected_pdf_files[index])}?"):
-            self.selected_pdf_files.pop(index)
+            removed = self.selected_pdf_files.pop(index)
+            self.selected_pdf_set.discard(removed)
             self.update_file_list_display()
+            if removed == self.preview_path:
+                self.show_preview(None)
             self.progress_label.configure(text=f"状态: 已移除文件。当前 {len(self.selected_pdf_files)} 个文件。")
     
     # def remove_selected_file(self, event):
@@ -360,6 +573,175 @@ class PDFCropperApp(ctk.CTk, TkinterDnD.DnDWrapper):
     #     except Exception as e:
     #         print(f"移除文件时发生错误: {e}")
     
+    def show_preview(self, path):
+        """在预览区域显示文件的各页缩略图，path 为None时清空预览"""
+        self.preview_path = path
+        self.preview_generation += 1
+        self.preview_page_rects = []
+        self.preview_rotations = []
+        self.preview_pending = set()
+        self._layout_preview()
+        if path is None:
+            self.preview_label.configure(text="预览: 点击文件名查看裁剪框")
+            return
+        self.preview_label.configure(text=f"预览: {os.path.basename(path)}（正在打开...）")
+        self._render_queue.put(("open", self.preview_generation, path))
+
+    def _render_previews_in_thread(self):
+        """后台线程：打开预览文件、渲染缩略图并检测内容矩形，结果交给主线程显示
+
+        只有这个线程访问预览用的文档，同一时间只保持最近预览的一个文档打开。
+        """
+        doc = None
+        doc_path = None
+        while True:
+            kind, generation, path, *args = self._render_queue.get()
+            if generation != self.preview_generation:
+                continue # 已经切换到其他文件
+            try:
+                if doc_path != path:
+                    if doc is not None:
+                        doc.close()
+                    doc, doc_path = None, None
+                    doc = fitz.open(path)
+                    doc_path = path
+                if kind == "open":
+                    self.after(0, self._on_preview_opened, generation, [page.rect for page in doc], [page.rotation_matrix for page in doc])
+                    continue
+                page_num, zoom, need_box = args
+                if (path, page_num, zoom) not in self.preview_pending:
+                    continue # 已经滚动到其他位置
+                page = doc[page_num]
+                ppm = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False).tobytes("ppm")
+                content_rect = find_content_rect(page) if need_box else None
+                self.after(0, self._on_thumbnail_rendered, path, page_num, zoom, ppm, need_box, content_rect)
+            except Exception as e:
+                self.after(0, self._on_preview_failed, generation, str(e))
+
+    def _on_preview_opened(self, generation, page_rects, rotations):
+        if generation != self.preview_generation:
+            return
+        self.preview_page_rects = page_rects
+        self.preview_rotations = rotations
+        self.preview_label.configure(text=f"预览: {os.path.basename(self.preview_path)}（共 {len(page_rects)} 页）")
+        self._layout_preview()
+
+    def _on_preview_failed(self, generation, error):
+        if generation == self.preview_generation:
+            self.preview_label.configure(text=f"预览: 无法打开 {os.path.basename(self.preview_path)}（{error}）")
+
+    def _layout_preview(self):
+        """按画布宽度计算缩放比例，为每页放置占位框，再加载可见页面的缩略图"""
+        canvas = self.preview_canvas
+        canvas.delete("all")
+        self.preview_items = {}
+        self.preview_offsets = []
+        if not self.preview_page_rects:
+            canvas.configure(scrollregion=(0, 0, 0, 0))
+            return
+        available_width = max(canvas.winfo_width() - 2 * PREVIEW_PAGE_GAP, 50)
+        widest = max(rect.width for rect in self.preview_page_rects) or 1
+        steps = max(1, int(available_width / widest / PREVIEW_ZOOM_STEP))
+        self.preview_zoom = round(steps * PREVIEW_ZOOM_STEP, 2)
+
+        y = PREVIEW_PAGE_GAP
+        for page_num, rect in enumerate(self.preview_page_rects):
+            self.preview_offsets.append(y)
+            width, height = rect.width * self.preview_zoom, rect.height * self.preview_zoom
+            canvas.create_rectangle(PREVIEW_PAGE_GAP, y, PREVIEW_PAGE_GAP + width, y + height, fill="white", outline="gray40")
+            y += height + PREVIEW_PAGE_GAP
+        canvas.configure(scrollregion=(0, 0, available_width + 2 * PREVIEW_PAGE_GAP, y))
+        self._load_visible_thumbnails()
+
+    def _on_preview_scroll(self, first, last):
+        self.preview_scrollbar.set(first, last)
+        self._load_visible_thumbnails()
+
+    def _scroll_preview(self, units):
+        self.preview_canvas.yview_scroll(units * 3, "units")
+
+    def _load_visible_thumbnails(self):
+        """显示可见页面（及上下各一页）的缩略图，缓存中没有的提交给后台线程渲染"""
+        if not self.preview_offsets:
+            return
+        canvas = self.preview_canvas
+        top = canvas.canvasy(0)
+        bottom = top + canvas.winfo_height()
+        wanted = set()
+        requests = []
+        for page_num, y in enumerate(self.preview_offsets):
+            height = self.preview_page_rects[page_num].height * self.preview_zoom
+            if y + height < top - height or y > bottom + height:
+                continue
+            if page_num in self.preview_items:
+                continue
+            key = (self.preview_path, page_num, self.preview_zoom)
+            if key in self.thumbnail_cache:
+                self.thumbnail_cache.move_to_end(key)
+                self._show_thumbnail(page_num, self.thumbnail_cache[key])
+                continue
+            wanted.add(key)
+            if key not in self.preview_pending:
+                need_box = (self.preview_path, page_num) not in self.preview_boxes
+                requests.append(("page", self.preview_generation, self.preview_path, page_num, self.preview_zoom, need_box))
+        # 滚出可见范围的请求不再需要，后台线程会跳过它们；先更新集合再提交，避免新请求被误跳过
+        self.preview_pending = wanted
+        for request in requests:
+            self._render_queue.put(request)
+
+    def _on_thumbnail_rendered(self, path, page_num, zoom, ppm, has_box, content_rect):
+        """缓存后台线程渲染的缩略图，仍在预览该页时显示，在主线程中执行"""
+        if has_box:
+            self.preview_boxes[path, page_num] = content_rect
+        photo = tk.PhotoImage(data=ppm)
+        key = (path, page_num, zoom)
+        self.thumbnail_cache[key] = photo
+        self.thumbnail_cache.move_to_end(key)
+        while len(self.thumbnail_cache) > PREVIEW_CACHE_SIZE:
+            self.thumbnail_cache.popitem(last=False)
+        self.preview_pending.discard(key)
+        if path == self.preview_path and zoom == self.preview_zoom and page_num not in self.preview_items:
+            self._show_thumbnail(page_num, photo)
+
+    def _show_thumbnail(self, page_num, photo):
+        item = self.preview_canvas.create_image(PREVIEW_PAGE_GAP, self.preview_offsets[page_num], image=photo, anchor="nw")
+        self.preview_items[page_num] = (item, photo)
+        self._draw_overlay(page_num, self._preview_margin())
+
+    def _preview_margin(self):
+        try:
+            return max(int(self.margin_entry.get().strip()), 0)
+        except ValueError:
+            return None
+
+    def _draw_overlay(self, page_num, margin):
+        """用缓存的内容矩形和当前内边距绘制裁剪框"""
+        tag = f"overlay{page_num}"
+        self.preview_canvas.delete(tag)
+        content_rect = self.preview_boxes.get((self.preview_path, page_num))
+        if margin is None or content_rect is None:
+            return
+        page_rect = self.preview_page_rects[page_num]
+        rotation = self.preview_rotations[page_num]
+        # 内容矩形和裁剪框使用未旋转的坐标，缩略图按旋转后的页面渲染
+        cropbox = apply_margin_to_rect(page_rect * ~rotation, content_rect, margin)
+        if cropbox is None:
+            return
+        cropbox = cropbox * rotation
+        zoom = self.preview_zoom
+        x = PREVIEW_PAGE_GAP - page_rect.x0 * zoom
+        y = self.preview_offsets[page_num] - page_rect.y0 * zoom
+        self.preview_canvas.create_rectangle(
+            x + cropbox.x0 * zoom, y + cropbox.y0 * zoom, x + cropbox.x1 * zoom, y + cropbox.y1 * zoom,
+            outline="red", width=2, tags=tag
+        )
+
+    def _redraw_preview_overlays(self):
+        """内边距变化后重新绘制所有已显示页面的裁剪框"""
+        margin = self._preview_margin()
+        for page_num in self.preview_items:
+            self._draw_overlay(page_num, margin)
+
     def start_processing(self):
         """开始裁剪PDF文件的操作"""
         if not self.selected_pdf_files:
@@ -379,59 +761,193 @@ class PDFCropperApp(ctk.CTk, TkinterDnD.DnDWrapper):
             messagebox.showerror("错误", "内边距必须是一个非负整数。")
             return
         
+        try:
+            workers = int(self.workers_entry.get().strip())
+            if workers < 1:
+                raise ValueError("进程数必须是正整数。")
+        except ValueError:
+            messagebox.showerror("错误", "进程数必须是一个正整数。")
+            return
+
         # 获取复选框的值
         export_per_page = self.export_per_page_checkbox.get()
+        options = CropOptions(suffix=suffix, margin=margin, export_per_page=bool(export_per_page))
 
         # 禁用按钮，避免重复点击
         self.select_files_button.configure(state="disabled")
         self.clear_list_button.configure(state="disabled")
         self.start_button.configure(state="disabled")
         self.export_per_page_checkbox.configure(state="disabled")
-        self.progress_label.configure(text="状态：正在处理中...")
+        self.workers_entry.configure(state="disabled")
+        self.cancel_button.configure(state="normal")
+        self.progress_bar.set(0)
+        self.progress_label.configure(text="状态：正在启动处理进程...")
+        self.cancel_requested = False
 
-        # 使用线程处理PDF裁剪，避免GUI卡死
+        # 使用线程分发任务和汇总进度，避免GUI卡死
         self.processing_thread = threading.Thread(
             target=self._process_files_in_thread,
-            args=(self.selected_pdf_files, suffix, margin, export_per_page)
+            args=(list(self.selected_pdf_files), options, workers),
+            daemon=True
         )
         self.processing_thread.start()
 
+
+    def cancel_processing(self):
+        """取消处理：未开始的文件不再处理，正在处理的文件在当前页完成后停止"""
+        self.cancel_requested = True
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+        self.cancel_button.configure(state="disabled")
+        self.progress_label.configure(text="状态: 正在取消，等待当前页处理完成...")
+
+
+    def on_closing(self):
+        """关闭窗口：通知子进程在当前页完成后停止，取消未开始的文件，然后结束进程池和 Manager"""
+        self.closing = True
+        self.cancel_requested = True
+        try:
+            if self.cancel_event is not None:
+                self.cancel_event.set()
+        except Exception: # Manager 进程已经退出
+            pass
+        if self.executor is not None:
+            # 不等待正在处理的文件，窗口立即关闭
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        if self.manager is not None:
+            self.manager.shutdown()
+            self.manager = None
+        self.destroy()
+
+
+    def _get_executor(self, workers):
+        """返回进程数为 workers 的进程池，在后台线程中调用"""
+        if self.manager is None:
+            self.manager = multiprocessing.Manager()
+        if self.executor is None or self.executor_workers != workers or self.executor_broken:
+            if self.executor is not None:
+                # 有子进程异常退出（如内存不足被系统杀死）后进程池不再可用，需要重新创建
+                self.executor.shutdown(wait=not self.executor_broken)
+            self.executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(logging.WARNING,))
+            self.executor_workers = workers
+            self.executor_broken = False
+        return self.executor
+
     
-    def _process_files_in_thread(self, files_to_process, suffix, margin, export_per_page):
-        """在单独的线程中处理文件"""
-        processed_cnt = 0
+    def _process_files_in_thread(self, files_to_process, options, workers):
+        """在单独的线程中把文件分发到进程池，汇总各进程报告的进度并定时刷新界面"""
         total_files = len(files_to_process)
-        errors = []
-
-        for i, input_path in enumerate(files_to_process):
-            try:
-                # 调用裁剪函数
-                saved_files_cnt = crop_pdf_margins(input_path, suffix, margin, export_per_page)
-                processed_cnt += saved_files_cnt # 如果是按页导出，计数会增加
-                # 更新GUI状态（需要在主线程执行）
-                self.after(0, self.update_progress_label, 
-                           f"状态: 正在处理 {os.path.basename(input_path)} ({i+1}/{total_files})...")
-            except Exception as e:
-                errors.append(f"文件 {os.path.basename(input_path)} 处理失败: {e}")
-                self.after(0, self.update_progress_label, 
-                           f"状态: 处理 {os.path.basename(input_path)} 失败 ({i+1}/{total_files})...")
+        try:
+            executor = self._get_executor(workers)
+            events = self.manager.Queue()
+            self.cancel_event = self.manager.Event()
+            if self.cancel_requested: # 进程启动完成之前已经点击了取消
+                self.cancel_event.set()
+            futures = {
+                executor.submit(_crop_file_in_worker, i, path, options, events, self.cancel_event): i
+                for i, path in enumerate(files_to_process)
+            }
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                self.executor_broken = True
+            if not self.closing:
+                self.after(0, self._processing_finished, 0, total_files, [f"无法启动处理进程: {e}"], False)
+            return
 
-        # 处理完成，更新状态，启用按钮（在主线程执行）
-        self.after(0, self._processing_finished, processed_cnt, total_files, errors)
+        start_time = time.monotonic()
+        page_counts = {} # 文件序号 -> 总页数
+        pages_done = {} # 文件序号 -> 已完成页数
+        results = []
+        current = None # 最近报告进度的 (文件序号, 页码)
+        pending = set(futures)
+        last_update = 0.0
+        while pending:
+            done, pending = wait(pending, timeout=PROGRESS_INTERVAL, return_when=FIRST_COMPLETED)
+            if self.closing: # 窗口已关闭，进程池和 Manager 已经结束
+                return
+            if self.cancel_event.is_set():
+                # 还没开始的文件直接取消，已在处理的文件由 crop_pdf 在下一页之前停止
+                for future in pending:
+                    future.cancel()
+            for future in done:
+                if not future.cancelled():
+                    try:
+                        results.append(future.result())
+                    except Exception as e: # 子进程异常退出等，crop_pdf 本身不会抛出异常
+                        if isinstance(e, BrokenProcessPool):
+                            self.executor_broken = True # 下次处理时重新创建进程池
+                        results.append(e)
+            while True:
+                try:
+                    kind, index, value = events.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == "start":
+                    page_counts[index] = value
+                    pages_done.setdefault(index, 0)
+                else:
+                    pages_done[index] = value + 1
+                    current = (index, value)
+
+            now = time.monotonic()
+            if now - last_update >= PROGRESS_INTERVAL or not pending:
+                last_update = now
+                self.after(0, self._update_progress, files_to_process, total_files - len(pending), total_files,
+                           page_counts, dict(pages_done), current, now - start_time)
+
+        saved_files_cnt = 0
+        errors = []
+        for result in results:
+            if isinstance(result, Exception):
+                errors.append(f"处理失败: {result}")
+            elif not result.ok:
+                errors.append(f"文件 {os.path.basename(result.input_path)} 处理失败: {result.error}")
+            else:
+                saved_files_cnt += len(result.output_paths) # 如果是按页导出，计数会增加
+        cancelled = self.cancel_event.is_set()
+        self.after(0, self._processing_finished, saved_files_cnt, total_files, errors, cancelled)
+
+
+    def _update_progress(self, files_to_process, finished_files, total_files, page_counts, pages_done, current, elapsed):
+        """更新进度条和状态，在主线程中执行"""
+        # 已完成的文件计为1，正在处理的文件按已完成的页数比例计算
+        running_fraction = sum(
+            pages_done[index] / page_counts[index] for index in pages_done if page_counts.get(index)
+        )
+        finished_pages = sum(pages_done.values())
+        fraction = min(1.0, max(finished_files, running_fraction) / total_files)
+        self.progress_bar.set(fraction)
+
+        message = f"状态: 已完成 {finished_files}/{total_files} 个文件"
+        if current is not None:
+            index, page_num = current
+            message += f"，正在处理 {os.path.basename(files_to_process[index])} 第 {page_num + 1}/{page_counts.get(index, '?')} 页"
+        if elapsed > 0:
+            message += f"，{finished_pages / elapsed:.1f} 页/秒"
+        if 0 < fraction < 1:
+            remaining = int(elapsed * (1 - fraction) / fraction)
+            message += f"，剩余约 {remaining // 60:02d}:{remaining % 60:02d}"
+        self.progress_label.configure(text=message)
 
     
     def update_progress_label(self, message):
         """更新进度标签，在主线程中执行"""
         self.progress_label.configure(text=message)
 
-    def _processing_finished(self, processed_cnt, total_files, errors):
+    def _processing_finished(self, processed_cnt, total_files, errors, cancelled):
         """处理完成后执行回调函数，在主线程中执行"""
         self.select_files_button.configure(state="normal")
         self.clear_list_button.configure(state="normal")
         self.start_button.configure(state="normal")
         self.export_per_page_checkbox.configure(state="normal")
+        self.workers_entry.configure(state="normal")
+        self.cancel_button.configure(state="disabled")
 
-        if not errors:
+        if cancelled:
+            self.progress_label.configure(text=f"状态: 已取消，{total_files} 个文件中已保存 {processed_cnt} 个输出文件。")
+        elif not errors:
+            self.progress_bar.set(1)
             messagebox.showinfo(
                 "处理完成",
                 f"所有 {total_files} 个文件已成功处理！"
@@ -441,7 +957,7 @@ class PDFCropperApp(ctk.CTk, TkinterDnD.DnDWrapper):
             error_msg = "\n".join(errors)
             messagebox.showerror(
                 "处理完成(有错误)",
-                f"共处理 {total_files} 个文件，成功 {processed_cnt} 个，失败 {len(errors)} 个。\n\n",
+                f"共处理 {total_files} 个文件，成功 {total_files - len(errors)} 个，失败 {len(errors)} 个。\n\n"
                 f"错误信息：\n{error_msg}"
             )
             self.progress_label.configure(text=f"状态: 处理完成，有 {len(errors)} 个文件处理失败。")
@@ -452,6 +968,7 @@ class PDFCropperApp(ctk.CTk, TkinterDnD.DnDWrapper):
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support() # 打包为可执行文件后，子进程需要从这里启动
     ctk.set_appearance_mode("System")  # Modes: "System" (default), "Dark", "Light"
     ctk.set_default_color_theme("blue")  # Themes: "blue" (default), "green", "dark-blue"
 
@@ -1,8 +1,191 @@
-import fitz
-import argparse
+from __future__ import annotations
+
 import os
 
-def crop_pdf_margins(input_pdf_path: str, suffix: str, margin: int, export_per_page: bool) -> int:
+# PyMuPDF 默认把提示信息写到标准输出；改为标准错误，使管道模式的标准输出只包含PDF数据
+os.environ.setdefault("PYMUPDF_MESSAGE", "fd:2")
+
+import argparse
+import gc
+import glob
+import json
+import logging
+import re
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import BinaryIO, Callable
+
+import crop_profile
+from crop_cache import CropBoxCache, page_content_key
+from crop_lazy import lazy_import
+from crop_manifest import CropManifest
+from crop_profile import stage
+from crop_rects import RectSet
+from crop_supervisor import Quarantine, SupervisedPool, WorkerLimits
+
+# fitz 在第一次使用时才导入，--help 和参数错误等不需要打开PDF的情况不必等待导入 PyMuPDF
+fitz = lazy_import("fitz")
+
+logger = logging.getLogger("pdf_cropper")
+
+
+class CropCancelled(Exception):
+    """裁剪在两页之间被取消"""
+
+
+@dataclass
+class DetectionBudget:
+    """单页内容检测的成本上限，超出后改用更廉价的引擎
+
+    Attributes:
+        max_objects (int): 矢量图形数量上限，0 表示不限制；在解释内容流之前按绘图操作符的数量估计
+        max_seconds (float): 单页检测的耗时上限（秒），0 表示不限制；在各检测阶段之间检查
+        fallback (str): 超出预算时改用的引擎；stext 不创建 Python 对象，内存占用和耗时都远低于 get_drawings
+    """
+    max_objects: int = 0
+    max_seconds: float = 0.0
+    fallback: str = "stext"
+
+    def exceeded(self, page: fitz.Page, start: float) -> str | None:
+        """检查从 start 开始的检测是否超出预算
+
+        Returns:
+            str | None: 超出的原因 time 或 objects，未超出时为None
+        """
+        if self.max_seconds and time.perf_counter() - start > self.max_seconds:
+            return "time"
+        if self.max_objects and estimate_page_objects(page) > self.max_objects:
+            return "objects"
+        return None
+
+
+@dataclass
+class CropOptions:
+    """裁剪参数，可以被 pickle 传递到子进程
+
+    Attributes:
+        suffix (str): 裁剪后文件的后缀
+        margin (int): 裁剪时的内边距，单位为点
+        export_per_page (bool): 是否为每一页单独导出裁剪后的PDF
+        engine (str): 内容检测引擎，见 DETECTION_ENGINES
+        save_mode (str): 保存方式，见 SAVE_MODES
+        page_jobs (int): 计算裁剪框时使用的进程数，大于1时按页分片并行检测
+        cache (CropBoxCache | None): 裁剪框缓存，为None时不使用缓存
+        dry_run (bool): 只计算裁剪框，不写入任何文件
+        profile (bool): 记录各阶段的耗时和对象数量，见 crop_profile
+        budget (DetectionBudget | None): 单页检测的成本上限，为None时不限制
+        stream_window (int): 流式处理的窗口大小，每处理这么多页释放一次页面对象并清空 MuPDF 的资源缓存，0 表示关闭
+    """
+    suffix: str = "_cropped"
+    margin: int = 5
+    export_per_page: bool = False
+    engine: str = "objects"
+    save_mode: str = "default"
+    page_jobs: int = 1
+    cache: CropBoxCache | None = None
+    dry_run: bool = False
+    profile: bool = False
+    budget: DetectionBudget | None = None
+    stream_window: int = 0
+
+
+@dataclass
+class PageResult:
+    """单页的裁剪结果，矩形均为 (x0, y0, x1, y1)
+
+    Attributes:
+        page_num (int): 页码，从0开始
+        original_rect (tuple): 页面原始矩形
+        content_rect (tuple | None): 检测到的内容外接矩形，不含内边距
+        cropbox (tuple | None): 实际应用的裁剪框
+        skip_reason (str | None): 未裁剪的原因：no_content 没有内容；invalid_cropbox 裁剪框无效
+        output_path (str | None): 按页导出时的输出文件
+        timings (dict[str, float]): 各阶段耗时（秒），如 detect、save
+    """
+    page_num: int
+    original_rect: tuple
+    content_rect: tuple | None = None
+    cropbox: tuple | None = None
+    skip_reason: str | None = None
+    output_path: str | None = None
+    timings: dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class CropResult:
+    """单个文件的裁剪结果
+
+    Attributes:
+        input_path (str): 输入PDF文件路径
+        output_paths (list[str]): 保存的输出文件
+        pages (list[PageResult]): 每页的结果
+        error (str | None): 出错时的错误信息
+        timings (dict[str, float]): 各阶段耗时（秒），如 open、save、total
+        skipped (bool): 输入文件和参数与清单中的记录一致，没有重新处理；output_paths 为上次的输出
+        trace_events (list[dict]): 在子进程中启用性能分析时记录的事件，由主进程合并，不输出到 to_dict()
+    """
+    input_path: str
+    output_paths: list[str] = field(default_factory=list)
+    pages: list[PageResult] = field(default_factory=list)
+    error: str | None = None
+    timings: dict[str, float] = field(default_factory=dict)
+    skipped: bool = False
+    trace_events: list[dict] = field(default_factory=list, repr=False)
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        del data["trace_events"]
+        return data
+
+
+@dataclass
+class BatchResult:
+    """批量裁剪的结果
+
+    Attributes:
+        results (list[CropResult]): 每个文件的结果，顺序与输入一致
+        elapsed (float): 总耗时（秒）
+    """
+    results: list[CropResult] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def files(self) -> int:
+        return len(self.results)
+
+    @property
+    def pages(self) -> int:
+        return sum(len(result.pages) for result in self.results)
+
+    @property
+    def saved(self) -> int:
+        return sum(len(result.output_paths) for result in self.results if not result.skipped)
+
+    @property
+    def skipped(self) -> int:
+        return sum(result.skipped for result in self.results)
+
+    @property
+    def failures(self) -> int:
+        return sum(not result.ok for result in self.results)
+
+    def summary(self) -> dict:
+        return {"files": self.files, "pages": self.pages, "saved": self.saved, "skipped": self.skipped, "failures": self.failures,
+                "elapsed": self.elapsed}
+
+    def to_dict(self) -> dict:
+        return {"summary": self.summary(), "files": [result.to_dict() for result in self.results]}
+
+
+def crop_pdf_margins(input_pdf_path: str, suffix: str, margin: int, export_per_page: bool, page_jobs: int = 1, engine: str = "objects",
+                     cache: CropBoxCache | None = None, save_mode: str = "default") -> int:
     """自动裁剪PDF文件四周的空白，然后保存为新文件
 
     Args:
@@ -10,160 +193,1056 @@ def crop_pdf_margins(input_pdf_path: str, suffix: str, margin: int, export_per_p
         output_pdf_path (str): 输出PDF文件路径
         margin (int): 裁剪时的内边距，单位为点
         export_per_page (bool): 是否为每一页单独导出裁剪后的PDF
+        page_jobs (int): 计算裁剪框时使用的进程数，大于1时按页分片并行检测
+        engine (str): 内容检测引擎，见 DETECTION_ENGINES
+        cache (CropBoxCache | None): 裁剪框缓存，为None时不使用缓存
+        save_mode (str): 保存方式，见 SAVE_MODES
+
+    Returns:
+        int: 保存的文件数量，出错时为0
+    """
+    options = CropOptions(suffix, margin, export_per_page, engine, save_mode, page_jobs, cache)
+    result = crop_pdf(input_pdf_path, options)
+    return len(result.output_paths) if result.ok else 0
+
+
+def crop_pdf(input_pdf_path: str, options: CropOptions | None = None, progress: Callable[[PageResult], None] | None = None,
+             cancel=None, on_open: Callable[[int], None] | None = None) -> CropResult:
+    """裁剪单个PDF文件，返回结构化的结果，出错时不抛出异常而是记录在结果中
+
+    Args:
+        input_pdf_path (str): 输入PDF文件路径
+        options (CropOptions | None): 裁剪参数，为None时使用默认值
+        progress (Callable[[PageResult], None] | None): 每处理完一页调用一次
+        cancel (threading.Event | None): 任何有 is_set() 方法的对象；在每页开始前检查，已设置时停止处理且不再保存整个文档，
+            result.error 为“已取消”
+        on_open (Callable[[int], None] | None): 打开文档后、处理第一页之前以总页数调用一次，用于显示进度
+
+    Returns:
+        CropResult: 每页的原始矩形、检测到的内容矩形、应用的裁剪框和耗时
     """
-    saved_files_cnt = 0
+    options = options or CropOptions()
+    result = CropResult(input_pdf_path)
+    _run_crop(result, options, lambda: _crop_document(input_pdf_path, options, result, progress, cancel, on_open))
+    return result
+
+
+def crop_pdf_bytes(data: bytes | BinaryIO, options: CropOptions | None = None, name: str = "<memory>",
+                   progress: Callable[[PageResult], None] | None = None, cancel=None) -> tuple[bytes | list[bytes] | None, CropResult]:
+    """在内存中裁剪PDF，不读写任何文件
+
+    文档已经在内存中，page_jobs 和 stream_window 不起作用；suffix 也不使用。
+    整体保存时不支持 incremental 和 inplace 两种增量保存方式。
+
+    Args:
+        data (bytes | BinaryIO): PDF文件内容，或可读取的二进制文件对象
+        options (CropOptions | None): 裁剪参数，为None时使用默认值
+        name (str): 日志和结果中使用的名称
+        progress (Callable[[PageResult], None] | None): 每处理完一页调用一次
+        cancel (threading.Event | None): 在每页开始前检查，已设置时停止处理，见 crop_pdf
+
+    Returns:
+        tuple[bytes | list[bytes] | None, CropResult]: (裁剪后的PDF，按页导出时为每页一个PDF，只计算裁剪框或出错时为None, 每页的结果)
+    """
+    options = options or CropOptions()
+    result = CropResult(name)
+    output = _run_crop(result, options, lambda: _crop_stream(data, options, result, progress, cancel))
+    return output, result
+
+
+def _run_crop(result: CropResult, options: CropOptions, crop):
+    """执行 crop() 并记录总耗时，出错时把错误记录在 result 中，返回 crop() 的返回值"""
+    # 调用方（如主进程）已开启记录时直接写入其事件列表，否则由本次调用记录并随结果返回
+    owns_profile = options.profile and crop_profile.start()
+    start = time.perf_counter()
+    output = None
     try:
+        with stage("file", path=result.input_path):
+            output = crop()
+    except CropCancelled:
+        result.error = "已取消"
+        logger.info("已取消处理文件 %s", result.input_path)
+    except Exception as e:
+        result.error = str(e)
+        logger.error("处理文件 %s 时发生错误: %s", result.input_path, e)
+    finally:
+        if options.cache is not None:
+            options.cache.flush()
+        if owns_profile:
+            result.trace_events = crop_profile.stop()
+    result.timings["total"] = time.perf_counter() - start
+    return output
+
+
+def _check_cancel(cancel, page_num: int):
+    if cancel is not None and cancel.is_set():
+        raise CropCancelled(f"在第 {page_num + 1} 页之前取消")
+
+
+def _crop_document(input_pdf_path: str, options: CropOptions, result: CropResult, progress=None, cancel=None, on_open=None):
+    """crop_pdf 的实际实现，出错时直接抛出异常，结果逐步写入 result"""
+    if options.save_mode not in SAVE_MODES:
+        raise ValueError(f"未知的保存方式: {options.save_mode}，可选: {', '.join(SAVE_MODES)}")
+    base_name, ext = os.path.splitext(input_pdf_path)
+    output_pdf_path = input_pdf_path if options.save_mode == "inplace" else f"{base_name}{options.suffix}{ext}"
+
+    start = time.perf_counter()
+    temp_pdf_path = None
+    with stage("open") as span:
         doc = fitz.open(input_pdf_path)
-        base_name, ext = os.path.splitext(input_pdf_path)
-
-        if export_per_page:
-            # 按页裁剪并导出
-            for page_num in range(len(doc)):
-                page = doc[page_num] # 获取当前页面
-                # 获取页面内容的边界框
-                content_bbox = find_content_bounding_box(page, margin)
-
-                new_single_page_doc = fitz.open() # 创建新的PDF文档
-                new_page_in_doc = new_single_page_doc.new_page(
-                    width=page.rect.width,
-                    height=page.rect.height,
-                    pno=0
-                )
-                new_page_in_doc.show_pdf_page(
-                    new_page_in_doc.rect,
-                    doc,
-                    page_num
-                )
-
-                if content_bbox:
-                    new_page_in_doc.set_cropbox(content_bbox) # 设置页面裁剪框
-                    print(f"页面 {page_num + 1} 的裁剪框设置为: {content_bbox}")
-                else:
-                    print(f"页面 {page_num + 1} 没有找到内容边界框，跳过裁剪。")
-                # 保存裁剪后的PDF
-                output_pdf_path = f"{base_name}_page{page_num + 1}{suffix}{ext}"
-                new_single_page_doc.save(output_pdf_path)
-                new_single_page_doc.close()
-                saved_files_cnt += 1
-                print(f"页面 {page_num+1} 已裁剪并保存到: {output_pdf_path}")
+        span.set(objects=len(doc))
+    with doc:
+        result.timings["open"] = time.perf_counter() - start
+        page_cnt = len(doc)
+        if on_open is not None:
+            on_open(page_cnt)
+
+        # 多进程时先并行算出所有页面的裁剪框，再在当前进程中统一应用
+        parallel = options.page_jobs != 1 and page_cnt > 1
+        if parallel:
+            result.pages = _detect_pages_parallel(input_pdf_path, options, page_cnt)
+
+        # 流式处理时检测和按页导出使用分窗口重新打开的只读副本，doc 只用于修改裁剪框和保存
+        for source, page in _iter_pages(doc, input_pdf_path, 0, page_cnt, options.stream_window):
+            page_num = page.number
+            _check_cancel(cancel, page_num)
+            # 获取页面内容的边界框
+            if parallel:
+                page_result = result.pages[page_num]
+            else:
+                page_result = _detect_page_result(page, options)
+                result.pages.append(page_result)
+
+            content_bbox = fitz.Rect(page_result.cropbox) if page_result.cropbox else None
+            if content_bbox:
+                logger.debug("页面 %d 的裁剪框设置为: %s", page_num + 1, content_bbox)
+            else:
+                logger.debug("页面 %d 没有找到内容边界框，跳过裁剪。", page_num + 1)
+
+            if options.export_per_page and not options.dry_run:
+                # 按页裁剪并导出
+                page_output_path = f"{base_name}_page{page_num + 1}{options.suffix}{ext}"
+                start = time.perf_counter()
+                _export_single_page(source, page_num, content_bbox, page_output_path, options.save_mode)
+                page_result.timings["save"] = time.perf_counter() - start
+                page_result.output_path = page_output_path
+                result.output_paths.append(page_output_path)
+                logger.debug("页面 %d 已裁剪并保存到: %s", page_num + 1, page_output_path)
+            elif content_bbox and not options.dry_run and options.save_mode != "incremental":
+                # 设置页面裁剪框；增量保存时在保存前复制出的副本上设置
+                # PyMuPDF的Rect对象的坐标是(x0, y0, x1, y1)
+                target_page = page if source is doc else doc[page_num]
+                target_page.set_cropbox(content_bbox)
+            if progress is not None:
+                progress(page_result)
+
+        if options.dry_run:
+            logger.info("已计算 %s 的 %d 页裁剪框（未写入文件）", input_pdf_path, page_cnt)
+        elif options.export_per_page:
+            logger.info("%s 已按页裁剪并保存为 %d 个文件", input_pdf_path, len(result.output_paths))
         else:
-            for page_num in range(len(doc)):
-                page = doc[page_num] # 获取当前页面
-                # 获取页面内容的边界框
-                content_bbox = find_content_bounding_box(page, margin)
-
-                if content_bbox:
-                    # 设置页面裁剪框
-                    # PyMuPDF的Rect对象的坐标是(x0, y0, x1, y1)
-                    page.set_cropbox(content_bbox)
-                    print(f"页面 {page_num + 1} 的裁剪框设置为: {content_bbox}")
-                else:
-                    print(f"页面 {page_num + 1} 没有找到内容边界框，跳过裁剪。")
             # 保存裁剪后的PDF
-            output_pdf_path = f"{base_name}{suffix}{ext}"
-            doc.save(output_pdf_path)
-            doc.close()
-            saved_files_cnt = 1
-            print(f"裁剪后的PDF已保存到: {output_pdf_path}")
-    except Exception as e:
-        print(f"处理文件 {input_pdf_path} 时发生错误: {e}")
-        saved_files_cnt = 0
+            start = time.perf_counter()
+            with stage("save", mode=options.save_mode):
+                if options.save_mode == "incremental":
+                    _save_incremental_copy(input_pdf_path, output_pdf_path, result.pages)
+                else:
+                    temp_pdf_path = _save_document(doc, output_pdf_path, options.save_mode)
+            result.timings["save"] = time.perf_counter() - start
+            result.output_paths.append(output_pdf_path)
+            logger.info("裁剪后的PDF已保存到: %s", output_pdf_path)
+    if temp_pdf_path is not None:
+        os.replace(temp_pdf_path, output_pdf_path)
+
+
+def _crop_stream(data: bytes | BinaryIO, options: CropOptions, result: CropResult, progress=None, cancel=None) -> bytes | list[bytes] | None:
+    """crop_pdf_bytes 的实际实现，出错时直接抛出异常"""
+    if options.save_mode not in SAVE_MODES:
+        raise ValueError(f"未知的保存方式: {options.save_mode}，可选: {', '.join(SAVE_MODES)}")
+    save_options = SAVE_MODES[options.save_mode]
+    if save_options is None and not options.export_per_page and not options.dry_run:
+        raise ValueError(f"内存中的文档不支持增量保存方式: {options.save_mode}")
+    if hasattr(data, "read"):
+        data = data.read()
+
+    start = time.perf_counter()
+    with stage("open") as span:
+        doc = fitz.open(stream=data, filetype="pdf")
+        span.set(objects=len(doc))
+    with doc:
+        result.timings["open"] = time.perf_counter() - start
+        page_outputs = []
+        for page in doc:
+            _check_cancel(cancel, page.number)
+            page_result = _detect_page_result(page, options)
+            result.pages.append(page_result)
+            content_bbox = fitz.Rect(page_result.cropbox) if page_result.cropbox else None
+            if options.export_per_page and not options.dry_run:
+                start = time.perf_counter()
+                page_outputs.append(_export_single_page(doc, page.number, content_bbox, None, options.save_mode))
+                page_result.timings["save"] = time.perf_counter() - start
+            elif content_bbox and not options.dry_run:
+                page.set_cropbox(content_bbox)
+            if progress is not None:
+                progress(page_result)
+
+        if options.dry_run:
+            return None
+        if options.export_per_page:
+            logger.info("%s 已按页裁剪为 %d 个PDF", result.input_path, len(page_outputs))
+            return page_outputs
+        start = time.perf_counter()
+        with stage("save", mode=options.save_mode):
+            output = doc.tobytes(**save_options)
+        result.timings["save"] = time.perf_counter() - start
+        logger.info("%s 已裁剪（%d 页）", result.input_path, len(result.pages))
+        return output
+
+
+def _iter_pages(doc: fitz.Document, pdf_path: str, start: int, stop: int, window: int = 0):
+    """按页序遍历 [start, stop) 范围内的页面，生成 (页面所属文档, 页面)
+
+    window 大于0时为流式处理：每 window 页关闭上一个窗口的只读副本，清空 MuPDF 的资源缓存后重新打开文件。
+    MuPDF 会把解析过的对象一直保留在打开的文档中，资源缓存默认也可增长到 256MB，
+    页数很多时进程内存会随页数持续上涨；分窗口重新打开后峰值内存基本与页数无关。
+    """
+    source = doc
+    try:
+        for page_num in range(start, stop):
+            if window and page_num > start and (page_num - start) % window == 0:
+                with stage("release_memory"):
+                    if source is not doc:
+                        source.close()
+                    gc.collect() # 回收上一个窗口中的页面和文本页对象
+                    fitz.TOOLS.store_shrink(100)
+                    fitz.TOOLS.glyph_cache_empty()
+                    source = fitz.open(pdf_path)
+            yield source, source[page_num]
     finally:
-        if 'doc' in locals() and not doc.is_closed:
-            doc.close()
-    return saved_files_cnt
+        if source is not doc:
+            source.close()
+
+
+def _detect_page_result(page: fitz.Page, options: CropOptions) -> PageResult:
+    """检测单页的内容矩形和裁剪框，并记录耗时"""
+    start = time.perf_counter()
+    with stage("page", page=page.number):
+        content_rect, cropbox = _detect_page(page, options.margin, options.engine, options.cache, options.budget)
+    if cropbox is not None:
+        skip_reason = None
+    else:
+        skip_reason = "no_content" if content_rect is None else "invalid_cropbox"
+    return PageResult(
+        page_num=page.number,
+        original_rect=tuple(page.rect),
+        content_rect=tuple(content_rect) if content_rect is not None else None,
+        cropbox=tuple(cropbox) if cropbox is not None else None,
+        skip_reason=skip_reason,
+        timings={"detect": time.perf_counter() - start},
+    )
+
+
+# 资源字典中可按名称精简的类别，以及内容流和资源字典中的名称
+_PRUNABLE_RESOURCES = ("XObject", "Font", "ExtGState", "Pattern", "Shading")
+_CONTENT_NAME_PATTERN = re.compile(rb"/([^\s/\[\]()<>{}%]+)")
+_RESOURCE_ENTRY_PATTERN = re.compile(r"/([^\s/\[\]()<>{}%]+)\s*(\d+)\s+\d+\s+R")
+
+
+def _resolve_dict_key(doc: fitz.Document, xref: int, path: str) -> tuple[int, str, str]:
+    """定位 xref 对象中 path 处的字典，返回 (所在对象的xref, 该字典在对象中的路径前缀, 字典内容)
+
+    字典为间接对象时，返回被引用对象本身，以便直接修改其中的键。
+    """
+    kind, value = doc.xref_get_key(xref, path)
+    if kind == "xref":
+        target = int(value.split()[0])
+        return target, "", doc.xref_object(target, compressed=True)
+    if kind == "dict":
+        return xref, f"{path}/", value
+    return xref, "", ""
+
+
+def _prune_page_resources(doc: fitz.Document, page: fitz.Page):
+    """从页面资源字典中删除内容流没有引用的字体、图片等条目
+
+    PowerPoint 等软件常让所有页面共用一个资源字典，按页导出时需要先精简，
+    之后保存时的垃圾回收才能去掉其他页面的字体和图片。
+    没有自己的 /Resources 的表单(Form XObject)继承页面的资源，其内容流中的名称同样需要保留。
+    """
+    def content_names(stream: bytes) -> set[str]:
+        return {name.decode("latin-1") for name in _CONTENT_NAME_PATTERN.findall(stream)}
 
+    used_names = content_names(page.read_contents())
+    res_xref, res_prefix, _ = _resolve_dict_key(doc, page.xref, "Resources")
+    if res_prefix == "" and res_xref == page.xref:
+        return
 
-def find_content_bounding_box(page: fitz.Page, margin: int = 5) -> fitz.Rect | None:
+    _, _, xobjects = _resolve_dict_key(doc, res_xref, f"{res_prefix}XObject")
+    xobject_xrefs = {name: int(xref) for name, xref in _RESOURCE_ENTRY_PATTERN.findall(xobjects)}
+    pending = [name for name in used_names if name in xobject_xrefs]
+    visited = set()
+    while pending:
+        xref = xobject_xrefs[pending.pop()]
+        if xref in visited:
+            continue
+        visited.add(xref)
+        if doc.xref_get_key(xref, "Subtype")[1] != "/Form" or doc.xref_get_key(xref, "Resources")[0] != "null":
+            continue
+        names = content_names(doc.xref_stream(xref) or b"")
+        pending.extend(name for name in names - used_names if name in xobject_xrefs)
+        used_names |= names
+
+    for category in _PRUNABLE_RESOURCES:
+        cat_xref, cat_prefix, entries = _resolve_dict_key(doc, res_xref, f"{res_prefix}{category}")
+        for name, _ in _RESOURCE_ENTRY_PATTERN.findall(entries):
+            if name not in used_names:
+                doc.xref_set_key(cat_xref, f"{cat_prefix}{name}", "null")
+
+
+def _export_single_page(doc: fitz.Document, page_num: int, content_bbox: fitz.Rect | None, output_pdf_path: str | None,
+                        save_mode: str = "default") -> bytes | None:
+    """将单页原样复制到新文档中，只保留该页用到的资源，设置裁剪框后保存
+
+    与 show_pdf_page 不同，页面不会被包装为 Form XObject，输出中也不会携带其他页面的资源。
+    output_pdf_path 为None时不写文件，返回PDF内容。
+    """
+    with fitz.open() as single_page_doc:
+        with stage("insert_pdf", page=page_num):
+            single_page_doc.insert_pdf(doc, from_page=page_num, to_page=page_num)
+            new_page = single_page_doc[0]
+            _prune_page_resources(single_page_doc, new_page)
+        if content_bbox:
+            new_page.set_cropbox(content_bbox) # 设置页面裁剪框
+        if save_mode == "compact":
+            with stage("subset_fonts", page=page_num):
+                single_page_doc.subset_fonts()
+        # 新文档无法增量保存；至少使用 garbage=1 删除精简后不再被引用的对象
+        save_options = dict(SAVE_MODES[save_mode] or {})
+        save_options["garbage"] = max(save_options.get("garbage", 0), 1)
+        with stage("save", page=page_num, mode=save_mode):
+            if output_pdf_path is None:
+                return single_page_doc.tobytes(**save_options)
+            single_page_doc.save(output_pdf_path, **save_options)
+    return None
+
+
+# 保存方式：名称 -> doc.save() 的参数，None 表示增量保存（只追加修改过的页面对象）
+SAVE_MODES = {
+    "default": {}, # 完整重写文件，与之前的行为一致
+    "incremental": None, # 复制输入文件后增量追加修改，适合大文件
+    "inplace": None, # 直接增量写回输入文件，忽略后缀
+    "garbage": {"garbage": 3}, # 删除未使用的对象并合并重复对象
+    "deflate": {"deflate": True, "deflate_images": True, "deflate_fonts": True}, # 压缩所有未压缩的流
+    "compact": {"garbage": 3, "deflate": True, "deflate_images": True, "deflate_fonts": True, "use_objstms": 1}, # 体积最小，按页导出时还会子集化字体
+}
+
+
+def _save_incremental_copy(input_pdf_path: str, output_pdf_path: str, pages: list[PageResult]):
+    """增量保存只能写回被打开的文件：把输入复制为输出旁的临时文件，在副本上设置裁剪框并增量保存，成功后再替换到输出路径
+
+    所有页面都处理完成后才复制，打开失败、处理出错或取消时不会留下未裁剪的输出文件。
+    """
+    partial_pdf_path = f"{output_pdf_path}.partial"
+    temp_pdf_path = None
+    try:
+        shutil.copyfile(input_pdf_path, partial_pdf_path)
+        with fitz.open(partial_pdf_path) as doc:
+            for page_result in pages:
+                if page_result.cropbox:
+                    doc[page_result.page_num].set_cropbox(fitz.Rect(page_result.cropbox))
+            temp_pdf_path = _save_document(doc, partial_pdf_path, "incremental")
+        os.replace(temp_pdf_path or partial_pdf_path, output_pdf_path)
+    finally:
+        for path in (partial_pdf_path, temp_pdf_path):
+            if path is not None and os.path.exists(path):
+                os.remove(path)
+
+
+def _save_document(doc: fitz.Document, output_pdf_path: str, save_mode: str) -> str | None:
+    """按保存方式保存文档，不能增量保存的文档（如经过修复的文件）退回完整重写
+
+    Returns:
+        str | None: 退回完整重写时写入的临时文件，需要在关闭文档后替换到输出路径
+    """
+    save_options = SAVE_MODES[save_mode]
+    if save_options is not None:
+        doc.save(output_pdf_path, **save_options)
+    elif doc.can_save_incrementally():
+        doc.save(output_pdf_path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+    else:
+        # 不能覆盖正在打开的文件，先写入临时文件
+        temp_pdf_path = f"{output_pdf_path}.tmp"
+        doc.save(temp_pdf_path, garbage=1)
+        return temp_pdf_path
+    return None
+
+
+def find_content_bounding_box(page: fitz.Page, margin: int = 5, engine: str = "objects", cache: CropBoxCache | None = None,
+                              budget: DetectionBudget | None = None) -> fitz.Rect | None:
     """尝试从页面中识别所有可见内容的最小外接矩形
 
     Args:
         page (fitz.Page): 输入页面对象
+        margin (int): 裁剪时的内边距，单位为点
+        engine (str): 内容检测引擎，见 DETECTION_ENGINES
+        cache (CropBoxCache | None): 裁剪框缓存，命中时跳过内容检测
+        budget (DetectionBudget | None): 单页检测的成本上限，超出后改用更廉价的引擎
 
     Returns:
         fitz.Rect: 内容的最小外接矩形
     """
-    min_x, min_y = float('inf'), float('inf')
-    max_x, max_y = float('-inf'), float('-inf')
+    return _detect_page(page, margin, engine, cache, budget)[1]
+
+
+def _detect_page(page: fitz.Page, margin: int, engine: str, cache: CropBoxCache | None,
+                 budget: DetectionBudget | None = None) -> tuple[fitz.Rect | None, fitz.Rect | None]:
+    """检测页面内容，返回 (不含内边距的内容矩形, 加上内边距后的裁剪框)"""
+    if cache is None:
+        content_rect = find_content_rect(page, engine, budget)
+    else:
+        # 缓存中保存的是不含内边距的内容矩形，修改内边距后依然可以命中；预算可能改变结果，因此也计入缓存键
+        with stage("cache_lookup") as span:
+            key = page_content_key(page, engine if budget is None else f"{engine}|{budget}")
+            hit, content_rect = cache.get(key)
+            span.set(hit=hit)
+        if not hit:
+            content_rect = find_content_rect(page, engine, budget)
+            cache.put(key, content_rect)
+    return content_rect, apply_margin(page, content_rect, margin)
+
+
+def find_content_rect(page: fitz.Page, engine: str = "objects", budget: DetectionBudget | None = None) -> fitz.Rect | None:
+    """使用指定的检测引擎识别页面内容的外接矩形，不包含内边距
+
+    Args:
+        page (fitz.Page): 输入页面对象
+        engine (str): 内容检测引擎，见 DETECTION_ENGINES
+        budget (DetectionBudget | None): 单页检测的成本上限，超出后改用更廉价的引擎
+
+    Returns:
+        fitz.Rect | None: 内容的最小外接矩形，没有内容时为None
+    """
+    try:
+        detect = DETECTION_ENGINES[engine]
+    except KeyError:
+        raise ValueError(f"未知的检测引擎: {engine}，可选: {', '.join(DETECTION_ENGINES)}") from None
+    return detect(page, budget)
+
+
+# 内容流中的绘图操作符（描边、填充及其组合），用于在解释内容流之前估计矢量图形数量
+_PAINT_OPERATOR_PATTERN = re.compile(rb"\s[SsfFBb]\*?(?=\s)")
+
+
+def estimate_page_objects(page: fitz.Page) -> int:
+    """按页面内容流和页面直接引用的表单(Form XObject)中绘图操作符的数量，估计矢量图形的数量
+
+    只做文本匹配，不解释内容流，耗时约为 get_drawings 的二十分之一。
+    """
+    doc = page.parent
+    with stage("estimate_objects") as span:
+        count = len(_PAINT_OPERATOR_PATTERN.findall(page.read_contents()))
+        for xref, *_ in page.get_xobjects():
+            count += len(_PAINT_OPERATOR_PATTERN.findall(doc.xref_stream(xref) or b""))
+        span.set(objects=count)
+    return count
+
+
+def _budget_fallback(page: fitz.Page, budget: DetectionBudget | None, engine: str, start: float) -> str | None:
+    """超出检测预算时返回要改用的引擎，未超出或没有更廉价的引擎时返回None"""
+    if budget is None:
+        return None
+    fallback = budget.fallback
+    if fallback == engine:
+        return None
+    reason = budget.exceeded(page, start)
+    if reason is None:
+        return None
+    logger.debug("页面 %d 超出检测预算(%s)，改用 %s 引擎", page.number + 1, reason, fallback)
+    return fallback
+
 
-    # 辅助函数：更新边界值
-    def update_bounds(bbox: fitz.Rect):
-        nonlocal min_x, min_y, max_x, max_y
-        if bbox.width > 0 and bbox.height > 0:
-            min_x = min(min_x, bbox.x0)
-            min_y = min(min_y, bbox.y0)
-            max_x = max(max_x, bbox.x1)
-            max_y = max(max_y, bbox.y1)
+def apply_margin(page: fitz.Page, content_rect: fitz.Rect | None, margin: int) -> fitz.Rect | None:
+    """为内容外接矩形加上内边距，并限制在页面范围内
+
+    Args:
+        page (fitz.Page): 输入页面对象
+        content_rect (fitz.Rect | None): 内容的外接矩形
+        margin (int): 裁剪时的内边距，单位为点
+
+    Returns:
+        fitz.Rect | None: 最终的裁剪框，无效时为None
+    """
+    return apply_margin_to_rect(unrotated_page_rect(page), content_rect, margin)
+
+
+def unrotated_page_rect(page: fitz.Page) -> fitz.Rect:
+    """页面可见区域在未旋转坐标系中的矩形
+
+    内容检测的结果和 set_cropbox 都使用未旋转的坐标，而 page.rect 是旋转后的显示区域，
+    /Rotate 为 90 或 270 的页面上二者的宽高互换。
+    """
+    return page.rect * page.derotation_matrix
+
+
+def apply_margin_to_rect(original_rect: fitz.Rect, content_rect: fitz.Rect | None, margin: int) -> fitz.Rect | None:
+    """与 apply_margin 相同，但只需要页面矩形，可以在不持有页面对象时（如修改内边距后重新预览）调用
+
+    Args:
+        original_rect (fitz.Rect): 页面原始矩形，确保裁剪不会超出页面边界
+        content_rect (fitz.Rect | None): 内容的外接矩形
+        margin (int): 裁剪时的内边距，单位为点
+
+    Returns:
+        fitz.Rect | None: 最终的裁剪框，无效时为None
+    """
+    if content_rect is None:
+        # 如果没有找到内容，返回None
+        return None
+
+    # 稍微增加一些内边距(margin)，以防内容边界过于贴近裁剪线
+    # PDF的默认单位是点，1点 = 1/72英寸
+
+    final_x0 = max(content_rect.x0 - margin, original_rect.x0)
+    final_y0 = max(content_rect.y0 - margin, original_rect.y0)
+    final_x1 = min(content_rect.x1 + margin, original_rect.x1)
+    final_y1 = min(content_rect.y1 + margin, original_rect.y1)
+    content_bbox = fitz.Rect(final_x0, final_y0, final_x1, final_y1)
+    if content_bbox.width > 0 and content_bbox.height > 0:
+        return content_bbox
+    else:
+        # 如果计算出的裁剪框无效，返回None
+        logger.debug("计算出的裁剪框无效，返回None")
+        return None
+
+
+# 只填充白色的图形，覆盖整页时视为页面背景
+_WHITE = (1.0, 1.0, 1.0)
+
+
+def _content_rect_objects(page: fitz.Page, budget: DetectionBudget | None = None) -> fitz.Rect | None:
+    """objects 引擎：分别扫描文本块、图片和矢量图形
+
+    各阶段按耗时从低到高执行，已检测到的内容覆盖整页时提前结束，
+    超出 budget 时不再调用 get_drawings，改用更廉价的引擎。
+    """
+    start = time.perf_counter()
+    rects = RectSet()
+
+    page_rect = unrotated_page_rect(page)
+
+    def covers_page() -> fitz.Rect | None:
+        content_rect = rects.bounds(page_rect)
+        return content_rect if content_rect is not None and content_rect.contains(page_rect) else None
 
     # 1. 检查文件内容
-    text_blocks = page.get_text("blocks") # 获取文本块
-    for block in text_blocks:
-        bbox = fitz.Rect(block[:4]) # 获取文本块的边界框
-        update_bounds(bbox)
-    
+    with stage("get_text") as span:
+        text_blocks = page.get_text("blocks") # 获取文本块
+        span.set(objects=len(text_blocks))
+    rects.extend([block[:4] for block in text_blocks]) # 文本块的边界框
+    if content_rect := covers_page():
+        return content_rect # 内容已经覆盖整页，后续阶段不会再改变结果
+
     # 2. 检查图片内容
-    images = page.get_images(full=True) # 获取图片
-    for img_info in images:
-        # img_info 是一个元组，包含图片的xref和bbox
-        bbox = page.get_image_bbox(img_info) # 获取图片的边界框
-        update_bounds(bbox)
-    
+    # get_image_info 只解释一次内容流就返回所有图片的位置，包括同一图片的多次放置、
+    # 表单(Form XObject)中的图片和内联图片；逐个调用 get_image_bbox 时每张图片都要重新扫描页面
+    with stage("get_image_info") as span:
+        images = page.get_image_info() # 获取每次图片放置的信息
+        span.set(objects=len(images))
+    rects.extend([img_info["bbox"] for img_info in images]) # 图片的边界框
+    if content_rect := covers_page():
+        return content_rect
+
+    # get_drawings 的耗时和内存与矢量图形数量成正比，超出预算时改用更廉价的引擎
+    if fallback := _budget_fallback(page, budget, "objects", start):
+        with stage("fallback", engine=fallback):
+            return find_content_rect(page, fallback)
+
     # 3. 检查矢量图形
     """
     page.get_drawings() 返回一个包含字典的列表，每个字典描述一个图形对象
     字典中通常包含 'rect' 键，表示图形的外接矩形
     """
-    drawings = page.get_drawings()
+    with stage("get_drawings") as span:
+        drawings = page.get_drawings()
+        span.set(objects=len(drawings))
     # 为什么PowerPoint导出的PDF，第一个drawing的rect总是y0<0?
-    for draw_num in range(1, len(drawings)): # 从第二个图形开始
-        draw = drawings[draw_num]
-        if 'rect' in draw:
-            bbox = fitz.Rect(draw['rect'])
-            update_bounds(bbox)
-
-    if min_x != float('inf'): # 如果检测到任何内容
-        # 稍微增加一些内边距(margin)，以防内容边界过于贴近裁剪线
-        # PDF的默认单位是点，1点 = 1/72英寸
-        original_rect = page.rect # 页面原始矩形，确保裁剪不会超出页面边界
-
-        final_x0 = max(min_x - margin, original_rect.x0)
-        final_y0 = max(min_y - margin, original_rect.y0)
-        final_x1 = min(max_x + margin, original_rect.x1)
-        final_y1 = min(max_y + margin, original_rect.y1)
-        content_bbox = fitz.Rect(final_x0, final_y0, final_x1, final_y1)
-        if content_bbox.width > 0 and content_bbox.height > 0:
-            return content_bbox
-        else:
-            # 如果计算出的裁剪框无效，返回None
-            print("计算出的裁剪框无效，返回None")
+    drawings = drawings[1:] # 从第二个图形开始
+    rects.extend(
+        [draw["rect"] for draw in drawings],
+        (draw["type"] == "f" and draw.get("fill") == _WHITE for draw in drawings),
+    )
+
+    # 过滤面积为0的矩形和覆盖整页的白色背景后求外接矩形
+    return rects.bounds(page_rect)
+
+
+_STEXT_VECTOR_BLOCK = 3
+
+
+def _stext_flags() -> int:
+    """stext 引擎的文本页标志：在一次解释中同时收集文本块、图片块和矢量块；需要导入 fitz，因此不作为模块常量"""
+    return fitz.TEXTFLAGS_BLOCKS | fitz.TEXT_PRESERVE_IMAGES | fitz.TEXT_COLLECT_VECTORS
+
+
+def _content_rect_stext(page: fitz.Page, budget: DetectionBudget | None = None) -> fitz.Rect | None:
+    """stext 引擎：只解释一次内容流，由 MuPDF 的结构化文本设备同时记录文本、图片和矢量图形
+
+    文本块和图片块与 objects 引擎完全一致；描边图形的外接矩形包含线宽，
+    因此结果最多比 objects 引擎向外扩展半个线宽。
+    """
+    if fallback := _budget_fallback(page, budget, "stext", time.perf_counter()):
+        with stage("fallback", engine=fallback):
+            return find_content_rect(page, fallback)
+
+    with stage("get_textpage") as span:
+        textpage = page.get_textpage(flags=_stext_flags())
+        blocks = textpage.extractBLOCKS()
+        span.set(objects=len(blocks))
+
+    # 与 objects 引擎一致，跳过第一个矢量图形（PowerPoint的页面背景）
+    first_vector = next((i for i, block in enumerate(blocks) if block[6] == _STEXT_VECTOR_BLOCK), None)
+    rects = RectSet()
+    rects.extend([block[:4] for i, block in enumerate(blocks) if i != first_vector])
+    return rects.bounds()
+
+
+# raster 引擎参数：先以低分辨率找出内容范围，再以高分辨率细化四条边
+_RASTER_COARSE_DPI = 18
+_RASTER_FINE_DPI = 144
+_RASTER_TOLERANCE = 8 # 与背景灰度相差超过该值的像素视为内容
+
+
+def _gray_samples(pix: fitz.Pixmap):
+    """将灰度Pixmap转换为 (height, width) 的 NumPy 数组，不复制像素数据"""
+    import numpy as np
+    return np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+
+
+def _content_span(mask) -> tuple[int, int] | None:
+    """返回一维布尔数组中第一个和最后一个True的下标"""
+    import numpy as np
+    hits = np.flatnonzero(mask)
+    if hits.size == 0:
+        return None
+    return int(hits[0]), int(hits[-1])
+
+
+def _content_rect_raster(page: fitz.Page, budget: DetectionBudget | None = None) -> fitz.Rect | None:
+    """raster 引擎：将页面渲染为低分辨率灰度图，用 NumPy 找出最外侧的非背景行列
+
+    耗时与页面中矢量对象的数量基本无关，也能识别渐变、透明度等对象扫描无法覆盖的内容。
+    低分辨率结果只用于定位，随后仅将四条边附近的窄条以高分辨率重新渲染，使结果精确到点。
+    背景色取四个角的灰度（四角一致时），否则视为白色。耗时基本固定，不受 budget 限制。
+    渲染结果是旋转后的页面，检测完成后再转换为与其他引擎相同的未旋转坐标。
+    """
+    try:
+        import numpy as np
+    except ImportError as e:
+        raise ImportError("raster 检测引擎需要安装 numpy: pip install numpy") from e
+
+    coarse_zoom = _RASTER_COARSE_DPI / 72
+    fine_zoom = _RASTER_FINE_DPI / 72
+    with stage("render"):
+        pix = page.get_pixmap(matrix=fitz.Matrix(coarse_zoom, coarse_zoom), colorspace=fitz.csGRAY, alpha=False, annots=False)
+    samples = _gray_samples(pix)
+
+    corners = samples[[0, 0, -1, -1], [0, -1, 0, -1]].astype(np.int16)
+    background = int(np.median(corners)) if corners.max() - corners.min() <= _RASTER_TOLERANCE else 255
+
+    def content_mask(samples):
+        return np.abs(samples.astype(np.int16) - background) > _RASTER_TOLERANCE
+
+    mask = content_mask(samples)
+    rows = _content_span(mask.any(axis=1))
+    if rows is None:
+        return None
+    cols = _content_span(mask.any(axis=0))
+
+    # 低分辨率下的内容范围（旋转后的坐标），向外扩展一个像素以包含抗锯齿后变浅的边缘
+    page_rect = page.rect
+    coarse = fitz.Rect(
+        (pix.x + cols[0] - 1) / coarse_zoom, (pix.y + rows[0] - 1) / coarse_zoom,
+        (pix.x + cols[1] + 2) / coarse_zoom, (pix.y + rows[1] + 2) / coarse_zoom,
+    ) & page_rect
+    strip = 3 / coarse_zoom # 细化窄条的宽度：三个低分辨率像素
+
+    def refine(clip: fitz.Rect, axis: int, last: bool) -> float | None:
+        if clip.is_empty:
+            return None
+        with stage("render"):
+            fine = page.get_pixmap(matrix=fitz.Matrix(fine_zoom, fine_zoom), clip=clip, colorspace=fitz.csGRAY, alpha=False, annots=False)
+        span = _content_span(content_mask(_gray_samples(fine)).any(axis=axis))
+        if span is None:
             return None
+        origin = fine.x if axis == 0 else fine.y
+        return (origin + span[1] + 1) / fine_zoom if last else (origin + span[0]) / fine_zoom
+
+    x0 = refine(fitz.Rect(coarse.x0, coarse.y0, coarse.x0 + strip, coarse.y1), 0, False)
+    x1 = refine(fitz.Rect(coarse.x1 - strip, coarse.y0, coarse.x1, coarse.y1), 0, True)
+    y0 = refine(fitz.Rect(coarse.x0, coarse.y0, coarse.x1, coarse.y0 + strip), 1, False)
+    y1 = refine(fitz.Rect(coarse.x0, coarse.y1 - strip, coarse.x1, coarse.y1), 1, True)
+
+    # 细化失败（窄条中没有内容）时退回低分辨率的结果
+    content_rect = fitz.Rect(
+        coarse.x0 if x0 is None else x0, coarse.y0 if y0 is None else y0,
+        coarse.x1 if x1 is None else x1, coarse.y1 if y1 is None else y1,
+    ) & page_rect
+    content_rect = (content_rect * page.derotation_matrix) & unrotated_page_rect(page)
+    if content_rect.width > 0 and content_rect.height > 0:
+        return content_rect
+    return None
+
+
+# 可选的内容检测引擎：名称 -> 返回页面内容外接矩形（不含内边距）的函数，参数为 (page, budget)
+DETECTION_ENGINES = {
+    "objects": _content_rect_objects,
+    "stext": _content_rect_stext,
+    "raster": _content_rect_raster,
+}
+
+
+def _init_worker(level: int):
+    """子进程的初始化函数：使用与主进程相同的日志级别
+
+    fork 出的子进程会继承主进程中正在记录的性能分析状态，需要先清除，
+    子进程中的事件由 CropOptions.profile 控制并随结果返回。
+    """
+    logging.basicConfig(level=level, format="%(message)s")
+    logger.setLevel(level)
+    crop_profile.stop()
+
+
+def _detect_pages_worker(input_pdf_path: str, options: CropOptions, start: int, stop: int) -> tuple[list[PageResult], list[dict]]:
+    """在子进程中独立打开文档，检测 [start, stop) 范围内各页的内容矩形和裁剪框
+
+    Returns:
+        tuple[list[PageResult], list[dict]]: (各页结果, 启用性能分析时记录的事件)
+    """
+    owns_profile = options.profile and crop_profile.start()
+    try:
+        with stage("open", shard=f"{start}-{stop}"):
+            doc = fitz.open(input_pdf_path)
+        with doc:
+            page_results = [
+                _detect_page_result(page, options)
+                for _, page in _iter_pages(doc, input_pdf_path, start, stop, options.stream_window)
+            ]
+        if options.cache is not None:
+            options.cache.flush()
+    finally:
+        events = crop_profile.stop() if owns_profile else []
+    return page_results, events
+
+
+def _detect_pages_parallel(input_pdf_path: str, options: CropOptions, page_cnt: int) -> list[PageResult]:
+    """将页面范围切分为多个分片，由 options.page_jobs 个进程并行检测，返回按页序排列的结果"""
+    page_jobs = options.page_jobs if options.page_jobs > 0 else (os.cpu_count() or 1)
+    page_jobs = min(page_jobs, max(page_cnt, 1))
+
+    # 分片数多于进程数，避免个别复杂页面拖慢整个分片
+    shard_cnt = min(page_cnt, page_jobs * 4)
+    bounds = [page_cnt * i // shard_cnt for i in range(shard_cnt + 1)] if shard_cnt else [0]
+    shards = list(zip(bounds[:-1], bounds[1:]))
+
+    page_results = []
+    with ProcessPoolExecutor(max_workers=page_jobs, initializer=_init_worker, initargs=(logger.getEffectiveLevel(),)) as executor:
+        futures = [executor.submit(_detect_pages_worker, input_pdf_path, options, start, stop) for start, stop in shards]
+        for future in futures:
+            shard_results, events = future.result()
+            page_results.extend(shard_results)
+            crop_profile.extend(events)
+    return page_results
+
+
+def collect_input_pdfs(inputs: list[str], suffix: str = "") -> list[str]:
+    """将文件、目录和通配符展开为去重后的PDF文件列表
+
+    目录会被递归遍历；展开目录和通配符时，文件名以输出后缀结尾的PDF（上一次裁剪的结果）会被跳过，
+    以免重复运行时再次裁剪输出文件。直接指定的文件总是保留。
+
+    Args:
+        inputs (list[str]): 文件路径、目录或通配符（如 figs/**/*.pdf）
+        suffix (str): 裁剪输出文件的后缀，用于排除已有的输出文件
+
+    Returns:
+        list[str]: 按输入顺序排列的PDF文件路径
+    """
+    def is_output(path: str) -> bool:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        return bool(suffix) and stem.endswith(suffix)
+
+    pdf_paths = []
+    seen = set()
+
+    def add(path: str, explicit: bool = False):
+        key = os.path.abspath(path)
+        if key not in seen and path.lower().endswith('.pdf') and (explicit or not is_output(path)):
+            seen.add(key)
+            pdf_paths.append(path)
+
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                for name in sorted(files):
+                    add(os.path.join(root, name))
+        elif os.path.isfile(item):
+            add(item, explicit=True)
+        else:
+            # 当作通配符处理，匹配不到时保持静默，由调用方报告
+            for path in sorted(glob.glob(item, recursive=True)):
+                if os.path.isfile(path):
+                    add(path)
+    return pdf_paths
+
+
+def _manifest_params(options: CropOptions) -> dict:
+    """影响输出文件的裁剪参数，记录在清单中，任何一项变化都需要重新处理"""
+    return {
+        "suffix": options.suffix,
+        "margin": options.margin,
+        "export_per_page": options.export_per_page,
+        "engine": options.engine,
+        "save_mode": options.save_mode,
+        "budget": asdict(options.budget) if options.budget is not None else None,
+    }
+
+
+def crop_pdf_batch(input_pdf_paths: list[str], options: CropOptions | None = None, jobs: int = 1,
+                   manifest: CropManifest | None = None, limits: WorkerLimits | None = None,
+                   quarantine: Quarantine | None = None) -> BatchResult:
+    """使用进程池批量裁剪多个PDF文件
+
+    Args:
+        input_pdf_paths (list[str]): 输入PDF文件路径列表
+        options (CropOptions | None): 裁剪参数，为None时使用默认值
+        jobs (int): 并行进程数，1 表示在当前进程中串行执行，0 表示使用全部CPU核心
+        manifest (CropManifest | None): 增量处理的清单，内容和参数都未变化且输出文件齐全的输入不会被打开；
+            处理完成后更新并保存清单。只计算裁剪框（dry_run）时不使用清单
+        limits (WorkerLimits | None): 不为None时每个文件在受监督的隔离进程中处理（jobs 为 1 时也是），
+            超时、崩溃或内存超限只影响该文件
+        quarantine (Quarantine | None): 隔离清单，其中未变化且 limits 不比当时宽松的文件直接记为失败而不再处理；
+            隔离执行中重试后仍超时或崩溃的文件加入清单。只在指定 limits 时使用
+
+    Returns:
+        BatchResult: 每个文件的结果和总耗时
+    """
+    options = options or CropOptions()
+    if options.dry_run:
+        manifest = None
+
+    batch = BatchResult()
+    start = time.perf_counter()
+    results = {}
+    pending_paths = input_pdf_paths
+    if manifest is not None:
+        params = _manifest_params(options)
+        pending_paths = []
+        for path in input_pdf_paths:
+            current, output_paths = manifest.is_current(path, params)
+            if current:
+                results[path] = CropResult(path, output_paths=output_paths, skipped=True)
+            else:
+                pending_paths.append(path)
+        logger.info("清单中 %d 个文件未变化，跳过；需要处理 %d 个文件", len(results), len(pending_paths))
+    if limits is not None and quarantine is not None:
+        remaining = []
+        for path in pending_paths:
+            reason = quarantine.reason(path, limits)
+            if reason is None:
+                remaining.append(path)
+            else:
+                logger.warning("%s 在隔离清单中（%s），跳过", path, reason)
+                results[path] = CropResult(path, error=f"已隔离: {reason}")
+        pending_paths = remaining
+
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, max(len(pending_paths), 1))
+    if limits is not None:
+        # 先在主进程中导入 PyMuPDF，fork 出的工作进程直接继承，导入时间不计入每个文件的时限
+        fitz.load()
+        pool = SupervisedPool(crop_pdf, jobs, limits, _init_worker, (logger.getEffectiveLevel(),))
+        outcomes = pool.run([(path, options) for path in pending_paths], pending_paths)
+        processed = []
+        for path, outcome in zip(pending_paths, outcomes):
+            if outcome.ok:
+                processed.append(outcome.value)
+                if quarantine is not None:
+                    quarantine.discard(path)
+                continue
+            logger.error("处理 %s 失败: %s", path, outcome.error)
+            processed.append(CropResult(path, error=outcome.error))
+            if quarantine is not None and outcome.isolated_failure:
+                quarantine.add(path, outcome.error, outcome.attempts, limits)
+        for result in processed:
+            crop_profile.extend(result.trace_events)
+        if quarantine is not None:
+            quarantine.save()
+    elif jobs == 1:
+        processed = [crop_pdf(path, options) for path in pending_paths]
     else:
-        # 如果没有找到内容，返回None
-        return None
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(logger.getEffectiveLevel(),)) as executor:
+            # 小文件很多时按块分发，减少进程间通信次数
+            chunksize = max(1, len(pending_paths) // (jobs * 4))
+            processed = list(executor.map(crop_pdf, pending_paths, [options] * len(pending_paths), chunksize=chunksize))
+        # 子进程记录的性能分析事件随结果返回，合并到主进程中
+        for result in processed:
+            crop_profile.extend(result.trace_events)
 
+    for result in processed:
+        results[result.input_path] = result
+        if manifest is not None:
+            if result.ok:
+                manifest.record(result.input_path, params, result.output_paths)
+            else:
+                manifest.discard(result.input_path)
+    if manifest is not None:
+        manifest.save()
 
-if __name__ == "__main__":
+    batch.results = [results[path] for path in input_pdf_paths]
+    batch.elapsed = time.perf_counter() - start
+    return batch
+
+
+def main(argv: list[str] | None = None) -> int:
     parser = argparse.ArgumentParser(description="自动裁剪PDF文件四周的空白")
-    parser.add_argument("--input_pdf", required=True, help="输入PDF文件路径")
+    parser.add_argument("inputs", nargs="*", help="输入PDF文件、目录或通配符，可指定多个；- 表示从标准输入读取，裁剪结果写到标准输出")
+    parser.add_argument("--input_pdf", action="append", default=[], help="输入PDF文件路径，可重复指定")
     parser.add_argument("--suffix", default="_cropped", help="裁剪后文件的后缀")
     parser.add_argument("--margin", type=int, default=5, help="裁剪时的内边距，单位为点")
     parser.add_argument("--export_per_page", action="store_true", help="是否为每一页单独导出裁剪后的PDF")
-    args = parser.parse_args()
-
-    # 检查输入文件是否存在
-    if not os.path.isfile(args.input_pdf):
-        print(f"输入文件不存在: {args.input_pdf}")
-        exit(1)
-    
-    # 检查文件扩展名
-    if not args.input_pdf.lower().endswith('.pdf'):
-        print("输入文件不是PDF格式")
-        exit(1)
+    parser.add_argument("--jobs", "-j", type=int, default=1, help="并行处理的进程数，0 表示使用全部CPU核心")
+    parser.add_argument("--engine", choices=list(DETECTION_ENGINES), default="objects",
+                        help="内容检测引擎：objects 分别扫描文本、图片和矢量图形；stext 只解释一次内容流；raster 基于渲染结果检测（需要numpy）")
+    parser.add_argument("--save_mode", choices=list(SAVE_MODES), default="default",
+                        help="保存方式：default 完整重写；incremental 复制后增量追加；inplace 增量写回输入文件；garbage/deflate/compact 清理或压缩输出")
+    parser.add_argument("--max_page_objects", type=int, default=0,
+                        help="单页矢量图形数量上限（按内容流估计），超出后改用更廉价的引擎，0 表示不限制")
+    parser.add_argument("--max_page_seconds", type=float, default=0,
+                        help="单页检测的耗时上限（秒），超出后改用更廉价的引擎，0 表示不限制")
+    parser.add_argument("--fallback_engine", choices=list(DETECTION_ENGINES), default="stext", help="超出单页预算时改用的引擎")
+    parser.add_argument("--cache_dir", default=None,
+                        help="裁剪框缓存目录，默认为用户缓存目录下的 pdf-white-crop；管道模式默认不使用缓存，指定该参数时才使用")
+    parser.add_argument("--cache_size_mb", type=float, default=64, help="裁剪框缓存的大小上限(MB)，超出后淘汰最久未使用的条目")
+    parser.add_argument("--no-cache", dest="use_cache", action="store_false", help="不使用裁剪框缓存")
+    parser.add_argument("--page_jobs", type=int, default=1, help="单个文件内按页并行检测裁剪框的进程数，0 表示使用全部CPU核心")
+    parser.add_argument("--stream_window", type=int, default=0,
+                        help="流式处理大文件：每处理 N 页释放页面对象、清空 MuPDF 缓存并重新打开文件，使内存占用不随页数增长，0 表示关闭")
+    parser.add_argument("--manifest", default=None, metavar="PATH",
+                        help="增量处理的清单文件：记录输入内容哈希、裁剪参数和输出文件，未变化且输出齐全的文件直接跳过")
+    parser.add_argument("--isolate", action="store_true",
+                        help="每个文件在受监督的独立进程中处理，卡死、崩溃或内存失控只影响该文件；指定 --timeout、--max_memory_mb 或 --quarantine 时自动启用")
+    parser.add_argument("--timeout", type=float, default=0, help="隔离处理时单个文件的最长处理时间（秒），超时后杀死工作进程，0 表示不限制")
+    parser.add_argument("--max_memory_mb", type=int, default=0,
+                        help="隔离处理时工作进程的地址空间上限(MB)，包含 Python 和 PyMuPDF 本身，不宜小于 1024，0 表示不限制（Windows 上无效）")
+    parser.add_argument("--max_jobs_per_worker", type=int, default=100, help="隔离处理时每个工作进程处理多少个文件后被替换，0 表示不替换")
+    parser.add_argument("--retries", type=int, default=1, help="隔离处理时超时或崩溃的文件在新进程中重试的次数")
+    parser.add_argument("--quarantine", default=None, metavar="PATH",
+                        help="隔离清单文件：重试后仍超时或崩溃的文件记入清单，之后未修改时直接跳过")
+    parser.add_argument("--dry-run", dest="dry_run", action="store_true", help="只计算裁剪框，不写入任何PDF文件")
+    parser.add_argument("--json", action="store_true", help="以JSON格式输出每个文件、每一页的结果")
+    parser.add_argument("--profile", default=None, metavar="PATH",
+                        help="记录各阶段（打开、文本/图片/矢量检测、导出、保存）的耗时和对象数量，写入 Chrome trace-event 格式的JSON文件")
+    parser.add_argument("--metrics", default=None, metavar="PATH", help="将各阶段耗时和处理统计写入 Prometheus textfile 格式的指标文件")
+    parser.add_argument("--verbose", "-v", action="store_true", help="输出每一页的处理日志")
+    parser.add_argument("--quiet", "-q", action="store_true", help="只输出警告和错误")
+    args = parser.parse_args(argv)
+
+    log_level = logging.DEBUG if args.verbose else logging.WARNING if args.quiet else logging.INFO
+    logging.basicConfig(level=log_level, format="%(message)s")
+    logger.setLevel(log_level)
+
+    inputs = args.input_pdf + args.inputs
+    if not inputs:
+        parser.error("至少需要指定一个输入PDF文件、目录或通配符")
 
     # 检查内边距参数
     if args.margin < 0:
         print("内边距参数必须为非负整数")
-        exit(1)
+        return 1
+
+    # 管道模式：从标准输入读取PDF，裁剪结果写到标准输出，摘要等其他输出都写到标准错误
+    pipe = inputs == ["-"]
+    if pipe and args.export_per_page:
+        print("按页导出时不能写到标准输出", file=sys.stderr)
+        return 1
 
-    # 调用裁剪函数
-    crop_pdf_margins(args.input_pdf, args.suffix, args.margin, args.export_per_page)
+    # 单个文件时保持原有的检查和提示
+    if not pipe and len(inputs) == 1 and not os.path.isdir(inputs[0]) and not any(c in inputs[0] for c in "*?["):
+        # 检查输入文件是否存在
+        if not os.path.isfile(inputs[0]):
+            print(f"输入文件不存在: {inputs[0]}")
+            return 1
+        # 检查文件扩展名
+        if not inputs[0].lower().endswith('.pdf'):
+            print("输入文件不是PDF格式")
+            return 1
+
+    input_pdf_paths = [] if pipe else collect_input_pdfs(inputs, args.suffix)
+    if not pipe and not input_pdf_paths:
+        print("没有找到需要处理的PDF文件")
+        return 1
+
+    # 管道模式不读写磁盘，与 crop_pdf_bytes 的默认值一致；明确指定缓存目录时才使用缓存
+    use_cache = args.use_cache and (not pipe or args.cache_dir is not None)
+    cache = CropBoxCache(args.cache_dir, args.cache_size_mb) if use_cache else None
+    budget = None
+    if args.max_page_objects > 0 or args.max_page_seconds > 0:
+        budget = DetectionBudget(args.max_page_objects, args.max_page_seconds, args.fallback_engine)
+    options = CropOptions(
+        suffix=args.suffix,
+        margin=args.margin,
+        export_per_page=args.export_per_page,
+        engine=args.engine,
+        save_mode=args.save_mode,
+        page_jobs=args.page_jobs,
+        cache=cache,
+        dry_run=args.dry_run,
+        profile=bool(args.profile or args.metrics),
+        budget=budget,
+        stream_window=args.stream_window,
+    )
+    if options.profile:
+        crop_profile.start()
+    if pipe:
+        start = time.perf_counter()
+        output, result = crop_pdf_bytes(sys.stdin.buffer.read(), options, "<stdin>")
+        if output is not None:
+            sys.stdout.buffer.write(output)
+            sys.stdout.buffer.flush()
+            result.output_paths.append("-")
+        batch = BatchResult([result], time.perf_counter() - start)
+    else:
+        manifest = CropManifest(args.manifest) if args.manifest else None
+        limits = None
+        if args.isolate or args.timeout > 0 or args.max_memory_mb > 0 or args.quarantine:
+            limits = WorkerLimits(args.timeout, args.max_memory_mb, args.max_jobs_per_worker, args.retries)
+        quarantine = Quarantine(args.quarantine) if args.quarantine else None
+        batch = crop_pdf_batch(input_pdf_paths, options, args.jobs, manifest, limits, quarantine)
+    if cache is not None:
+        cache.close()
+    if options.profile:
+        events = crop_profile.stop()
+        if args.profile:
+            crop_profile.write_chrome_trace(args.profile, events)
+        if args.metrics:
+            totals = {"files": batch.files, "pages": batch.pages, "saved_files": batch.saved, "failures": batch.failures,
+                      "batch_duration_seconds": round(batch.elapsed, 6)}
+            crop_profile.write_prometheus(args.metrics, events, totals)
+
+    report = sys.stderr if pipe else sys.stdout
+    if args.json:
+        print(json.dumps(batch.to_dict(), ensure_ascii=False), file=report)
+    else:
+        print(
+            f"共处理 {batch.files} 个文件，{batch.pages} 页，"
+            f"保存 {batch.saved} 个文件，跳过 {batch.skipped} 个，失败 {batch.failures} 个，"
+            f"耗时 {batch.elapsed:.2f} 秒",
+            file=report,
+        )
+    return 1 if batch.failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
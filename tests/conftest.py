@@ -0,0 +1,30 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_PDFS = sorted(os.path.join(TESTS_DIR, name) for name in os.listdir(TESTS_DIR) if name.endswith(".pdf"))
+
+# 各模块位于仓库根目录，直接导入
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+
+
+@pytest.fixture
+def sample_pdfs(tmp_path):
+    """复制到临时目录中的示例PDF，裁剪结果不会写入 tests 目录"""
+    paths = []
+    for path in SAMPLE_PDFS:
+        target = tmp_path / os.path.basename(path)
+        shutil.copyfile(path, target)
+        paths.append(str(target))
+    return paths
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path_factory, monkeypatch):
+    """命令行默认启用的裁剪框缓存写到临时目录，不使用用户缓存目录"""
+    path = tmp_path_factory.mktemp("cache")
+    monkeypatch.setenv("PDF_CROP_CACHE_DIR", str(path))
+    return path
@@ -0,0 +1,106 @@
+import asyncio
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import crop_async
+from crop_async import AsyncCropper, crop_async as crop_async_fn
+from pdf_cropper import CropOptions, CropResult, crop_pdf
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("threaded", [True, False], ids=["threads", "processes"])
+def test_crop(sample_pdfs, threaded):
+    async def run():
+        executor = ThreadPoolExecutor(2) if threaded else None
+        async with AsyncCropper(max_concurrency=2, executor=executor) as cropper:
+            results = await asyncio.gather(*(cropper.crop(path, CropOptions(dry_run=True)) for path in sample_pdfs))
+            output, from_bytes = await crop_async_fn(_read(sample_pdfs[0]), cropper=cropper)
+            _, from_file = await cropper.crop(io.BytesIO(_read(sample_pdfs[0])), CropOptions(dry_run=True))
+        if executor is not None:
+            executor.shutdown()
+        return results, output, from_bytes, from_file
+
+    results, output, from_bytes, from_file = asyncio.run(run())
+    for path, result in zip(sample_pdfs, results, strict=True):
+        assert isinstance(result, CropResult) and result.ok
+        assert [page.cropbox for page in result.pages] == [page.cropbox for page in crop_pdf(path, CropOptions(dry_run=True)).pages]
+    assert output.startswith(b"%PDF") and from_bytes.ok
+    assert [page.cropbox for page in from_file.pages] == [page.cropbox for page in results[0].pages]
+
+
+def test_iter_pages(sample_pdfs):
+    path = next(path for path in sample_pdfs if path.endswith("test_multi_pages.pdf"))
+
+    async def run():
+        executor = ThreadPoolExecutor(1)
+        async with AsyncCropper(executor=executor) as cropper:
+            pages = [page async for page in cropper.iter_pages(path, CropOptions(dry_run=True))]
+            with pytest.raises(RuntimeError):
+                async for _ in cropper.iter_pages(b"not a pdf"):
+                    pass
+        executor.shutdown()
+        return pages
+
+    pages = asyncio.run(run())
+    assert [page.page_num for page in pages] == [0, 1]
+    assert [page.cropbox for page in pages] == [page.cropbox for page in crop_pdf(path, CropOptions(dry_run=True)).pages]
+
+
+def test_bounded_concurrency(monkeypatch):
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def job(source, options, progress_queue=None, cancel=None):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return CropResult(source)
+
+    monkeypatch.setattr(crop_async, "_run_job", job)
+
+    async def run():
+        executor = ThreadPoolExecutor(8)
+        async with AsyncCropper(max_concurrency=2, executor=executor) as cropper:
+            results = await asyncio.gather(*(cropper.crop(f"{i}.pdf") for i in range(8)))
+        executor.shutdown()
+        return results
+
+    results = asyncio.run(run())
+    assert [result.input_path for result in results] == [f"{i}.pdf" for i in range(8)]
+    assert peak[0] == 2
+
+
+def test_cancel_stops_job(monkeypatch):
+    seen = []
+
+    def job(source, options, progress_queue=None, cancel=None):
+        seen.append(cancel.wait(10))
+        return CropResult(source, error="已取消")
+
+    monkeypatch.setattr(crop_async, "_run_job", job)
+
+    async def run():
+        executor = ThreadPoolExecutor(1)
+        async with AsyncCropper(max_concurrency=1, executor=executor) as cropper:
+            task = asyncio.create_task(cropper.crop("slow.pdf"))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            # 任务真正结束后才释放空位
+            assert not cropper._semaphore().locked()
+        executor.shutdown()
+
+    asyncio.run(run())
+    assert seen == [True]
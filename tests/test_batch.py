@@ -0,0 +1,41 @@
+import os
+import shutil
+
+from pdf_cropper import CropOptions, collect_input_pdfs, crop_pdf_batch, main
+
+
+def test_collect_input_pdfs(sample_pdfs, tmp_path):
+    sub = tmp_path / "sub"
+    sub.mkdir()
+    nested = str(sub / "nested.pdf")
+    shutil.copyfile(sample_pdfs[0], nested)
+    output = str(tmp_path / "old_cropped.pdf")
+    shutil.copyfile(sample_pdfs[0], output)
+    (tmp_path / "notes.txt").write_text("")
+
+    # 展开目录和通配符时跳过上次的输出文件，重复出现的文件只保留一次
+    found = collect_input_pdfs([str(tmp_path), sample_pdfs[0]], "_cropped")
+    assert sorted(found) == sorted(sample_pdfs + [nested])
+    assert len(found) == len(set(found))
+    assert output not in collect_input_pdfs([str(tmp_path / "*.pdf")], "_cropped")
+    # 直接指定的文件总是保留
+    assert collect_input_pdfs([output], "_cropped") == [output]
+
+
+def test_batch_parallel_matches_serial(sample_pdfs):
+    serial = crop_pdf_batch(sample_pdfs, CropOptions(dry_run=True))
+    parallel = crop_pdf_batch(sample_pdfs, CropOptions(dry_run=True), jobs=2)
+    assert [result.input_path for result in parallel.results] == sample_pdfs
+    assert [[page.cropbox for page in result.pages] for result in parallel.results] == \
+        [[page.cropbox for page in result.pages] for result in serial.results]
+    assert parallel.failures == 0
+
+
+def test_cli_directory(sample_pdfs, tmp_path, capsys):
+    assert main([str(tmp_path), "-j", "2", "-q"]) == 0
+    outputs = [path[:-4] + "_cropped.pdf" for path in sample_pdfs]
+    assert all(os.path.exists(path) for path in outputs)
+    # 再次运行时不会裁剪上一次的输出文件
+    assert main([str(tmp_path), "-j", "2", "-q"]) == 0
+    assert not any(os.path.exists(path[:-4] + "_cropped.pdf") for path in outputs)
+    assert f"共处理 {len(sample_pdfs)} 个文件" in capsys.readouterr().out
@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+from pdf_cropper import (DETECTION_ENGINES, CropOptions, DetectionBudget, crop_pdf, estimate_page_objects, find_content_rect, fitz,
+                         main)
+
+
+@pytest.fixture
+def scatter_pdf(tmp_path):
+    """一页包含大量小矢量图形的散点图"""
+    path = str(tmp_path / "scatter.pdf")
+    with fitz.open() as doc:
+        page = doc.new_page(width=400, height=300)
+        shape = page.new_shape()
+        for i in range(500):
+            x, y = 50 + (i * 37) % 300, 40 + (i * 53) % 200
+            shape.draw_rect(fitz.Rect(x, y, x + 2, y + 2))
+            shape.finish(fill=(0, 0, 1))
+        shape.commit()
+        doc.save(path)
+    return path
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """记录各检测引擎被调用的次数"""
+    counts = {}
+    for name, detect in list(DETECTION_ENGINES.items()):
+        def spy(page, budget=None, name=name, detect=detect):
+            counts[name] = counts.get(name, 0) + 1
+            return detect(page, budget)
+        monkeypatch.setitem(DETECTION_ENGINES, name, spy)
+    return counts
+
+
+def test_estimate_page_objects(scatter_pdf):
+    with fitz.open(scatter_pdf) as doc:
+        assert estimate_page_objects(doc[0]) >= 500
+
+
+def test_objects_budget_falls_back(scatter_pdf, calls):
+    with fitz.open(scatter_pdf) as doc:
+        page = doc[0]
+        expected = DETECTION_ENGINES["stext"](page)
+        calls.clear()
+        content_rect = find_content_rect(page, "objects", DetectionBudget(max_objects=100))
+        assert calls == {"objects": 1, "stext": 1}
+        assert content_rect == expected
+
+        # 未超出预算时不改用其他引擎
+        calls.clear()
+        find_content_rect(page, "objects", DetectionBudget(max_objects=10000))
+        assert calls == {"objects": 1}
+
+
+def test_time_budget_falls_back(scatter_pdf, calls):
+    with fitz.open(scatter_pdf) as doc:
+        find_content_rect(doc[0], "objects", DetectionBudget(max_seconds=1e-9, fallback="raster"))
+    assert calls == {"objects": 1, "raster": 1}
+
+
+def test_no_fallback_to_same_engine(scatter_pdf, calls):
+    with fitz.open(scatter_pdf) as doc:
+        find_content_rect(doc[0], "stext", DetectionBudget(max_objects=1, fallback="stext"))
+    assert calls == {"stext": 1}
+
+
+def test_early_exit_skips_drawings(tmp_path, monkeypatch):
+    # 图片已经覆盖整页时不再调用 get_drawings
+    with fitz.open() as doc:
+        page = doc.new_page(width=200, height=100)
+        pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 4, 2), False)
+        pix.clear_with(128)
+        page.insert_image(page.rect, pixmap=pix)
+        page.draw_rect(fitz.Rect(10, 10, 20, 20))
+
+        def fail(*args, **kwargs):
+            raise AssertionError("不应调用 get_drawings")
+
+        monkeypatch.setattr(fitz.Page, "get_drawings", fail)
+        assert find_content_rect(page, "objects") == page.rect
+
+
+def test_cli_budget(scatter_pdf, calls, capsys):
+    assert main([scatter_pdf, "--dry-run", "--json", "--no-cache", "--max_page_objects", "100", "-q"]) == 0
+    assert calls == {"objects": 1, "stext": 1}
+    page, = json.loads(capsys.readouterr().out)["files"][0]["pages"]
+    assert page["cropbox"] is not None
+    # 通过 CropOptions 传入时结果相同
+    result = crop_pdf(scatter_pdf, CropOptions(dry_run=True, budget=DetectionBudget(max_objects=100)))
+    assert list(result.pages[0].cropbox) == pytest.approx(page["cropbox"])
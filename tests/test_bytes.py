@@ -0,0 +1,82 @@
+import io
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import SAMPLE_PDFS
+from pdf_cropper import DETECTION_ENGINES, CropOptions, crop_pdf, crop_pdf_bytes, fitz
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("engine", DETECTION_ENGINES)
+@pytest.mark.parametrize("path", SAMPLE_PDFS, ids=os.path.basename)
+def test_bytes_match_file(path, engine):
+    expected = crop_pdf(path, CropOptions(engine=engine, dry_run=True))
+    output, result = crop_pdf_bytes(_read(path), CropOptions(engine=engine))
+    assert result.ok, result.error
+    assert [page.cropbox for page in result.pages] == [page.cropbox for page in expected.pages]
+    with fitz.open(stream=output, filetype="pdf") as doc:
+        for page, page_result in zip(doc, result.pages, strict=True):
+            assert tuple(page.cropbox) == pytest.approx(page_result.cropbox)
+
+
+def test_bytes_variants(sample_pdfs, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    before = sorted(os.listdir(tmp_path))
+    path = next(path for path in sample_pdfs if path.endswith("test_multi_pages.pdf"))
+    # 二进制文件对象
+    output, result = crop_pdf_bytes(io.BytesIO(_read(path)), name="upload.pdf")
+    assert result.ok and result.input_path == "upload.pdf"
+    assert output.startswith(b"%PDF")
+    # 按页导出时每页一个PDF
+    pages, result = crop_pdf_bytes(_read(path), CropOptions(export_per_page=True))
+    assert len(pages) == len(result.pages) == 2
+    assert all(len(fitz.open(stream=page, filetype="pdf")) == 1 for page in pages)
+    # 只计算裁剪框时没有输出
+    output, result = crop_pdf_bytes(_read(path), CropOptions(dry_run=True))
+    assert output is None and result.ok
+    # 内存中的文档不支持增量保存
+    output, result = crop_pdf_bytes(_read(path), CropOptions(save_mode="incremental"))
+    assert output is None and "增量" in result.error
+    assert sorted(os.listdir(tmp_path)) == before
+
+
+def _pipe(args, data, env=None):
+    return subprocess.run([sys.executable, os.path.join(REPO_DIR, "pdf_cropper.py"), "-", *args], input=data,
+                          capture_output=True, env=env, timeout=120)
+
+
+def test_pipe_mode(sample_pdfs, cache_dir):
+    data = _read(sample_pdfs[0])
+    completed = _pipe(["--json"], data)
+    assert completed.returncode == 0, completed.stderr.decode()
+    assert completed.stdout.startswith(b"%PDF")
+    report = json.loads(completed.stderr.decode().splitlines()[-1])
+    assert report["files"][0]["input_path"] == "<stdin>"
+    assert report["files"][0]["output_paths"] == ["-"]
+    # 管道模式默认不写入缓存目录
+    assert os.listdir(cache_dir) == []
+    with fitz.open(stream=completed.stdout, filetype="pdf") as doc:
+        assert tuple(doc[0].cropbox) == pytest.approx(report["files"][0]["pages"][0]["cropbox"])
+
+
+def test_pipe_mode_with_cache_dir(sample_pdfs, tmp_path):
+    cache = str(tmp_path / "explicit")
+    completed = _pipe(["--cache_dir", cache, "-q"], _read(sample_pdfs[0]))
+    assert completed.returncode == 0, completed.stderr.decode()
+    assert os.listdir(cache)
+
+
+def test_pipe_mode_rejects_export_per_page(sample_pdfs):
+    completed = _pipe(["--export_per_page"], _read(sample_pdfs[0]))
+    assert completed.returncode == 1
+    assert completed.stdout == b""
@@ -0,0 +1,105 @@
+import multiprocessing
+import pickle
+import sqlite3
+
+import pytest
+
+from conftest import SAMPLE_PDFS
+from crop_cache import CropBoxCache, page_content_key
+from pdf_cropper import DETECTION_ENGINES, CropOptions, crop_pdf, fitz
+
+
+def _fill(cache_dir, worker):
+    cache = CropBoxCache(cache_dir)
+    for i in range(200):
+        cache.put(f"{worker}-{i}", fitz.Rect(0, 0, worker + 1, i + 1))
+    cache.close()
+
+
+def test_put_is_buffered_until_flush(tmp_path):
+    cache = CropBoxCache(str(tmp_path))
+    cache.put("text", fitz.Rect(1, 2, 3, 4))
+    cache.put("blank", None)
+    # 本对象立即可见
+    assert cache.get("text") == (True, fitz.Rect(1, 2, 3, 4))
+    assert cache.get("blank") == (True, None)
+    # 写入之前不持有数据库的写锁，其他进程可以写入
+    other = sqlite3.connect(cache.path, timeout=0)
+    other.execute("BEGIN IMMEDIATE")
+    other.rollback()
+    assert CropBoxCache(str(tmp_path)).get("text") == (False, None)
+
+    cache.flush()
+    reopened = CropBoxCache(str(tmp_path))
+    assert reopened.get("text") == (True, fitz.Rect(1, 2, 3, 4))
+    assert reopened.get("blank") == (True, None)
+    assert reopened.get("missing") == (False, None)
+    cache.close()
+    reopened.close()
+    other.close()
+
+
+def test_pickle_drops_connection_and_buffers(tmp_path):
+    cache = CropBoxCache(str(tmp_path))
+    cache.put("key", fitz.Rect(0, 0, 1, 1))
+    copy = pickle.loads(pickle.dumps(cache))
+    assert copy.path == cache.path
+    assert copy.get("key") == (False, None)
+    cache.close()
+
+
+def test_concurrent_processes(tmp_path):
+    context = multiprocessing.get_context()
+    processes = [context.Process(target=_fill, args=(str(tmp_path), worker)) for worker in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+    cache = CropBoxCache(str(tmp_path))
+    for worker in range(4):
+        assert cache.get(f"{worker}-199") == (True, fitz.Rect(0, 0, worker + 1, 200))
+    cache.close()
+
+
+def test_eviction_respects_size_limit(tmp_path):
+    cache = CropBoxCache(str(tmp_path), max_size_mb=0.05)
+    for i in range(3000):
+        cache.put(f"key-{i:05d}", fitz.Rect(0, 0, 1, i))
+    cache.close()
+    conn = sqlite3.connect(cache.path)
+    count = conn.execute("SELECT COUNT(*) FROM boxes").fetchone()[0]
+    conn.close()
+    assert 0 < count < 3000
+
+
+def test_content_key():
+    path = SAMPLE_PDFS[0]
+    with fitz.open(path) as doc:
+        keys = [page_content_key(page, "objects") for page in doc]
+        # 共享资源的哈希按文档记录，再次计算结果相同
+        assert doc._crop_xref_digests
+        assert [page_content_key(page, "objects") for page in doc] == keys
+        assert page_content_key(doc[0], "stext") != keys[0]
+    with fitz.open(path) as doc:
+        assert [page_content_key(page, "objects") for page in doc] == keys
+        page = doc[0]
+        page.insert_text((10, 10), "changed")
+        assert page_content_key(page, "objects") != keys[0]
+
+
+@pytest.mark.parametrize("path", SAMPLE_PDFS)
+def test_crop_pdf_uses_cache(tmp_path, monkeypatch, path):
+    cache = CropBoxCache(str(tmp_path))
+    expected = crop_pdf(path, CropOptions(dry_run=True, cache=cache))
+    assert expected.ok, expected.error
+
+    # 第二次全部命中缓存，不再调用检测引擎
+    def fail(page, budget=None):
+        raise AssertionError("缓存未命中")
+
+    monkeypatch.setitem(DETECTION_ENGINES, "objects", fail)
+    result = crop_pdf(path, CropOptions(dry_run=True, cache=CropBoxCache(str(tmp_path))))
+    assert result.ok, result.error
+    assert [page.cropbox for page in result.pages] == [page.cropbox for page in expected.pages]
+    cache.close()
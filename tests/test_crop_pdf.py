@@ -0,0 +1,72 @@
+import json
+import os
+
+from pdf_cropper import CropOptions, crop_pdf, crop_pdf_batch, main
+
+
+def test_crop_pdf_writes_output(sample_pdfs):
+    for path in sample_pdfs:
+        result = crop_pdf(path, CropOptions(margin=5))
+        assert result.ok, result.error
+        assert result.output_paths == [path[:-4] + "_cropped.pdf"]
+        assert os.path.exists(result.output_paths[0])
+        assert result.pages and all(page.cropbox is not None for page in result.pages)
+        assert {"open", "save", "total"} <= set(result.timings)
+
+
+def test_dry_run_writes_nothing(sample_pdfs, tmp_path):
+    before = sorted(os.listdir(tmp_path))
+    batch = crop_pdf_batch(sample_pdfs, CropOptions(dry_run=True))
+    assert sorted(os.listdir(tmp_path)) == before
+    assert batch.saved == 0 and batch.failures == 0
+    assert batch.pages == sum(len(result.pages) for result in batch.results)
+    # 结果可以直接序列化为JSON
+    data = json.loads(json.dumps(batch.to_dict()))
+    assert data["summary"]["files"] == len(sample_pdfs)
+    assert all(file["output_paths"] == [] for file in data["files"])
+
+
+def test_error_is_recorded(tmp_path):
+    path = str(tmp_path / "bad.pdf")
+    with open(path, "wb") as f:
+        f.write(b"not a pdf")
+    result = crop_pdf(path)
+    assert not result.ok and result.error
+    assert result.output_paths == []
+
+
+def test_cli_json(sample_pdfs, capsys):
+    assert main([*sample_pdfs, "--dry-run", "--json", "-q"]) == 0
+    data = json.loads(capsys.readouterr().out)
+    assert data["summary"]["files"] == len(sample_pdfs)
+    assert [file["input_path"] for file in data["files"]] == sample_pdfs
+    for file in data["files"]:
+        assert all(len(page["cropbox"]) == 4 for page in file["pages"])
+
+
+def test_progress_and_page_count(sample_pdfs):
+    for path in sample_pdfs:
+        opened, pages = [], []
+        result = crop_pdf(path, CropOptions(), progress=lambda page: pages.append(page.page_num), on_open=opened.append)
+        assert result.ok, result.error
+        assert opened == [len(result.pages)]
+        assert pages == list(range(len(result.pages)))
+
+
+def test_cancel(sample_pdfs):
+    class CancelAfter:
+        """处理完 count 页后设置"""
+
+        def __init__(self, count):
+            self.count = count
+
+        def is_set(self):
+            self.count -= 1
+            return self.count < 0
+
+    path, = [path for path in sample_pdfs if path.endswith("test_multi_pages.pdf")]
+    result = crop_pdf(path, CropOptions(), cancel=CancelAfter(1))
+    assert result.error == "已取消"
+    assert len(result.pages) == 1
+    assert result.output_paths == []
+    assert not os.path.exists(path[:-4] + "_cropped.pdf")
@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from conftest import SAMPLE_PDFS
+from pdf_cropper import DETECTION_ENGINES, CropOptions, crop_pdf, fitz
+
+
+def _content_rects(path, **kwargs):
+    result = crop_pdf(path, CropOptions(dry_run=True, **kwargs))
+    assert result.ok, result.error
+    return [page.content_rect for page in result.pages]
+
+
+@pytest.mark.parametrize("path", SAMPLE_PDFS, ids=os.path.basename)
+def test_stext_matches_objects(path):
+    # 描边图形的边界包含线宽，最多相差半个线宽
+    for objects, stext in zip(_content_rects(path, engine="objects"), _content_rects(path, engine="stext"), strict=True):
+        assert objects == pytest.approx(stext, abs=1.0)
+
+
+@pytest.mark.parametrize("engine", DETECTION_ENGINES)
+@pytest.mark.parametrize("path", SAMPLE_PDFS, ids=os.path.basename)
+def test_execution_modes_agree(path, engine):
+    # 按页并行和流式处理的结果与串行处理完全相同
+    expected = _content_rects(path, engine=engine)
+    assert _content_rects(path, engine=engine, page_jobs=2) == expected
+    assert _content_rects(path, engine=engine, stream_window=1) == expected
+
+
+def _contains(outer, inner, tolerance):
+    return (inner[0] >= outer[0] - tolerance and inner[1] >= outer[1] - tolerance
+            and inner[2] <= outer[2] + tolerance and inner[3] <= outer[3] + tolerance)
+
+
+@pytest.mark.parametrize("path", SAMPLE_PDFS, ids=os.path.basename)
+def test_raster_within_objects(path):
+    # raster 按可见像素检测（精确到半个点，字形的抗锯齿边缘可能略超出文本块），结果通常更紧凑，但不会明显偏小
+    for objects, raster in zip(_content_rects(path, engine="objects"), _content_rects(path, engine="raster"), strict=True):
+        assert _contains(objects, raster, tolerance=2.0)
+        assert _contains(raster, objects, tolerance=15.0)
+
+
+def _red_pixels(page):
+    pix = page.get_pixmap(alpha=False)
+    samples = pix.samples
+    return sum(samples[i] > 200 and samples[i + 1] < 50 for i in range(0, len(samples), 3))
+
+
+@pytest.mark.parametrize("rotation", [0, 90, 180, 270])
+@pytest.mark.parametrize("engine", DETECTION_ENGINES)
+def test_rotated_page(tmp_path, engine, rotation):
+    # 横向页面上的红色矩形一直延伸到未旋转坐标的 x=350，超出旋转后页面的宽度
+    path = str(tmp_path / "rotated.pdf")
+    with fitz.open() as doc:
+        page = doc.new_page(width=400, height=300)
+        page.draw_rect(fitz.Rect(0, 0, 1, 1), color=(1, 1, 1)) # objects 引擎忽略第一个矢量图形
+        page.draw_rect(fitz.Rect(50, 60, 350, 290), color=(1, 0, 0), fill=(1, 0, 0))
+        page.set_rotation(rotation)
+        expected = _red_pixels(page)
+        doc.save(path)
+
+    result = crop_pdf(path, CropOptions(engine=engine, margin=0))
+    assert result.ok, result.error
+    assert tuple(result.pages[0].content_rect) == pytest.approx((50, 60, 350, 290), abs=1.0)
+    with fitz.open(result.output_paths[0]) as doc:
+        page = doc[0]
+        assert page.rotation == rotation
+        assert tuple(page.cropbox) == pytest.approx(tuple(result.pages[0].cropbox))
+        # 整个矩形都在裁剪后的页面中
+        assert _red_pixels(page) >= expected
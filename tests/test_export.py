@@ -0,0 +1,78 @@
+import os
+import re
+
+import pytest
+
+from conftest import SAMPLE_PDFS
+from pdf_cropper import CropOptions, crop_pdf, fitz
+
+
+def _shared_resources_pdf(path):
+    """两页共用一个资源字典；第一页只调用一个没有自己的 /Resources 的表单，表单中使用 /F1"""
+    with fitz.open() as doc:
+        for _ in range(2):
+            doc.new_page(width=300, height=200)
+
+        def new_object(source, stream=None):
+            xref = doc.get_new_xref()
+            doc.update_object(xref, source)
+            if stream is not None:
+                doc.update_stream(xref, stream)
+            return xref
+
+        font1 = new_object("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+        font2 = new_object("<< /Type /Font /Subtype /Type1 /BaseFont /Courier >>")
+        form = new_object("<< /Type /XObject /Subtype /Form /BBox [0 0 300 200] >>", b"BT /F1 24 Tf 40 100 Td (Hello) Tj ET")
+        resources = new_object(f"<< /Font << /F1 {font1} 0 R /F2 {font2} 0 R >> /XObject << /Fm1 {form} 0 R >> >>")
+        for page_num, stream in enumerate([b"q /Fm1 Do Q", b"BT /F2 12 Tf 20 20 Td (Bye) Tj ET"]):
+            page_xref = doc.page_xref(page_num)
+            doc.xref_set_key(page_xref, "Resources", f"{resources} 0 R")
+            doc.xref_set_key(page_xref, "Contents", f"{new_object('<< >>', stream)} 0 R")
+        doc.save(path)
+
+
+def _resource_names(page, category):
+    doc = page.parent
+    kind, value = doc.xref_get_key(page.xref, f"Resources/{category}")
+    if kind == "xref":
+        value = doc.xref_object(int(value.split()[0]))
+    return set(re.findall(r"/(\w+)\s+\d+\s+0\s+R", value))
+
+
+def test_prune_keeps_inherited_form_resources(tmp_path):
+    path = str(tmp_path / "shared.pdf")
+    _shared_resources_pdf(path)
+    result = crop_pdf(path, CropOptions(export_per_page=True))
+    assert result.ok, result.error
+    first, second = result.output_paths
+
+    with fitz.open(first) as doc:
+        page = doc[0]
+        # 表单使用的 /F1 保留，其他页面的 /F2 被删除
+        assert _resource_names(page, "Font") == {"F1"}
+        assert _resource_names(page, "XObject") == {"Fm1"}
+        assert page.get_text().strip() == "Hello"
+        assert len(doc.get_page_fonts(0, full=True)) == 1
+    with fitz.open(second) as doc:
+        page = doc[0]
+        assert _resource_names(page, "Font") == {"F2"}
+        assert _resource_names(page, "XObject") == set()
+        assert page.get_text().strip() == "Bye"
+
+
+@pytest.mark.parametrize("path", SAMPLE_PDFS, ids=os.path.basename)
+def test_export_per_page_matches_input(sample_pdfs, path):
+    # 按页导出的每一页与在原文件中设置相同裁剪框后的渲染结果完全一致
+    path = next(copy for copy in sample_pdfs if os.path.basename(copy) == os.path.basename(path))
+    result = crop_pdf(path, CropOptions(export_per_page=True))
+    assert result.ok, result.error
+    assert len(result.output_paths) == len(result.pages)
+    with fitz.open(path) as source:
+        for page_result, output_path in zip(result.pages, result.output_paths, strict=True):
+            assert page_result.output_path == output_path
+            page = source[page_result.page_num]
+            page.set_cropbox(fitz.Rect(page_result.cropbox))
+            with fitz.open(output_path) as output:
+                assert len(output) == 1
+                assert output[0].get_pixmap().samples == page.get_pixmap().samples
+            assert os.path.getsize(output_path) < os.path.getsize(path) * 1.1
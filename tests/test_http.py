@@ -0,0 +1,108 @@
+import http.client
+import json
+import os
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import crop_http
+from crop_http import CropHTTPService, _CropRequestHandler
+from crop_server import CropServer
+
+_real_crop_upload = crop_http._crop_upload
+
+
+def _crop_upload(data, options, deadline):
+    """代替 _crop_upload：模拟会使子进程崩溃的文件和处理较慢的文件"""
+    if data == b"poison":
+        os._exit(3)
+    if data.startswith(b"slow"):
+        time.sleep(1.0)
+        data = data[len(b"slow"):]
+    return _real_crop_upload(data, options, deadline)
+
+
+def _start(server: CropServer, **kwargs):
+    http_server = ThreadingHTTPServer(("127.0.0.1", 0), _CropRequestHandler)
+    http_server.daemon_threads = True
+    http_server.service = CropHTTPService(server, **kwargs)
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+    return http_server
+
+
+def _request(http_server, method, path, body=None):
+    connection = http.client.HTTPConnection(*http_server.server_address, timeout=30)
+    try:
+        connection.request(method, path, body)
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+@pytest.fixture(scope="module")
+def service():
+    server = CropServer(jobs=2)
+    server.warm_up()
+    http_server = _start(server, queue_size=2)
+    yield http_server
+    http_server.shutdown()
+    http_server.server_close()
+    server.close()
+
+
+@pytest.fixture
+def sample_data(sample_pdfs):
+    with open(sample_pdfs[0], "rb") as f:
+        return f.read()
+
+
+def test_crop(service, sample_data):
+    status, body = _request(service, "POST", "/crop?margin=5", sample_data)
+    assert status == 200 and body.startswith(b"%PDF")
+    status, body = _request(service, "POST", "/boxes", sample_data)
+    assert status == 200 and json.loads(body)["error"] is None and json.loads(body)["pages"]
+
+
+def test_status_codes(service, sample_data):
+    for timeout in ("0", "-1", "nan", "inf"):
+        assert _request(service, "POST", f"/crop?timeout={timeout}", sample_data)[0] == 400
+    assert _request(service, "POST", "/crop?unknown=1", sample_data)[0] == 400
+    assert _request(service, "POST", "/crop", b"not a pdf")[0] == 422
+    assert _request(service, "GET", "/crop")[0] == 405
+    assert _request(service, "GET", "/unknown")[0] == 404
+    assert _request(service, "POST", "/unknown", b"")[0] == 404
+
+    status, body = _request(service, "GET", "/health")
+    assert status == 200 and json.loads(body)["pool"] == "ok"
+    status, body = _request(service, "GET", "/metrics")
+    assert status == 200 and b'endpoint="crop",code="400"' in body
+
+
+def test_poison_upload(monkeypatch, sample_data):
+    # 子进程由 fork 创建，替换后新建的进程池中也使用替换后的函数
+    monkeypatch.setattr(crop_http, "_crop_upload", _crop_upload)
+    server = CropServer(jobs=2)
+    server.warm_up()
+    http_server = _start(server, queue_size=2)
+    try:
+        results = {}
+
+        def request(name, body):
+            results[name] = _request(http_server, "POST", "/crop", body)[0]
+
+        slow = threading.Thread(target=request, args=("slow", b"slow" + sample_data))
+        slow.start()
+        time.sleep(0.3)
+        request("poison", b"poison")
+        slow.join(30)
+        # 崩溃只影响上传该文件的请求，同时处理的请求在重建的进程池中重新执行
+        assert results == {"poison": 500, "slow": 200}
+        assert server.restarts == 1
+        assert _request(http_server, "POST", "/crop", sample_data)[0] == 200
+    finally:
+        http_server.shutdown()
+        http_server.server_close()
+        server.close()
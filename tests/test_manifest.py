@@ -0,0 +1,68 @@
+import json
+import os
+
+from crop_manifest import CropManifest, write_json_atomic
+from pdf_cropper import CropOptions, crop_pdf_batch
+
+
+def _run(paths, manifest_path, **kwargs):
+    return crop_pdf_batch(paths, CropOptions(**kwargs), manifest=CropManifest(manifest_path))
+
+
+def test_write_json_atomic(tmp_path):
+    path = tmp_path / "sub" / "data.json"
+    write_json_atomic(str(path), {"名称": 1})
+    write_json_atomic(str(path), {"名称": 2})
+    assert json.loads(path.read_text(encoding="utf-8")) == {"名称": 2}
+    assert os.listdir(path.parent) == ["data.json"]
+
+
+def test_skip_unchanged(sample_pdfs, tmp_path):
+    manifest_path = str(tmp_path / "manifest.json")
+    first = _run(sample_pdfs, manifest_path)
+    assert first.failures == 0 and first.skipped == 0
+
+    second = _run(sample_pdfs, manifest_path)
+    assert second.skipped == len(sample_pdfs)
+    assert second.saved == 0
+    assert [result.output_paths for result in second.results] == [result.output_paths for result in first.results]
+
+    # 只有修改时间变化、内容不变时根据内容哈希跳过
+    os.utime(sample_pdfs[0], ns=(0, 0))
+    assert _run(sample_pdfs, manifest_path).skipped == len(sample_pdfs)
+
+
+def test_reprocess_changes(sample_pdfs, tmp_path):
+    manifest_path = str(tmp_path / "manifest.json")
+    first = _run(sample_pdfs, manifest_path)
+
+    # 输出文件被删除
+    os.remove(first.results[0].output_paths[0])
+    result = _run(sample_pdfs, manifest_path)
+    assert [r.skipped for r in result.results] == [False] + [True] * (len(sample_pdfs) - 1)
+
+    # 内容变化
+    with open(sample_pdfs[-1], "ab") as f:
+        f.write(b"\n% appended\n")
+    result = _run(sample_pdfs, manifest_path)
+    assert [r.skipped for r in result.results] == [True] * (len(sample_pdfs) - 1) + [False]
+
+    # 参数变化时全部重新处理
+    assert _run(sample_pdfs, manifest_path, margin=10).skipped == 0
+    assert _run(sample_pdfs, manifest_path, margin=10).skipped == len(sample_pdfs)
+
+
+def test_failure_is_discarded(sample_pdfs, tmp_path):
+    manifest_path = str(tmp_path / "manifest.json")
+    _run(sample_pdfs, manifest_path)
+    with open(sample_pdfs[0], "wb") as f:
+        f.write(b"not a pdf")
+    result = _run(sample_pdfs, manifest_path)
+    assert result.failures == 1
+    assert os.path.abspath(sample_pdfs[0]) not in CropManifest(manifest_path).files
+
+
+def test_dry_run_ignores_manifest(sample_pdfs, tmp_path):
+    manifest_path = str(tmp_path / "manifest.json")
+    _run(sample_pdfs, manifest_path, dry_run=True)
+    assert not os.path.exists(manifest_path)
@@ -0,0 +1,153 @@
+import json
+import multiprocessing
+import os
+import shutil
+
+import pytest
+
+from crop_queue import JobQueue, main, run_worker
+from pdf_cropper import CropOptions, CropResult
+
+
+@pytest.fixture
+def queue(tmp_path, sample_pdfs):
+    queue = JobQueue(str(tmp_path / "queue"))
+    queue.submit(sample_pdfs, CropOptions(margin=3))
+    return queue
+
+
+def _expire(lease):
+    os.utime(lease.path, (0, 0))
+
+
+def test_submit(queue, sample_pdfs, tmp_path):
+    assert queue.options().margin == 3
+    # 已在队列中的文件不会重复提交
+    extra = str(tmp_path / "extra.pdf")
+    shutil.copyfile(sample_pdfs[0], extra)
+    assert queue.submit(sample_pdfs + [extra], CropOptions(margin=3)) == 1
+    assert len(queue.job_ids()) == len(sample_pdfs) + 1
+    with pytest.raises(ValueError):
+        queue.submit([extra], CropOptions(margin=4))
+
+
+def test_claim_is_exclusive(queue, sample_pdfs):
+    leases = [queue.claim(f"w{i}", lease_timeout=60, max_attempts=3) for i in range(len(sample_pdfs))]
+    assert sorted(lease.input_path for lease in leases) == sorted(map(os.path.abspath, sample_pdfs))
+    assert queue.claim("late", lease_timeout=60, max_attempts=3) is None
+    assert queue.status()["running"] == len(sample_pdfs)
+    for lease in leases:
+        assert queue.record(lease, CropResult(lease.input_path), "w", 0.0)
+    assert queue.status() == {"jobs": len(sample_pdfs), "done": len(sample_pdfs), "running": 0, "pending": 0,
+                              "expired_leases": 0}
+    assert queue.claim("late", lease_timeout=60, max_attempts=3) is None
+
+
+def test_expired_lease_is_taken_over(tmp_path, sample_pdfs):
+    queue = JobQueue(str(tmp_path / "queue"))
+    queue.submit(sample_pdfs[:1])
+    first = queue.claim("w1", lease_timeout=60, max_attempts=3)
+    assert first.attempt == 1 and first.heartbeat()
+
+    _expire(first)
+    second = queue.claim("w2", lease_timeout=60, max_attempts=3)
+    assert second.job_id == first.job_id and second.attempt == 2
+    assert queue.status()["expired_leases"] == 1
+    # 原持有者的心跳不会延长新租约，结果也被丢弃
+    assert not first.owned() and not first.heartbeat()
+    stale = str(tmp_path / "stale.partial.pdf")
+    open(stale, "wb").close()
+    assert not queue.record(first, CropResult(first.input_path, [stale]), "w1", 0.0, {stale: str(tmp_path / "out.pdf")})
+    # 被丢弃的结果的临时输出文件被删除，不会替换正式的输出
+    assert not os.path.exists(stale) and not os.path.exists(tmp_path / "out.pdf")
+    partial = str(tmp_path / "second.partial.pdf")
+    open(partial, "wb").close()
+    assert queue.record(second, CropResult(second.input_path, [partial]), "w2", 0.0, {partial: str(tmp_path / "out.pdf")})
+    assert os.path.exists(tmp_path / "out.pdf") and not os.path.exists(partial)
+
+    report = queue.report()
+    assert report["summary"]["failures"] == 0
+    assert report["files"][0]["worker"] == "w2" and report["files"][0]["attempt"] == 2
+    assert report["files"][0]["output_paths"] == [str(tmp_path / "out.pdf")]
+
+
+def test_fresh_lease_is_not_taken_over(tmp_path, sample_pdfs, monkeypatch):
+    queue = JobQueue(str(tmp_path / "queue"))
+    queue.submit(sample_pdfs[:1])
+    first = queue.claim("w1", lease_timeout=60, max_attempts=3)
+    _expire(first)
+
+    rename = os.rename
+
+    def heartbeat_then_rename(src, dst):
+        # 检查租约是否过期之后、重命名之前，原持有者更新了心跳
+        if dst.endswith(".expired"):
+            assert first.heartbeat()
+        rename(src, dst)
+
+    monkeypatch.setattr(os, "rename", heartbeat_then_rename)
+    assert queue.claim("w2", lease_timeout=60, max_attempts=3) is None
+    monkeypatch.undo()
+    # 被误重命名的租约放回原处，原持有者仍然持有
+    assert first.owned() and first.heartbeat()
+    assert queue.status()["expired_leases"] == 0
+    assert queue.record(first, CropResult(first.input_path), "w1", 0.0)
+
+
+def test_max_attempts(tmp_path, sample_pdfs):
+    queue = JobQueue(str(tmp_path / "queue"))
+    queue.submit(sample_pdfs[:1])
+    lease = queue.claim("w1", lease_timeout=60, max_attempts=1)
+    _expire(lease)
+    # 租约过期次数超过上限的任务直接记为失败
+    assert queue.claim("w2", lease_timeout=60, max_attempts=1) is None
+    report = queue.report()
+    assert report["summary"]["failures"] == 1
+    assert "超过最大尝试次数" in report["files"][0]["error"]
+    lease.release()
+
+
+def test_workers_share_queue(tmp_path, sample_pdfs):
+    inputs = []
+    for i in range(3):
+        for path in sample_pdfs:
+            copy = str(tmp_path / f"{i}_{os.path.basename(path)}")
+            shutil.copyfile(path, copy)
+            inputs.append(copy)
+    queue_path = str(tmp_path / "queue")
+    JobQueue(queue_path).submit(inputs)
+
+    context = multiprocessing.get_context()
+    processes = [context.Process(target=run_worker, args=(queue_path,), kwargs={"poll_interval": 0.1})
+                 for _ in range(3)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+    report = JobQueue(queue_path).report()
+    assert report["summary"]["files"] == len(inputs)
+    assert report["summary"]["failures"] == 0
+    assert report["queue"]["done"] == len(inputs) and report["queue"]["running"] == 0
+    assert sorted(file["input_path"] for file in report["files"]) == sorted(map(os.path.abspath, inputs))
+    for path in inputs:
+        assert os.path.exists(path[:-4] + "_cropped.pdf")
+    # 临时输出文件都已替换为正式的文件名
+    assert not [name for name in os.listdir(tmp_path) if ".partial" in name]
+    assert all(file["output_paths"] == [file["input_path"][:-4] + "_cropped.pdf"] for file in report["files"])
+    # 队列已完成，新的工作进程立即退出
+    assert run_worker(queue_path, wait=False) == 0
+
+
+def test_cli(tmp_path, sample_pdfs, capsys):
+    queue_path = str(tmp_path / "queue")
+    assert main(["submit", queue_path, *sample_pdfs, "--dry-run", "-q"]) == 0
+    assert main(["work", queue_path, "--no-wait", "--no-cache", "-q"]) == 0
+    capsys.readouterr()
+    report_path = str(tmp_path / "report.json")
+    assert main(["report", queue_path, "--json", "--output", report_path, "-q"]) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert report["summary"]["files"] == len(sample_pdfs) and report["summary"]["saved"] == 0
+    with open(report_path, encoding="utf-8") as f:
+        assert json.load(f)["queue"] == report["queue"]
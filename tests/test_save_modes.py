@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+from pdf_cropper import SAVE_MODES, CropOptions, crop_pdf, fitz
+
+
+def _multi_page(sample_pdfs):
+    return next(path for path in sample_pdfs if path.endswith("test_multi_pages.pdf"))
+
+
+def _assert_cropboxes(path, result):
+    with fitz.open(path) as doc:
+        assert len(doc) == len(result.pages)
+        for page, page_result in zip(doc, result.pages):
+            assert tuple(page.cropbox) == pytest.approx(page_result.cropbox)
+
+
+@pytest.mark.parametrize("save_mode", [mode for mode in SAVE_MODES if mode != "inplace"])
+def test_save_modes_apply_cropbox(sample_pdfs, save_mode):
+    path = _multi_page(sample_pdfs)
+    result = crop_pdf(path, CropOptions(save_mode=save_mode))
+    assert result.ok, result.error
+    output, = result.output_paths
+    assert output == path[:-4] + "_cropped.pdf"
+    _assert_cropboxes(output, result)
+    assert not os.path.exists(output + ".partial")
+
+
+def test_incremental_appends_to_input(sample_pdfs):
+    path = _multi_page(sample_pdfs)
+    with open(path, "rb") as f:
+        original = f.read()
+    output, = crop_pdf(path, CropOptions(save_mode="incremental")).output_paths
+    with open(output, "rb") as f:
+        data = f.read()
+    # 增量更新只在原文件末尾追加修改过的对象
+    assert data.startswith(original) and len(data) > len(original)
+
+
+def test_inplace(sample_pdfs):
+    path = _multi_page(sample_pdfs)
+    result = crop_pdf(path, CropOptions(save_mode="inplace"))
+    assert result.ok, result.error
+    assert result.output_paths == [path]
+    assert not os.path.exists(path[:-4] + "_cropped.pdf")
+    _assert_cropboxes(path, result)
+
+
+def test_compact_is_not_larger(sample_pdfs):
+    path = _multi_page(sample_pdfs)
+    default, = crop_pdf(path, CropOptions(suffix="_default")).output_paths
+    compact, = crop_pdf(path, CropOptions(suffix="_compact", save_mode="compact")).output_paths
+    assert os.path.getsize(compact) <= os.path.getsize(default)
+
+
+def test_incremental_failure_leaves_no_output(sample_pdfs, tmp_path):
+    bad = str(tmp_path / "bad.pdf")
+    with open(bad, "wb") as f:
+        f.write(b"not a pdf")
+    result = crop_pdf(bad, CropOptions(save_mode="incremental"))
+    assert not result.ok
+    assert "bad.pdf" in result.error and "_cropped" not in result.error
+
+    class Cancelled:
+        def is_set(self):
+            return True
+
+    result = crop_pdf(_multi_page(sample_pdfs), CropOptions(save_mode="incremental"), cancel=Cancelled())
+    assert result.error == "已取消"
+    assert not any("_cropped" in name for name in os.listdir(tmp_path))
+
+
+def test_unknown_save_mode(sample_pdfs):
+    result = crop_pdf(sample_pdfs[0], CropOptions(save_mode="zip"))
+    assert not result.ok and "zip" in result.error
@@ -0,0 +1,138 @@
+import io
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import crop_client
+from crop_server import CropServer, serve_socket, serve_stdio
+
+
+def _crash():
+    os._exit(3)
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return os.getpid()
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = CropServer(jobs=2)
+    server.warm_up()
+    yield server
+    server.close()
+
+
+def _job(path, **options):
+    return json.dumps({"id": os.path.basename(path), "input": path, "options": options})
+
+
+def test_submit(server, sample_pdfs):
+    for path in sample_pdfs:
+        response = server.submit(_job(path, margin=3)).result(30)
+        assert response["ok"] and response["id"] == os.path.basename(path)
+        assert response["result"]["output_paths"] == [path[:-4] + "_cropped.pdf"]
+        assert os.path.exists(path[:-4] + "_cropped.pdf")
+
+
+def test_invalid_jobs(server, sample_pdfs):
+    assert server.submit("not json").result()["error"].startswith("无效的任务")
+    assert server.submit("[1]").result()["error"].startswith("无效的任务")
+    assert "不支持的参数" in server.submit(_job(sample_pdfs[0], cache="x")).result()["error"]
+    ping = server.submit('{"op": "ping", "id": 7}').result()
+    assert ping["ok"] and ping["id"] == 7 and ping["jobs"] == 2
+    # 非 socket 模式不支持 shutdown
+    assert not server.submit('{"op": "shutdown"}').result()["ok"]
+
+
+def test_worker_crash_rebuilds_pool(server, sample_pdfs):
+    restarts = server.restarts
+    with pytest.raises(BrokenProcessPool):
+        server.run(_crash, retries=0).result(30)
+    assert server.restarts == restarts + 1
+    # 重建后的进程池可以继续处理任务
+    response = server.submit(_job(sample_pdfs[0], dry_run=True)).result(30)
+    assert response["ok"], response["error"]
+
+
+def test_crashed_job_not_retried(server):
+    restarts = server.restarts
+    running = server.run(_sleep, 1.0)
+    time.sleep(0.3)
+    crashed = server.run(_crash)
+    # 导致子进程退出的任务不重新提交，否则会再次拖垮进程池
+    with pytest.raises(BrokenProcessPool):
+        crashed.result(30)
+    # 同时在另一个子进程中执行的任务受到牵连，在重建的进程池中重新执行
+    assert isinstance(running.result(30), int)
+    assert server.restarts == restarts + 1
+
+
+def test_serve_stdio(server, sample_pdfs):
+    stdin = io.StringIO("".join(_job(path, dry_run=True) + "\n" for path in sample_pdfs) + "\n")
+    stdout = io.StringIO()
+    serve_stdio(server, stdin, stdout)
+    responses = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    assert sorted(response["id"] for response in responses) == sorted(map(os.path.basename, sample_pdfs))
+    assert all(response["ok"] for response in responses)
+
+
+def test_socket_and_client(server, sample_pdfs, tmp_path, capsys):
+    socket_path = str(tmp_path / "crop.sock")
+    thread = threading.Thread(target=serve_socket, args=(server, socket_path))
+    thread.start()
+    try:
+        for _ in range(100):
+            if os.path.exists(socket_path):
+                break
+            time.sleep(0.05)
+        jobs = [{"id": i, "input": path, "options": {"dry_run": True}} for i, path in enumerate(sample_pdfs)]
+        responses = crop_client.submit_jobs(jobs, socket_path, timeout=30)
+        assert [response["id"] for response in responses] == list(range(len(sample_pdfs)))
+        assert all(response["ok"] for response in responses)
+
+        assert crop_client.main([*sample_pdfs, "--socket", socket_path, "--margin", "2"]) == 0
+        assert "裁剪后的PDF已保存到" in capsys.readouterr().out
+    finally:
+        server.on_shutdown()
+        thread.join(30)
+    assert not os.path.exists(socket_path)
+
+
+def test_client_fallback(sample_pdfs, tmp_path, capsys):
+    missing = str(tmp_path / "missing.sock")
+    with pytest.raises(crop_client.ServiceUnavailable):
+        crop_client.submit_jobs([{"id": 0, "input": sample_pdfs[0], "options": {}}], missing)
+    assert crop_client.main([sample_pdfs[0], "--socket", missing, "--no-fallback"]) == 1
+    assert not os.path.exists(sample_pdfs[0][:-4] + "_cropped.pdf")
+    # 服务未运行时在本进程中裁剪
+    assert crop_client.main([sample_pdfs[0], "--socket", missing, "-q"]) == 0
+    assert os.path.exists(sample_pdfs[0][:-4] + "_cropped.pdf")
+
+
+def test_client_no_fallback_after_connect(sample_pdfs, tmp_path, capsys):
+    # 连接后服务中断时不在本地裁剪，以免与服务同时写入输出文件
+    socket_path = str(tmp_path / "broken.sock")
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen()
+
+    def accept_and_close():
+        conn, _ = listener.accept()
+        conn.close()
+
+    thread = threading.Thread(target=accept_and_close)
+    thread.start()
+    try:
+        assert crop_client.main([sample_pdfs[0], "--socket", socket_path]) == 1
+    finally:
+        thread.join(30)
+        listener.close()
+    assert "等待裁剪服务的响应失败" in capsys.readouterr().err
+    assert not os.path.exists(sample_pdfs[0][:-4] + "_cropped.pdf")
@@ -0,0 +1,117 @@
+import os
+import time
+
+from crop_supervisor import Quarantine, SupervisedPool, WorkerLimits
+from pdf_cropper import CropOptions, crop_pdf_batch
+
+
+def _square(x):
+    return x * x
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def _crash():
+    os._exit(3)
+
+
+def _crash_once(marker):
+    """第一次调用时使进程崩溃，重试时正常返回"""
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(3)
+    return "ok"
+
+
+def _raise():
+    raise ValueError("bad input")
+
+
+def _pid(_):
+    return os.getpid()
+
+
+def test_results_in_order():
+    outcomes = SupervisedPool(_square, 2).run([(i,) for i in range(10)])
+    assert [outcome.value for outcome in outcomes] == [i * i for i in range(10)]
+    assert all(outcome.ok and outcome.attempts == 1 for outcome in outcomes)
+
+
+def test_timeout_kills_worker():
+    start = time.monotonic()
+    outcomes = SupervisedPool(_sleep, 2, WorkerLimits(timeout=0.5, retries=1)).run([(30,), (0,)])
+    assert time.monotonic() - start < 10
+    hung, quick = outcomes
+    assert not hung.ok and hung.isolated_failure
+    assert hung.attempts == 2
+    assert "0.5" in hung.error
+    assert quick.ok and quick.value == 0
+
+
+def test_crash_is_retried(tmp_path):
+    marker = str(tmp_path / "marker")
+    outcomes = SupervisedPool(_crash_once, 1, WorkerLimits(retries=1)).run([(marker,)])
+    assert outcomes[0].ok and outcomes[0].value == "ok"
+    assert outcomes[0].attempts == 2
+
+
+def test_crash_without_retries():
+    outcomes = SupervisedPool(_crash, 1, WorkerLimits(retries=0)).run([(), ()])
+    for outcome in outcomes:
+        assert not outcome.ok and outcome.isolated_failure
+        assert "退出码 3" in outcome.error
+        assert outcome.attempts == 1
+
+
+def test_exception_is_not_isolated():
+    outcome, = SupervisedPool(_raise, 1).run([()])
+    assert not outcome.ok and not outcome.isolated_failure
+    assert outcome.error == "ValueError: bad input"
+    assert outcome.attempts == 1
+
+
+def test_workers_are_recycled():
+    outcomes = SupervisedPool(_pid, 1, WorkerLimits(max_jobs_per_worker=2)).run([(i,) for i in range(4)])
+    pids = [outcome.value for outcome in outcomes]
+    assert pids[0] == pids[1] != pids[2] == pids[3]
+
+
+def test_quarantine_respects_limits(tmp_path):
+    path = tmp_path / "input.pdf"
+    path.write_bytes(b"%PDF")
+    quarantine_path = str(tmp_path / "quarantine.json")
+    quarantine = Quarantine(quarantine_path)
+    quarantine.add(str(path), "处理超过 10 秒", 2, WorkerLimits(timeout=10, max_memory_mb=2048))
+    quarantine.save()
+
+    quarantine = Quarantine(quarantine_path)
+    assert quarantine.reason(str(path), WorkerLimits(timeout=10, max_memory_mb=2048)) == "处理超过 10 秒"
+    assert quarantine.reason(str(path), WorkerLimits(timeout=5, max_memory_mb=1024)) == "处理超过 10 秒"
+    # 放宽任何一项限制后重新尝试
+    assert quarantine.reason(str(path), WorkerLimits(timeout=60, max_memory_mb=2048)) is None
+    assert quarantine.reason(str(path), WorkerLimits(timeout=10, max_memory_mb=0)) is None
+    # 文件被修改后重新尝试
+    path.write_bytes(b"%PDF-1.7")
+    assert quarantine.reason(str(path), WorkerLimits(timeout=10, max_memory_mb=2048)) is None
+
+
+def test_batch_with_quarantine(sample_pdfs, tmp_path):
+    limits = WorkerLimits(timeout=60)
+    quarantine_path = str(tmp_path / "quarantine.json")
+    quarantine = Quarantine(quarantine_path)
+    quarantine.add(sample_pdfs[0], "处理超过 60 秒", 2, limits)
+    quarantine.save()
+
+    batch = crop_pdf_batch(sample_pdfs, CropOptions(), jobs=2, limits=limits, quarantine=Quarantine(quarantine_path))
+    skipped, *rest = batch.results
+    assert skipped.error == "已隔离: 处理超过 60 秒"
+    assert all(result.ok and result.output_paths for result in rest)
+
+    # 放宽时限后重新处理，成功后从清单中删除
+    batch = crop_pdf_batch(sample_pdfs, CropOptions(), jobs=2, limits=WorkerLimits(timeout=120),
+                           quarantine=Quarantine(quarantine_path))
+    assert batch.failures == 0
+    assert Quarantine(quarantine_path).files == {}